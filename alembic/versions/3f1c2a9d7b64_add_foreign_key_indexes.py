@@ -0,0 +1,40 @@
+"""add foreign key indexes
+
+Revision ID: 3f1c2a9d7b64
+Revises: 85305a3975e8
+Create Date: 2026-10-17 09:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b64'
+down_revision: Union[str, None] = '85305a3975e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_contract_items_project_id'), 'contract_items', ['project_id'], unique=False)
+    op.create_index('ix_contract_items_project_id_pcces_code', 'contract_items', ['project_id', 'pcces_code'], unique=False)
+    op.create_index(op.f('ix_tests_project_id'), 'tests', ['project_id'], unique=False)
+    op.create_index(op.f('ix_tests_contract_item_id'), 'tests', ['contract_item_id'], unique=False)
+    op.create_index('ix_inspections_project_id_inspection_time', 'inspections', ['project_id', 'inspection_time'], unique=False)
+    op.create_index(op.f('ix_photos_project_id'), 'photos', ['project_id'], unique=False)
+    op.create_index(op.f('ix_photos_inspection_id'), 'photos', ['inspection_id'], unique=False)
+    op.create_index(op.f('ix_photos_quality_test_id'), 'photos', ['quality_test_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photos_quality_test_id'), table_name='photos')
+    op.drop_index(op.f('ix_photos_inspection_id'), table_name='photos')
+    op.drop_index(op.f('ix_photos_project_id'), table_name='photos')
+    op.drop_index('ix_inspections_project_id_inspection_time', table_name='inspections')
+    op.drop_index(op.f('ix_tests_contract_item_id'), table_name='tests')
+    op.drop_index(op.f('ix_tests_project_id'), table_name='tests')
+    op.drop_index('ix_contract_items_project_id_pcces_code', table_name='contract_items')
+    op.drop_index(op.f('ix_contract_items_project_id'), table_name='contract_items')
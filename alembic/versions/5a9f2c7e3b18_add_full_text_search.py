@@ -0,0 +1,58 @@
+"""add full text search
+
+Revision ID: 5a9f2c7e3b18
+Revises: e41a6b0c9d52
+Create Date: 2026-10-17 18:05:44.127093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a9f2c7e3b18'
+down_revision: Union[str, None] = 'e41a6b0c9d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 各資料表的 FTS5 索引欄位（與 search.SEARCH_ENTITIES 相同，於此保留當時的版本）
+FTS_COLUMNS = {
+    "projects": ["name", "contractor", "location"],
+    "contract_items": ["name"],
+    "inspections": ["name", "location"],
+    "photos": ["description"],
+}
+
+
+def fts_ddl(table, columns):
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    old_values = ", ".join(f"old.{col}" for col in columns)
+    insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});"
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        # 以既有資料建立索引
+        f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')",
+    ]
+
+
+def upgrade() -> None:
+    for table, columns in FTS_COLUMNS.items():
+        for statement in fts_ddl(table, columns):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in FTS_COLUMNS:
+        for action in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{action}")
+        op.execute(f"DROP TABLE IF EXISTS {table}_fts")
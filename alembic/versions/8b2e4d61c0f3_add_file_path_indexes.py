@@ -0,0 +1,28 @@
+"""add file path indexes
+
+Revision ID: 8b2e4d61c0f3
+Revises: 3f1c2a9d7b64
+Create Date: 2026-10-17 14:03:52.418307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4d61c0f3'
+down_revision: Union[str, None] = '3f1c2a9d7b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_inspections_file_path'), 'inspections', ['file_path'], unique=False)
+    op.create_index(op.f('ix_photos_file_path'), 'photos', ['file_path'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photos_file_path'), table_name='photos')
+    op.drop_index(op.f('ix_inspections_file_path'), table_name='inspections')
@@ -0,0 +1,31 @@
+"""add file purge queue
+
+Revision ID: c7d93e5a1f28
+Revises: 8b2e4d61c0f3
+Create Date: 2026-10-17 15:21:07.662184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d93e5a1f28'
+down_revision: Union[str, None] = '8b2e4d61c0f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('file_purge_queue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_path', sa.String(), nullable=False, comment='待刪除的檔案路徑'),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('file_purge_queue')
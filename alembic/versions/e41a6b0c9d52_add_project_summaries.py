@@ -0,0 +1,123 @@
+"""add project summaries
+
+Revision ID: e41a6b0c9d52
+Revises: c7d93e5a1f28
+Create Date: 2026-10-17 16:48:13.905731
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41a6b0c9d52'
+down_revision: Union[str, None] = 'c7d93e5a1f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 各資料表對摘要欄位的增量（與 models.SUMMARY_DELTAS 相同，於此保留當時的版本）
+SUMMARY_DELTAS = {
+    "contract_items": {"item_count": "1", "total_contract_value": "COALESCE({row}.total_price, 0)"},
+    "tests": {"test_count": "1", "test_set_total": "COALESCE({row}.test_sets, 0)"},
+    "inspections": {
+        "inspection_count": "1",
+        "inspection_pass_count": "(COALESCE(lower({row}.is_pass), '') IN ('1', 'true'))",
+    },
+    "photos": {"photo_count": "1"},
+}
+
+
+def summary_triggers(table):
+    deltas = SUMMARY_DELTAS[table]
+    columns = ", ".join(deltas)
+
+    def add(row):
+        values = ", ".join(expr.format(row=row) for expr in deltas.values())
+        updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in deltas)
+        return (
+            f"INSERT INTO project_summaries (project_id, {columns}, last_activity_at) "
+            f"SELECT {row}.project_id, {values}, CURRENT_TIMESTAMP WHERE {row}.project_id IS NOT NULL "
+            f"ON CONFLICT(project_id) DO UPDATE SET {updates}, last_activity_at = excluded.last_activity_at;"
+        )
+
+    def subtract(row):
+        updates = ", ".join(f"{col} = {col} - {expr.format(row=row)}" for col, expr in deltas.items())
+        return (
+            f"UPDATE project_summaries SET {updates}, last_activity_at = CURRENT_TIMESTAMP "
+            f"WHERE project_id = {row}.project_id;"
+        )
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_insert AFTER INSERT ON {table} "
+        f"BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_delete AFTER DELETE ON {table} "
+        f"BEGIN {subtract('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_update AFTER UPDATE ON {table} "
+        f"BEGIN {subtract('OLD')} {add('NEW')} END",
+    ]
+
+
+PROJECT_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS projects_summary_insert AFTER INSERT ON projects "
+    "BEGIN INSERT OR IGNORE INTO project_summaries (project_id, last_activity_at) "
+    "VALUES (NEW.id, CURRENT_TIMESTAMP); END",
+    "CREATE TRIGGER IF NOT EXISTS projects_summary_delete AFTER DELETE ON projects "
+    "BEGIN DELETE FROM project_summaries WHERE project_id = OLD.id; END",
+]
+
+# 以現有資料建立摘要
+BACKFILL = """
+INSERT INTO project_summaries (
+    project_id, item_count, total_contract_value, test_count, test_set_total,
+    inspection_count, inspection_pass_count, photo_count, last_activity_at
+)
+SELECT
+    p.id,
+    (SELECT COUNT(*) FROM contract_items WHERE project_id = p.id),
+    (SELECT COALESCE(SUM(total_price), 0) FROM contract_items WHERE project_id = p.id),
+    (SELECT COUNT(*) FROM tests WHERE project_id = p.id),
+    (SELECT COALESCE(SUM(test_sets), 0) FROM tests WHERE project_id = p.id),
+    (SELECT COUNT(*) FROM inspections WHERE project_id = p.id),
+    (SELECT COUNT(*) FROM inspections WHERE project_id = p.id AND lower(is_pass) IN ('1', 'true')),
+    (SELECT COUNT(*) FROM photos WHERE project_id = p.id),
+    MAX(
+        COALESCE(p.updated_at, p.created_at, ''),
+        COALESCE((SELECT MAX(COALESCE(updated_at, created_at)) FROM contract_items WHERE project_id = p.id), ''),
+        COALESCE((SELECT MAX(COALESCE(updated_at, created_at)) FROM tests WHERE project_id = p.id), ''),
+        COALESCE((SELECT MAX(COALESCE(updated_at, created_at)) FROM inspections WHERE project_id = p.id), ''),
+        COALESCE((SELECT MAX(COALESCE(updated_at, created_at)) FROM photos WHERE project_id = p.id), '')
+    )
+FROM projects p
+"""
+
+
+def upgrade() -> None:
+    op.create_table('project_summaries',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('item_count', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='契約項目數'),
+    sa.Column('total_contract_value', sa.Float(), server_default=sa.text('0'), nullable=False, comment='契約總價'),
+    sa.Column('test_count', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='品質試驗數'),
+    sa.Column('test_set_total', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='試驗組數合計'),
+    sa.Column('inspection_count', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='施工抽查數'),
+    sa.Column('inspection_pass_count', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='合格的施工抽查數'),
+    sa.Column('photo_count', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='照片數'),
+    sa.Column('last_activity_at', sa.DateTime(), nullable=True, comment='最後異動時間'),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+    sa.PrimaryKeyConstraint('project_id')
+    )
+    op.execute(BACKFILL)
+    op.execute("UPDATE project_summaries SET last_activity_at = NULL WHERE last_activity_at = ''")
+    for statement in PROJECT_TRIGGERS:
+        op.execute(statement)
+    for table in SUMMARY_DELTAS:
+        for statement in summary_triggers(table):
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    for table in ["projects", *SUMMARY_DELTAS]:
+        for action in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_summary_{action}")
+    op.drop_table('project_summaries')
@@ -0,0 +1,216 @@
+"""讀取端點的回應快取
+
+Streamlit 每次操作都會重新執行整個頁面，同樣的清單在資料沒有改變時被重複查詢。
+標記為可快取的 GET 端點，成功的回應內容（含 X-Next-Cursor 等標頭）會以
+「路徑 + 查詢字串」為鍵保存在記憶體中。
+
+失效以版本號處理：每個工程專案有一個版本號，另有一個全域版本號。新增、修改、
+刪除的端點在提交後呼叫 invalidate(project_id)，同時遞增該專案與全域的版本號。
+路徑中有 project_id 的端點依專案版本號判斷快取是否有效，其他端點（例如所有
+工程專案的列表）依全域版本號判斷。版本號在查詢開始前取得，查詢期間若有寫入，
+該回應存入時就已過期，不會被使用。
+
+快取總大小以 RESPONSE_CACHE_MAX_BYTES 限制，超過時刪除最久未使用的回應（LRU）；
+設為 0 停用。快取只在單一行程內有效，以多個 worker 執行時各自的快取不會互相失效，
+因此多 worker 部署應停用此快取。
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.routing import Match
+
+# 快取總大小上限（位元組），0 代表停用
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# 單一回應超過上限的此比例就不快取，避免一個大回應擠掉其他快取
+MAX_ENTRY_FRACTION = 8
+
+CACHE_HEADER = "X-Cache"
+
+# 可快取的端點函式
+_cacheable_endpoints = set()
+
+
+def cacheable(endpoint):
+    """標記可快取的 GET 端點（放在 @app.get 之下）"""
+    _cacheable_endpoints.add(endpoint)
+    return endpoint
+
+
+class CachedResponse(NamedTuple):
+    version: Tuple[int, int]
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class ResponseCache:
+    """以 LRU 限制總大小、以版本號失效的回應快取"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # clear() 時遞增，讓清除前開始的查詢結果不會被存入
+        self._generation = 0
+        self._global_version = 0
+        self._project_versions: Dict[int, int] = {}
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def version(self, project_id: Optional[int]) -> Tuple[int, int]:
+        """目前的版本號；project_id 為 None 時使用全域版本號"""
+        with self._lock:
+            if project_id is None:
+                return (self._generation, self._global_version)
+            return (self._generation, self._project_versions.get(project_id, 0))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry.body)
+
+    def get(self, key, project_id: Optional[int]) -> Optional[CachedResponse]:
+        current = self.version(project_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version == current:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+
+    def put(self, key, entry: CachedResponse):
+        size = len(entry.body)
+        if size > self.max_bytes // MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted.body)
+                self.evictions += 1
+
+    def invalidate(self, project_id: Optional[int] = None):
+        """資料變更後呼叫：遞增該工程專案與全域的版本號"""
+        with self._lock:
+            self._global_version += 1
+            if project_id is not None:
+                self._project_versions[project_id] = self._project_versions.get(project_id, 0) + 1
+            self.invalidations += 1
+
+    def clear(self):
+        """清除所有快取（例如直接修改資料庫之後）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self.invalidations += 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def _match_cacheable(scope) -> Tuple[bool, Optional[int]]:
+    """找出請求對應的端點，回傳 (是否可快取, 路徑中的 project_id)"""
+    for route in scope["app"].router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            # 快取命中時不會進入路由，先記下對應的路由供 metrics 標記
+            scope["route"] = child_scope.get("route", route)
+            if child_scope.get("endpoint") not in _cacheable_endpoints:
+                return False, None
+            project_id = child_scope.get("path_params", {}).get("project_id")
+            try:
+                return True, int(project_id) if project_id is not None else None
+            except ValueError:
+                return False, None
+    return False, None
+
+
+class ResponseCacheMiddleware:
+    """快取可快取端點的 200 回應，命中時不進入端點"""
+
+    def __init__(self, app, cache: ResponseCache = None):
+        self.app = app
+        self.cache = cache or response_cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not self.cache.enabled:
+            await self.app(scope, receive, send)
+            return
+        is_cacheable, project_id = _match_cacheable(scope)
+        if not is_cacheable:
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], scope["query_string"])
+        entry = self.cache.get(key, project_id)
+        if entry is not None:
+            await send({
+                "type": "http.response.start",
+                "status": entry.status,
+                "headers": entry.headers + [(CACHE_HEADER.lower().encode(), b"HIT")],
+            })
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        # 查詢前取得版本號，查詢期間的寫入會讓這個回應在存入時就過期
+        version = self.cache.version(project_id)
+        max_entry_bytes = self.cache.max_bytes // MAX_ENTRY_FRACTION
+        start = None
+        chunks = []
+        size = 0
+
+        async def capture_send(message):
+            nonlocal start, size
+            if message["type"] == "http.response.start":
+                start = message
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(CACHE_HEADER.lower().encode(), b"MISS")],
+                }
+            elif message["type"] == "http.response.body" and start is not None and start["status"] == 200:
+                body = message.get("body", b"")
+                size += len(body)
+                # 太大的回應不快取，也不必繼續保留內容
+                if size > max_entry_bytes:
+                    start = None
+                    chunks.clear()
+                else:
+                    chunks.append(body)
+                if start is not None and not message.get("more_body", False):
+                    headers = list(start.get("headers", []))
+                    self.cache.put(key, CachedResponse(version, 200, headers, b"".join(chunks)))
+            await send(message)
+
+        await self.app(scope, receive, capture_send)
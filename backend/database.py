@@ -1,12 +1,11 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from pathlib import Path
 
-# 確保數據目錄存在
-data_dir = Path("data")
-data_dir.mkdir(exist_ok=True)
+import metrics
 
 # 根據環境選擇數據庫 URL
 SQLALCHEMY_DATABASE_URL = os.getenv(
@@ -19,15 +18,90 @@ if SQLALCHEMY_DATABASE_URL.startswith("sqlite:///./"):
     db_path = SQLALCHEMY_DATABASE_URL.replace("sqlite:///./", "")
     SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.abspath(db_path)}"
 
+# SQLite 連線參數（每條新連線建立時套用）
+# WAL 模式讓讀取不會被寫入的交易阻擋，synchronous=NORMAL 在 WAL 下仍可保證一致性
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # 毫秒
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # 負數代表 KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),  # 位元組
+    "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+}
+
+# 連線池設定
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+def apply_sqlite_pragmas(engine, pragmas=None):
+    """在每條新的 SQLite 連線上設定 PRAGMA"""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+def is_file_sqlite(url):
+    """是否為檔案型的 SQLite 資料庫（記憶體資料庫不使用 QueuePool）"""
+    return url.startswith("sqlite") and ":memory:" not in url and url not in ("sqlite://", "sqlite:///")
+
+def create_db_engine(url, pragmas=None, **kwargs):
+    """建立數據庫引擎
+
+    SQLite 會套用 pragmas（預設為 SQLITE_PRAGMAS），檔案型資料庫另外設定連線池大小。
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(url, **kwargs)
+
+    kwargs.setdefault("connect_args", {"check_same_thread": False})
+    if is_file_sqlite(url):
+        kwargs.setdefault("pool_size", DB_POOL_SIZE)
+        kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+        kwargs.setdefault("pool_timeout", DB_POOL_TIMEOUT)
+        # 記錄取得連線的次數與等待時間（/metrics；None 代表沿用預設的 QueuePool）
+        kwargs.setdefault("poolclass", metrics.timed_pool_class())
+    return apply_sqlite_pragmas(create_engine(url, **kwargs), pragmas)
+
+def ensure_sqlite_directory(url):
+    """建立檔案型 SQLite 資料庫所在的目錄（在啟動時呼叫，匯入模組不會建立目錄）"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+
+def to_async_url(url):
+    """將同步的數據庫 URL 轉換為 asyncio 驅動的 URL"""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    return url
+
+def create_async_db_engine(url, pragmas=None, **kwargs):
+    """建立 asyncio 數據庫引擎（SQLite 使用 aiosqlite，並套用相同的 pragmas）"""
+    if is_file_sqlite(url):
+        kwargs.setdefault("poolclass", metrics.timed_pool_class(is_async=True))
+    async_engine = create_async_engine(to_async_url(url), **kwargs)
+    if url.startswith("sqlite"):
+        apply_sqlite_pragmas(async_engine.sync_engine, pragmas)
+    return async_engine
+
 # 創建數據庫引擎
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
 # 創建會話工廠
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# asyncio 引擎與會話工廠，供 async 端點使用，避免阻塞事件迴圈
+# expire_on_commit=False：commit 後仍可直接讀取屬性而不觸發隱式查詢
+async_engine = create_async_db_engine(SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # 創建基類
 Base = declarative_base()
 
@@ -42,3 +116,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """獲取 asyncio 數據庫會話"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,403 @@
+"""壓力測試用的合成資料產生器
+
+依指定的數量建立工程專案、契約項目（PCCES 編碼、單位與單價接近實際的契約）、
+品質試驗、附 PDF 電子檔的施工抽查，以及附 JPEG 的照片：
+
+- 資料列以 executemany 分批寫入，每批一個交易；id 由目前最大值接續配置，
+  試驗、抽查與照片的外鍵直接指向同一工程專案的資料列
+- 檔案在執行緒池中產生並寫入內容定址儲存區（與上傳相同的 blobs/ 路徑），
+  下一批檔案寫入時同時寫入上一批的資料列
+- 相同的 seed 在空的資料庫中產生完全相同的資料列與檔案：資料列依工程專案
+  各自的亂數產生器依序產生，檔案內容只由 seed 與編號決定，與執行緒的完成順序無關
+
+每個檔案的內容都不同（JPEG 的 COM 區段與 PDF 的文字包含編號），不會被去重；
+--file-kib 以不可壓縮的填充資料放大檔案。資料庫與上傳目錄使用
+SQLALCHEMY_DATABASE_URL 與 UPLOAD_DIR。
+
+用法（在 backend/ 目錄）：
+    python dataset.py --projects 200 --items 1000000 --inspections 20000 --photos 80000 --seed 16
+"""
+import argparse
+import hashlib
+import io
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+
+import storage
+from importer import batched
+from models import ContractItem, Inspection, Photo, Project, QualityTest
+
+# 產生與寫入檔案的執行緒數
+DATASET_WORKERS = int(os.getenv("DATASET_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+# 每批寫入的資料列數（每批一個交易）
+DATASET_BATCH_SIZE = int(os.getenv("DATASET_BATCH_SIZE", "10000"))
+
+BASE_DATE = datetime(2022, 1, 1, 8, 0)
+
+# 契約項目樣板：(PCCES 綱要編碼, 項目名稱, 單位, 單價範圍, 數量範圍)
+CATALOG = [
+    ("01450", "品質管制作業費", "式", (150_000, 1_500_000), (1, 1)),
+    ("01556", "交通維持費", "式", (100_000, 2_000_000), (1, 1)),
+    ("01574", "職業安全衛生費", "式", (80_000, 1_200_000), (1, 1)),
+    ("01521", "工地臨時設施", "式", (50_000, 600_000), (1, 1)),
+    ("02316", "構造物開挖", "m3", (150, 420), (50, 20_000)),
+    ("02320", "構造物回填", "m3", (180, 460), (50, 15_000)),
+    ("02722", "級配粒料基層", "m3", (700, 1_150), (20, 8_000)),
+    ("02742", "瀝青混凝土鋪面，密級配，厚5cm", "m2", (180, 420), (100, 50_000)),
+    ("02531", "鋼筋混凝土管，Φ60cm", "m", (2_400, 4_200), (10, 1_500)),
+    ("02631", "U型排水溝，預鑄", "m", (1_700, 3_600), (10, 3_000)),
+    ("02845", "鋼板護欄", "m", (2_300, 4_800), (20, 2_500)),
+    ("02922", "植草", "m2", (60, 160), (100, 30_000)),
+    ("03110", "場鑄結構混凝土用模板，普通模板", "m2", (420, 720), (50, 25_000)),
+    ("03210", "鋼筋，SD420W", "t", (24_000, 33_000), (1, 2_000)),
+    ("03310", "預拌混凝土，210kgf/cm2", "m3", (2_100, 2_900), (20, 12_000)),
+    ("03310", "預拌混凝土，280kgf/cm2", "m3", (2_400, 3_300), (20, 10_000)),
+    ("03050", "混凝土澆置及養護", "m3", (150, 380), (20, 10_000)),
+    ("05090", "鋼構件安裝", "t", (18_000, 45_000), (1, 600)),
+    ("16520", "道路照明設備", "座", (18_000, 65_000), (1, 200)),
+    ("02896", "交通標誌", "面", (3_000, 12_000), (1, 300)),
+]
+
+# 綱要編碼對應的試驗項目
+TEST_ITEMS = {
+    "03310": ["混凝土抗壓強度試驗", "混凝土坍度試驗", "混凝土氯離子含量試驗"],
+    "03210": ["鋼筋拉力試驗", "鋼筋彎曲試驗"],
+    "02742": ["瀝青混凝土壓實度試驗", "瀝青含油量試驗"],
+    "02722": ["級配粒料篩分析", "工地密度試驗"],
+    "02320": ["工地密度試驗"],
+}
+DEFAULT_TEST_ITEMS = ["材料外觀檢驗", "尺寸量測"]
+
+INSPECTION_TYPES = [
+    "模板組立抽查", "鋼筋綁紮抽查", "混凝土澆置抽查", "開挖施工抽查", "回填夯實抽查",
+    "排水溝施工抽查", "瀝青鋪築抽查", "護欄安裝抽查", "安全衛生抽查", "交通維持抽查",
+]
+PHOTO_DESCRIPTIONS = [
+    "施工前現況", "放樣完成", "開挖完成", "模板組立完成", "鋼筋綁紮完成", "澆置混凝土",
+    "試體取樣", "坍度試驗", "養護情形", "拆模後外觀", "回填夯實", "完工現況",
+]
+CONTRACTORS = ["大安營造", "永豐營造", "中興工程", "宏達土木包工業", "新亞建設", "國泰營造"]
+REGIONS = ["臺北市", "新北市", "桃園市", "臺中市", "臺南市", "高雄市", "宜蘭縣", "花蓮縣", "屏東縣", "南投縣"]
+WORKS = ["道路改善工程", "排水改善工程", "橋梁耐震補強工程", "自行車道新建工程", "護岸整治工程", "校舍改建工程"]
+
+# JPEG 樣板的底色（不同照片輪流使用）
+PHOTO_COLORS = [(128, 128, 120), (150, 120, 90), (90, 110, 130), (160, 150, 130), (70, 90, 60), (180, 170, 160)]
+
+
+def _ranges(total: int, parts: int) -> List[Tuple[int, int]]:
+    """把 0..total 依序平均分給 parts 個工程專案：[(起, 迄)]"""
+    return [(total * part // parts, total * (part + 1) // parts) for part in range(parts)]
+
+
+def _padding(seed: int, key: str, size: int) -> bytes:
+    """不可壓縮、由 seed 與 key 決定的填充資料"""
+    return hashlib.shake_256(f"{seed}:{key}".encode()).digest(size) if size else b""
+
+
+@lru_cache(maxsize=None)
+def _jpeg_template(index: int) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (320, 240), PHOTO_COLORS[index])
+    draw = ImageDraw.Draw(image)
+    for line in range(0, 320, 40):
+        draw.line([(line, 0), (line + 80, 240)], fill=(200, 200, 200), width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def dummy_jpeg(seed: int, index: int, padding: int = 0) -> bytes:
+    """可解碼的 JPEG：樣板圖片加上含編號的 COM 區段，padding 以多個 COM 區段填充"""
+    template = _jpeg_template(index % len(PHOTO_COLORS))
+    data = f"st_constructionlog dataset seed={seed} photo={index}".encode()
+    filler = _padding(seed, f"photo:{index}", padding)
+    segments = bytearray()
+    for chunk in [data] + [filler[start:start + 65533] for start in range(0, len(filler), 65533)]:
+        segments += b"\xff\xfe" + (len(chunk) + 2).to_bytes(2, "big") + chunk
+    # 樣板以 SOI（FF D8）開頭，COM 區段放在 SOI 之後
+    return template[:2] + bytes(segments) + template[2:]
+
+
+def dummy_pdf(seed: int, index: int, title: str, padding: int = 0) -> bytes:
+    """單頁 PDF，padding 放在沒有被引用的串流物件中"""
+    text = f"Inspection {index} (seed {seed})".encode()
+    content = b"BT /F1 18 Tf 72 760 Td (" + text + b") Tj 0 -28 Td (" + title.encode("ascii", "replace") + b") Tj ET"
+    filler = _padding(seed, f"pdf:{index}", padding)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(filler), filler),
+    ]
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def write_file(data: bytes, suffix: str) -> str:
+    """寫入內容定址儲存區，回傳與上傳相同格式的路徑（已存在時不重寫）"""
+    digest = hashlib.sha256(data).hexdigest()
+    dest = storage.blob_path(digest, suffix)
+    if not dest.exists():
+        temp = dest.with_name(f"{storage.TEMP_PREFIX}{digest}")
+        with open(temp, "wb") as out:
+            out.write(data)
+        os.replace(temp, dest)
+    return str(dest)
+
+
+def _next_ids(db) -> Dict[type, int]:
+    return {model: (db.scalar(select(func.max(model.id))) or 0) + 1
+            for model in (Project, ContractItem, QualityTest, Inspection)}
+
+
+def _project_rows(rng: random.Random, seed: int, first_id: int, count: int) -> List[dict]:
+    rows = []
+    for number in range(count):
+        region = rng.choice(REGIONS)
+        created = BASE_DATE + timedelta(days=rng.randrange(0, 720))
+        rows.append({
+            "id": first_id + number,
+            "name": f"{region}{rng.choice(['中正', '光復', '民生', '復興', '中山', '建國'])}路{rng.choice(WORKS)}",
+            "contract_number": f"SYN{seed}-{first_id + number:06d}",
+            "contractor": rng.choice(CONTRACTORS),
+            "location": region,
+            "created_at": created,
+        })
+    return rows
+
+
+def _item_rows(rng: random.Random, project: dict, first_id: int, start: int, stop: int, kinds: bytearray) -> Iterator[dict]:
+    """契約項目資料列；kinds 記錄每個項目使用的樣板，供試驗對應試驗項目"""
+    for offset in range(start, stop):
+        kind = rng.randrange(len(CATALOG))
+        kinds[offset] = kind
+        chapter, name, unit, (low, high), (min_qty, max_qty) = CATALOG[kind]
+        unit_price = round(rng.uniform(low, high), 0 if unit == "式" else 1)
+        quantity = 1.0 if unit == "式" else round(rng.uniform(min_qty, max_qty), 2)
+        yield {
+            "id": first_id + offset,
+            "project_id": project["id"],
+            "pcces_code": f"{chapter}{rng.randint(1, 9)}{rng.randint(1, 9999):04d}",
+            "name": name,
+            "unit": unit,
+            "quantity": quantity,
+            "unit_price": unit_price,
+            "total_price": round(quantity * unit_price, 0),
+            "created_at": project["created_at"] + timedelta(minutes=(offset - start) % 1440),
+        }
+
+
+def _insert_batches(db, model, rows, batch_size: int, progress: Callable[[str, int], None]) -> int:
+    total = 0
+    for batch in batched(rows, batch_size):
+        db.execute(insert(model), batch)
+        db.commit()
+        total += len(batch)
+        progress(model.__tablename__, total)
+    return total
+
+
+def _pipelined(executor, batches, make_file):
+    """逐批提交檔案工作，寫入上一批資料列時下一批檔案已在背景產生"""
+    pending = None
+    for batch in batches:
+        futures = [executor.submit(make_file, row) for row in batch]
+        if pending is not None:
+            yield pending[0], [future.result() for future in pending[1]]
+        pending = (batch, futures)
+    if pending is not None:
+        yield pending[0], [future.result() for future in pending[1]]
+
+
+def generate(
+    db,
+    projects: int,
+    items: int,
+    tests: int,
+    inspections: int,
+    photos: int,
+    seed: int = 0,
+    workers: int = DATASET_WORKERS,
+    batch_size: int = DATASET_BATCH_SIZE,
+    file_kib: int = 0,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> dict:
+    """產生合成資料，回傳各資料表寫入的筆數、檔案數與耗時"""
+    progress = progress or (lambda table, count: None)
+    started = time.perf_counter()
+    padding = file_kib * 1024
+    if projects < 1 and (items or tests or inspections or photos):
+        raise ValueError("至少需要一個工程專案")
+
+    next_ids = _next_ids(db)
+    project_rows = _project_rows(random.Random(f"{seed}:projects"), seed, next_ids[Project], projects)
+    result = {"projects": _insert_batches(db, Project, project_rows, batch_size, progress)}
+    rngs = [random.Random(f"{seed}:project:{row['id']}") for row in project_rows]
+
+    # 各工程專案的資料列依序配置連續的 id，外鍵只指向同一工程專案
+    item_ranges = _ranges(items, projects)
+    test_ranges = _ranges(tests, projects)
+    inspection_ranges = _ranges(inspections, projects)
+    photo_ranges = _ranges(photos, projects)
+
+    kinds = bytearray(items)
+
+    def item_rows():
+        for project, rng, (start, stop) in zip(project_rows, rngs, item_ranges):
+            yield from _item_rows(rng, project, next_ids[ContractItem], start, stop, kinds)
+
+    result["contract_items"] = _insert_batches(db, ContractItem, item_rows(), batch_size, progress)
+
+    def test_rows():
+        for part, (project, rng, (start, stop)) in enumerate(zip(project_rows, rngs, test_ranges)):
+            item_start, item_stop = item_ranges[part]
+            if item_start == item_stop:
+                continue
+            for number in range(start, stop):
+                # 優先對應有試驗項目的契約項目（混凝土、鋼筋、瀝青等）
+                for _ in range(8):
+                    offset = rng.randrange(item_start, item_stop)
+                    if CATALOG[kinds[offset]][0] in TEST_ITEMS:
+                        break
+                test_item = rng.choice(TEST_ITEMS.get(CATALOG[kinds[offset]][0], DEFAULT_TEST_ITEMS))
+                yield {
+                    "id": next_ids[QualityTest] + number,
+                    "project_id": project["id"],
+                    "contract_item_id": next_ids[ContractItem] + offset,
+                    "name": f"第{number - start + 1}次{test_item}",
+                    "test_item": test_item,
+                    "test_sets": rng.randint(1, 12),
+                    "test_result": "合格" if rng.random() < 0.95 else "不合格",
+                    "created_at": project["created_at"] + timedelta(days=rng.randrange(0, 540)),
+                }
+
+    result["tests"] = _insert_batches(db, QualityTest, test_rows(), batch_size, progress)
+
+    def inspection_rows():
+        for project, rng, (start, stop) in zip(project_rows, rngs, inspection_ranges):
+            for number in range(start, stop):
+                kilometre = rng.randrange(0, 12_000, 20)
+                inspected = project["created_at"] + timedelta(days=rng.randrange(0, 540), hours=rng.randrange(0, 9))
+                yield {
+                    "id": next_ids[Inspection] + number,
+                    "project_id": project["id"],
+                    "name": rng.choice(INSPECTION_TYPES),
+                    "inspection_time": inspected,
+                    "location": f"{project['location']} {kilometre // 1000}K+{kilometre % 1000:03d}",
+                    "is_pass": "1" if rng.random() < 0.9 else "0",
+                    "created_at": inspected,
+                }
+
+    def photo_rows():
+        for part, (project, rng, (start, stop)) in enumerate(zip(project_rows, rngs, photo_ranges)):
+            inspection_start, inspection_stop = inspection_ranges[part]
+            test_start, test_stop = test_ranges[part]
+            for number in range(start, stop):
+                row = {
+                    "project_id": project["id"],
+                    "inspection_id": None,
+                    "quality_test_id": None,
+                    "filename": f"IMG_{number % 10000:04d}.jpg",
+                    "description": rng.choice(PHOTO_DESCRIPTIONS),
+                    "created_at": project["created_at"] + timedelta(days=rng.randrange(0, 540)),
+                    "_index": number,
+                }
+                link = rng.random()
+                if link < 0.7 and inspection_start < inspection_stop:
+                    row["inspection_id"] = next_ids[Inspection] + rng.randrange(inspection_start, inspection_stop)
+                elif link < 0.9 and test_start < test_stop:
+                    row["quality_test_id"] = next_ids[QualityTest] + rng.randrange(test_start, test_stop)
+                yield row
+
+    def make_pdf(row):
+        return write_file(dummy_pdf(seed, row["id"] - next_ids[Inspection], row["name"], padding), ".pdf")
+
+    def make_jpeg(row):
+        return write_file(dummy_jpeg(seed, row["_index"], padding), ".jpg")
+
+    # 預先建立 blobs/ 下的 256 個子目錄，寫入檔案時不必逐一檢查
+    for prefix in range(256):
+        (storage.BLOB_DIR / f"{prefix:02x}").mkdir(parents=True, exist_ok=True)
+
+    result["files"] = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for name, model, rows, make_file in [
+            ("inspections", Inspection, inspection_rows(), make_pdf),
+            ("photos", Photo, photo_rows(), make_jpeg),
+        ]:
+            result[name] = 0
+            for batch, paths in _pipelined(executor, batched(rows, batch_size), make_file):
+                for row, path in zip(batch, paths):
+                    row.pop("_index", None)
+                    row["file_path"] = path
+                db.execute(insert(model), batch)
+                db.commit()
+                result[name] += len(batch)
+                result["files"] += len(batch)
+                progress(name, result[name])
+
+    result["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生壓力測試用的合成資料（資料庫與上傳目錄）")
+    parser.add_argument("--projects", type=int, default=10, help="工程專案數")
+    parser.add_argument("--items", type=int, default=10_000, help="契約項目數（平均分配到各工程專案）")
+    parser.add_argument("--tests", type=int, default=2_000, help="品質試驗數")
+    parser.add_argument("--inspections", type=int, default=2_000, help="施工抽查數（各附一個 PDF）")
+    parser.add_argument("--photos", type=int, default=5_000, help="照片數（各附一個 JPEG）")
+    parser.add_argument("--seed", type=int, default=0, help="亂數種子，相同的種子產生相同的資料")
+    parser.add_argument("--workers", type=int, default=DATASET_WORKERS, help="產生與寫入檔案的執行緒數")
+    parser.add_argument("--batch-size", type=int, default=DATASET_BATCH_SIZE, help="每批寫入的資料列數")
+    parser.add_argument("--file-kib", type=int, default=0, help="每個檔案額外填充的大小（KiB）")
+    args = parser.parse_args(argv)
+
+    import migrations
+    from database import SessionLocal, engine
+
+    migrations.prepare_database(engine)
+    last_report = [0.0]
+
+    def progress(table, count):
+        now = time.perf_counter()
+        if now - last_report[0] >= 1:
+            last_report[0] = now
+            print(f"\r{table}: {count}".ljust(40), end="", flush=True)
+
+    with SessionLocal() as db:
+        result = generate(
+            db, args.projects, args.items, args.tests, args.inspections, args.photos,
+            seed=args.seed, workers=args.workers, batch_size=args.batch_size, file_kib=args.file_kib,
+            progress=progress,
+        )
+
+    print("\r".ljust(41), end="\r")
+    for table in ("projects", "contract_items", "tests", "inspections", "photos"):
+        print(f"{table}: {result[table]}")
+    elapsed = result["elapsed_seconds"]
+    print(f"檔案: {result['files']}（{storage.BLOB_DIR}）")
+    print(f"耗時: {elapsed:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""契約項目 CSV/XLSX 匯出
+
+與 importer 方向相反：以伺服器端游標逐批讀取契約項目，邊產生邊送出檔案內容。
+匯出十萬筆時記憶體中只保留一批資料，查詢尚未讀完前就開始回傳第一個位元組。
+
+openpyxl 的 write-only 模式雖然逐列寫入，但要到存檔時才組出整個壓縮檔，
+因此 XLSX 直接以 zipstream 寫出：固定的活頁簿結構先送出，工作表 XML 逐批產生，
+字串使用 inline string，不需要在最後才寫出的共用字串表。
+"""
+import csv
+import io
+import os
+import re
+import time
+import zipfile
+from typing import Iterable, Iterator, Sequence
+from urllib.parse import quote
+
+import zipstream
+
+# 每批從資料庫讀取並寫出的列數
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# 匯出欄位：(資料庫欄位, 表頭)，表頭與前端「現有合約項目」表格相同
+EXPORT_COLUMNS = [
+    ("pcces_code", "契約項次"),
+    ("name", "工項名稱"),
+    ("unit", "單位"),
+    ("quantity", "數量"),
+    ("unit_price", "單價"),
+    ("total_price", "複價"),
+]
+# 以千分位、兩位小數顯示的欄位（儲存格仍是數值，不轉成字串）
+PRICE_FIELDS = {"unit_price", "total_price"}
+
+XLSX_SHEET_NAME = "合約項目"
+XLSX_COLUMN_WIDTHS = [14, 40, 8, 12, 14, 16]
+
+# XML 1.0 不允許的控制字元
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# 文字節點需要跳脫的字元（與 xml.sax.saxutils.escape 相同，該模組會連帶載入 urllib.request）
+_XML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
+def iter_batches(bind, statement, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Sequence]:
+    """以伺服器端游標逐批讀取查詢結果
+
+    自行開啟連線，不依賴請求的 Session，回應串流期間請求相依性結束也不受影響。
+    """
+    with bind.connect() as connection:
+        result = connection.execution_options(yield_per=batch_size).execute(statement)
+        yield from result.partitions()
+
+
+def iter_csv(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    """產生 CSV 內容（UTF-8 BOM，Excel 直接開啟時中文不會變成亂碼）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+_COLUMN_LETTERS = [_column_letter(i) for i in range(len(EXPORT_COLUMNS))]
+# 儲存格樣式：0 為預設，1 為千分位兩位小數（內建格式 4 = #,##0.00），2 為粗體表頭
+_COLUMN_STYLES = [' s="1"' if field in PRICE_FIELDS else "" for field, _ in EXPORT_COLUMNS]
+_HEADER_STYLE = ' s="2"'
+
+
+def _string_cell(ref: str, value: str, style: str = "") -> str:
+    text = _ILLEGAL_XML_CHARS.sub("", value).translate(_XML_ESCAPES)
+    return f'<c r="{ref}" t="inlineStr"{style}><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _cell(ref: str, value, style: str) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        # inf/NaN 在 XLSX 中沒有對應的數值，留空
+        if value != value or value in (float("inf"), float("-inf")):
+            return ""
+        return f'<c r="{ref}"{style}><v>{value!r}</v></c>'
+    return _string_cell(ref, str(value))
+
+
+def _iter_sheet_xml(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    """逐批產生工作表 XML"""
+    cols = "".join(
+        f'<col min="{i}" max="{i}" width="{width}" customWidth="1"/>'
+        for i, width in enumerate(XLSX_COLUMN_WIDTHS, start=1)
+    )
+    header = "".join(
+        _string_cell(f"{letter}1", title, _HEADER_STYLE)
+        for letter, (_, title) in zip(_COLUMN_LETTERS, EXPORT_COLUMNS)
+    )
+    yield (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<sheetViews><sheetView workbookViewId="0">'
+        '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+        '</sheetView></sheetViews>'
+        f'<cols>{cols}</cols><sheetData><row r="1">{header}</row>'
+    ).encode("utf-8")
+
+    row_number = 1
+    for batch in batches:
+        parts = []
+        for row in batch:
+            row_number += 1
+            cells = "".join(
+                _cell(f"{letter}{row_number}", value, style)
+                for letter, style, value in zip(_COLUMN_LETTERS, _COLUMN_STYLES, row)
+            )
+            parts.append(f'<row r="{row_number}">{cells}</row>')
+        yield "".join(parts).encode("utf-8")
+    yield b"</sheetData></worksheet>"
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{XLSX_SHEET_NAME}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+        '</cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+
+
+def iter_xlsx(batches: Iterable[Sequence]) -> Iterator[bytes]:
+    """產生 XLSX 內容，工作表在壓縮檔中最後寫入，讀取到哪一批就送出到哪一批"""
+    date_time = time.localtime()[:6]
+
+    def part(name):
+        info = zipfile.ZipInfo(name, date_time)
+        # XML 壓縮率高，與抽查表打包不同，這裡使用 deflate
+        info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    entries = [(part(name), [content.encode("utf-8")]) for name, content in _XLSX_PARTS.items()]
+    entries.append((part("xl/worksheets/sheet1.xml"), _iter_sheet_xml(batches)))
+    return zipstream.iter_zip_entries(entries)
+
+
+# 匯出格式：副檔名 -> (media type, 產生器)
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", iter_csv),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", iter_xlsx),
+}
+
+
+def content_disposition(filename: str) -> str:
+    """附件檔名標頭，非 ASCII 檔名依 RFC 5987 編碼"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
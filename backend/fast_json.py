@@ -0,0 +1,119 @@
+"""清單端點的快速 JSON 輸出
+
+清單端點預設回傳 ORM 物件，FastAPI 再依 response_model 以 from_attributes 逐筆
+驗證後輸出 JSON；資料量大時，建立 ORM 物件與第二次驗證佔了大部分的 CPU 時間。
+
+設定 FAST_JSON_RESPONSES=1 後，清單端點改為只查詢 schema 需要的欄位，把資料列
+直接轉成 dict 並以 orjson 輸出，跳過 ORM 物件與驗證。欄位順序取自 schema，
+資料庫型別與 schema 不同的欄位（例如以字串儲存的 is_pass）仍以 pydantic 轉換，
+輸出內容與原本的路徑相同。orjson 與 pydantic 只在極大浮點數的指數格式上不同
+（1e16 與 1e+16），輸出中出現指數時改以 pydantic 重新序列化該頁。
+"""
+import os
+import re
+import typing
+from functools import lru_cache
+from typing import Any, List, Optional
+
+import orjson
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from pagination import paginate, paginate_async, paginate_rows_async
+
+# 是否啟用快速輸出
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "0").lower() in ("1", "true", "yes")
+
+# orjson 輸出中的正指數浮點數（例如 1e16），pydantic 的格式為 1e+16
+_EXPONENT_RE = re.compile(rb"\de\d")
+
+
+class ORJSONResponse(Response):
+    """以 orjson 序列化的 JSON 回應
+
+    指定 fallback 時，輸出中出現正指數浮點數就改以該 TypeAdapter 序列化，
+    與 FastAPI 依 response_model 輸出的格式一致。
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content: Any, fallback: Optional[TypeAdapter] = None, **kwargs):
+        self.fallback = fallback
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        body = orjson.dumps(content, option=orjson.OPT_UTC_Z)
+        if self.fallback is not None and _EXPONENT_RE.search(body):
+            body = self.fallback.dump_json(self.fallback.validate_python(content))
+        return body
+
+
+def _base_type(annotation):
+    """去掉 Optional[...]，取得欄位的基本型別"""
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        return args[0]
+    return annotation
+
+
+class RowSerializer:
+    """把查詢 schema 欄位得到的資料列轉成與 response_model 相同的 JSON"""
+
+    def __init__(self, schema, model):
+        self.schema = schema
+        self.names = list(schema.model_fields)
+        self.columns = [getattr(model, name) for name in self.names]
+        # 資料庫型別與 schema 不同的欄位：(位置, 轉換函式)
+        self.converters = []
+        for index, (name, column) in enumerate(zip(self.names, self.columns)):
+            annotation = schema.model_fields[name].annotation
+            if column.type.python_type is not _base_type(annotation):
+                self.converters.append((index, TypeAdapter(annotation).validate_python))
+        self.list_adapter = TypeAdapter(List[schema])
+
+    def to_dicts(self, rows) -> list:
+        names = self.names
+        if not self.converters:
+            return [dict(zip(names, row)) for row in rows]
+        converters = self.converters
+        items = []
+        for row in rows:
+            values = list(row)
+            for index, convert in converters:
+                values[index] = convert(values[index])
+            items.append(dict(zip(names, values)))
+        return items
+
+
+@lru_cache(maxsize=None)
+def row_serializer(schema, model) -> RowSerializer:
+    return RowSerializer(schema, model)
+
+
+def _json_response(serializer: RowSerializer, rows, response: Response) -> ORJSONResponse:
+    """建立回應，並帶上端點設定在 response 上的標頭（例如 X-Next-Cursor）"""
+    result = ORJSONResponse(serializer.to_dicts(rows), fallback=serializer.list_adapter)
+    result.headers.raw.extend(response.headers.raw)
+    return result
+
+
+def paginate_list(query, schema, columns, cursor, limit, response: Response):
+    """清單端點的 keyset 分頁；啟用 FAST_JSON_RESPONSES 時直接輸出 JSON
+
+    query 為單一 ORM 實體的查詢，schema 為端點 response_model 的元素型別。
+    """
+    if not FAST_JSON_RESPONSES:
+        return paginate(query, columns, cursor, limit, response)
+    serializer = row_serializer(schema, query.column_descriptions[0]["entity"])
+    rows = paginate(query.with_entities(*serializer.columns), columns, cursor, limit, response)
+    return _json_response(serializer, rows, response)
+
+
+async def paginate_list_async(db, stmt, schema, columns, cursor, limit, response: Response):
+    """paginate_list 的 AsyncSession 版本，stmt 為 select() 語句"""
+    if not FAST_JSON_RESPONSES:
+        return await paginate_async(db, stmt, columns, cursor, limit, response)
+    serializer = row_serializer(schema, stmt.column_descriptions[0]["entity"])
+    stmt = stmt.with_only_columns(*serializer.columns)
+    rows = await paginate_rows_async(db, stmt, columns, cursor, limit, response)
+    return _json_response(serializer, rows, response)
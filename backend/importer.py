@@ -0,0 +1,133 @@
+"""契約項目 Excel/PCCES 匯入引擎
+
+以唯讀、逐列的方式讀取上傳的工作簿，依欄位映射轉換成契約項目資料，
+讓呼叫端可以分批寫入資料庫，不需要先把整份表格載入成 DataFrame。
+"""
+import shutil
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import IO, Dict, Iterable, Iterator, Optional, Tuple
+
+# 欄位映射預設值，對應專案附帶的「契約設定模板.xls」
+DEFAULT_COLUMN_MAPPING = {
+    "pcces_code": "項次",
+    "name": "項目",
+    "unit": "單位",
+    "quantity": "數量",
+    "unit_price": "單價",
+    "total_price": "複價",
+}
+
+SUPPORTED_EXTENSIONS = {".xls", ".xlsx"}
+NUMERIC_FIELDS = {"quantity", "unit_price", "total_price"}
+
+
+class ImportFormatError(ValueError):
+    """工作簿格式或欄位映射錯誤"""
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """將迭代器切成固定大小的批次"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _iter_xlsx_rows(fileobj: IO[bytes], sheet: Optional[str]) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        if sheet and sheet not in workbook.sheetnames:
+            raise ImportFormatError(f"找不到工作表: {sheet}")
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        yield from worksheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _iter_xls_rows(fileobj: IO[bytes], sheet: Optional[str]) -> Iterator[list]:
+    import xlrd
+
+    # xlrd 需要實體檔案才能使用 mmap，避免把整份 BIFF 內容複製到記憶體
+    with tempfile.NamedTemporaryFile(suffix=".xls") as tmp:
+        shutil.copyfileobj(fileobj, tmp)
+        tmp.flush()
+        workbook = xlrd.open_workbook(tmp.name, on_demand=True)
+        try:
+            try:
+                worksheet = workbook.sheet_by_name(sheet) if sheet else workbook.sheet_by_index(0)
+            except xlrd.XLRDError:
+                raise ImportFormatError(f"找不到工作表: {sheet}")
+            for index in range(worksheet.nrows):
+                yield worksheet.row_values(index)
+        finally:
+            workbook.release_resources()
+
+
+def iter_sheet_rows(fileobj: IO[bytes], filename: str, sheet: Optional[str] = None) -> Iterator[tuple]:
+    """逐列讀取工作簿的原始儲存格內容"""
+    suffix = Path(filename or "").suffix.lower()
+    if suffix == ".xlsx":
+        return _iter_xlsx_rows(fileobj, sheet)
+    if suffix == ".xls":
+        return _iter_xls_rows(fileobj, sheet)
+    raise ImportFormatError(f"不支持的文件類型。允許的類型: {', '.join(sorted(SUPPORTED_EXTENSIONS))}")
+
+
+def _resolve_columns(header: tuple, mapping: Dict[str, str]) -> Dict[str, int]:
+    """依表頭名稱找出每個欄位的索引"""
+    names = [str(cell).strip() if cell is not None else "" for cell in header]
+    columns = {}
+    for field, column in mapping.items():
+        if column not in names:
+            raise ImportFormatError(f"找不到欄位「{column}」（{field}）")
+        columns[field] = names.index(column)
+    return columns
+
+
+def _convert_cell(field: str, value):
+    if value is None or value == "":
+        return 0.0 if field in NUMERIC_FIELDS else ""
+    if field in NUMERIC_FIELDS:
+        return value
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_contract_items(
+    fileobj: IO[bytes],
+    filename: str,
+    column_mapping: Optional[Dict[str, str]] = None,
+    header_row: int = 1,
+    sheet: Optional[str] = None,
+) -> Iterator[Tuple[int, dict]]:
+    """依欄位映射逐列產生契約項目資料
+
+    回傳 (Excel 列號, 資料) 的迭代器，空白列會被略過。
+    欄位驗證交由呼叫端處理。
+    """
+    mapping = {**DEFAULT_COLUMN_MAPPING, **(column_mapping or {})}
+    rows = iter_sheet_rows(fileobj, filename, sheet)
+
+    header = None
+    for row_number, row in enumerate(rows, start=1):
+        if row_number == header_row:
+            header = row
+            break
+    if header is None:
+        raise ImportFormatError(f"找不到第 {header_row} 列的表頭")
+
+    columns = _resolve_columns(header, mapping)
+    for row_number, row in enumerate(rows, start=header_row + 1):
+        if all(cell is None or cell == "" for cell in row):
+            continue
+        yield row_number, {
+            field: _convert_cell(field, row[index] if index < len(row) else None)
+            for field, index in columns.items()
+        }
@@ -3,49 +3,111 @@
 # 2. 將 dict() 方法更新為 model_dump() 以符合 Pydantic v2 的要求
 # 3. 更新了所有使用 Test 類的地方為 QualityTest
 
-from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Depends, status, UploadFile, File, Form, Request, Response, Query, BackgroundTasks
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, init_db
-from models import Project, ContractItem, QualityTest, Inspection, Photo
+from database import SessionLocal, engine, async_engine, get_async_db
+from models import Project, ContractItem, QualityTest, Inspection, Photo, FilePurge, ProjectSummary
 import schemas
-from typing import List, Optional
+import importer
+import storage
+import thumbnails
+import reconcile
+import search
+import fast_json
+import cache
+import zipstream
+import exporter
+import project_archive
+import migrations
+import metrics
+import query_log
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from typing import List, Literal, Optional
+import asyncio
+from contextlib import asynccontextmanager
 import logging
 from datetime import datetime
 import os
 from pathlib import Path
 import io
+import json
 
 # 配置日誌
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """啟動時檢查資料庫結構、建立上傳目錄並清理待刪除檔案佇列，關閉時釋放連線池
+
+    匯入模組不會讀寫資料庫或檔案系統；資料庫已是最新版本時只需要一次查詢。
+    上次執行時因寬限期延後、尚未刪除的檔案在啟動時清理。
+    """
+    await run_in_threadpool(migrations.prepare_database, engine)
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    await run_in_threadpool(storage.purge_files, engine)
+    yield
+    storage.cancel_purge_retry()
+    await async_engine.dispose()
+    engine.dispose()
+
 # 創建 FastAPI 應用
 app = FastAPI(
     title="工程品質管理系統",
     description="用於管理工程專案、契約項目、品質試驗和施工抽查的 API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# 設定文件上傳目錄
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)  # 確保目錄存在
+# 限制請求大小，超過上限的上傳在解析前就回傳 413
+app.add_middleware(storage.UploadSizeLimitMiddleware)
+# 讀取端點的回應快取（寫入端點提交後呼叫 cache.response_cache.invalidate）
+app.add_middleware(cache.ResponseCacheMiddleware)
+# 慢查詢紀錄與 N+1 偵測（依正規化的 SQL 累計每個請求的執行次數與時間）
+if query_log.QUERY_LOG_ENABLED:
+    app.add_middleware(query_log.QueryLogMiddleware)
+# 監控指標（最外層，快取命中與 413 也會被量測），由 GET /metrics 輸出
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+metrics.register_cache("response", cache.response_cache.stats)
+metrics.register_cache("thumbnails", thumbnails.cache_stats)
 
-async def process_uploaded_photo(file: UploadFile, save_path: Path) -> str:
-    """處理上傳的照片：保存文件"""
-    contents = await file.read()
-    
-    # 保存原始文件
-    with open(save_path, "wb") as f:
-        f.write(contents)
-    
-    return str(save_path)
+# 設定文件上傳目錄（在 lifespan 中建立）
+UPLOAD_DIR = storage.UPLOAD_DIR
+
+async def store_upload(file: UploadFile) -> storage.StoredFile:
+    """分塊保存上傳文件到內容定址儲存區，超過大小上限時回傳 413"""
+    try:
+        return await storage.save_upload(file)
+    except storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
+
+async def process_uploaded_photo(file: UploadFile) -> str:
+    """處理上傳的照片：保存文件，內容重複時沿用既有檔案"""
+    stored = await store_upload(file)
+    return stored.path
+
+def original_filename(file: UploadFile) -> str:
+    """上傳時的原始檔名（去除路徑部分）"""
+    return Path(file.filename or "").name
+
+def inspection_filename(inspection_id: int, file_path: str) -> str:
+    """抽查表文件下載時使用的檔名（儲存區內的檔名是內容雜湊）"""
+    return f"inspection_{inspection_id}{Path(file_path).suffix}"
 
 # 允許的文件類型
 ALLOWED_EXTENSIONS = {".pdf", ".doc", ".docx", ".xls", ".xlsx"}
 
-# 初始化數據庫
-init_db()
+# 批量上傳照片時同時寫入的檔案數
+BULK_UPLOAD_WORKERS = int(os.getenv("BULK_UPLOAD_WORKERS", "8"))
+
+# 匯入契約項目時每批寫入的筆數
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
 
 # 依賴注入：獲取數據庫會話
 def get_db():
@@ -63,15 +125,22 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
     db.add(db_project)
     db.commit()
     db.refresh(db_project)
+    cache.response_cache.invalidate(db_project.id)
     return db_project
 
 @app.get("/projects/", response_model=List[schemas.Project], tags=["projects"])
-def read_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """獲取工程專案列表"""
-    projects = db.query(Project).offset(skip).limit(limit).all()
-    return projects
+@cache.cacheable
+def read_projects(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取工程專案列表（keyset 分頁，下一頁游標見 X-Next-Cursor 標頭）"""
+    return fast_json.paginate_list(db.query(Project), schemas.Project, [Project.id], cursor, limit, response)
 
 @app.get("/projects/{project_id}", response_model=schemas.ProjectBase, tags=["projects"])
+@cache.cacheable
 def read_project(project_id: int, db: Session = Depends(get_db)):
     """獲取特定工程專案的詳細信息，包括關聯數據"""
     project = db.query(Project).filter(Project.id == project_id).first()
@@ -79,6 +148,26 @@ def read_project(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@app.get("/projects/{project_id}/summary", response_model=schemas.ProjectSummary, tags=["projects"])
+@cache.cacheable
+def read_project_summary(project_id: int, db: Session = Depends(get_db)):
+    """獲取工程專案摘要（由觸發程序維護的摘要表，讀取只需一筆查詢）"""
+    row = db.execute(
+        select(Project.id, ProjectSummary)
+        .outerjoin(ProjectSummary, ProjectSummary.project_id == Project.id)
+        .where(Project.id == project_id)
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    summary = row.ProjectSummary
+    if summary is None:
+        return schemas.ProjectSummary(project_id=project_id)
+    result = schemas.ProjectSummary.model_validate(summary)
+    if summary.inspection_count:
+        result.pass_rate = summary.inspection_pass_count / summary.inspection_count
+    return result
+
 @app.put("/projects/{project_id}", response_model=schemas.Project, tags=["projects"])
 def update_project(project_id: int, project_update: schemas.ProjectUpdate, db: Session = Depends(get_db)):
     """更新工程專案"""
@@ -93,24 +182,103 @@ def update_project(project_id: int, project_update: schemas.ProjectUpdate, db: S
     db_project.updated_at = datetime.now()
     db.commit()
     db.refresh(db_project)
+    cache.response_cache.invalidate(project_id)
     return db_project
 
+@app.get("/projects/{project_id}/archive", tags=["projects"])
+def export_project_archive(project_id: int, db: Session = Depends(get_db)):
+    """匯出工程專案封存檔（ZIP：各資料表的 NDJSON 與引用的檔案）
+
+    資料列逐批讀取、檔案逐塊讀取，邊產生邊送出，記憶體用量與專案大小無關。
+    """
+    project = db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail=f"Project with id {project_id} not found")
+    
+    filename = f"{project.name}_專案封存.zip"
+    return StreamingResponse(
+        project_archive.iter_project_archive(db.get_bind(), project_id),
+        media_type="application/zip",
+        headers={"Content-Disposition": exporter.content_disposition(filename)},
+    )
+
+@app.post("/projects/import", response_model=schemas.ProjectArchiveImportResult, tags=["projects"])
+def import_project_archive(
+    file: UploadFile = File(...),
+    contract_number: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """從封存檔還原工程專案
+
+    建立新的工程專案並重新配置所有 id，資料列分批寫入，全部在同一個交易中完成。
+    契約編號已存在時回傳 409，可用 contract_number 指定新的契約編號；
+    封存檔內的檔案超過大小上限時回傳 413。
+    """
+    try:
+        result = project_archive.restore_project(db, file.file, contract_number=contract_number)
+        db.commit()
+    except project_archive.ProjectExistsError as e:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=str(e))
+    except project_archive.ArchiveFormatError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except project_archive.ArchiveTooLarge as e:
+        db.rollback()
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.exception("匯入工程專案封存檔失敗")
+        raise HTTPException(status_code=400, detail=f"匯入失敗: {str(e)}")
+    
+    cache.response_cache.invalidate(result["project_id"])
+    return result
+
 @app.delete("/projects/{project_id}", tags=["projects"])
-def delete_project(project_id: int, db: Session = Depends(get_db)):
-    """刪除工程專案"""
-    db_project = db.query(Project).filter(Project.id == project_id).first()
-    if db_project is None:
+def delete_project(project_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """刪除工程專案
+
+    所有子資料表以集合式 DELETE 在同一個交易中刪除；關聯檔案的路徑
+    以 INSERT ... SELECT 寫入待刪除佇列，回應送出後再由背景工作分批刪除檔案。
+    """
+    exists = db.scalar(select(Project.id).where(Project.id == project_id))
+    if exists is None:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # 刪除相關的契約項目
-    db.query(ContractItem).filter(ContractItem.project_id == project_id).delete()
-    # 刪除相關的品質試驗
-    db.query(QualityTest).filter(QualityTest.project_id == project_id).delete()
-    # 刪除相關的施工抽查
-    db.query(Inspection).filter(Inspection.project_id == project_id).delete()
+    inspection_ids = select(Inspection.id).where(Inspection.project_id == project_id)
+    test_ids = select(QualityTest.id).where(QualityTest.project_id == project_id)
+    project_photos = (
+        (Photo.project_id == project_id)
+        | Photo.inspection_id.in_(inspection_ids)
+        | Photo.quality_test_id.in_(test_ids)
+    )
+    
+    # 將照片與抽查表電子檔的路徑放入待刪除佇列
+    file_paths = union(
+        select(Photo.file_path).where(project_photos, Photo.file_path.is_not(None)),
+        select(Inspection.file_path).where(
+            Inspection.project_id == project_id, Inspection.file_path.is_not(None)
+        ),
+    )
+    db.execute(insert(FilePurge).from_select(["file_path"], file_paths))
     
-    db.delete(db_project)
+    # 依外鍵順序刪除：照片 → 品質試驗 → 契約項目、施工抽查 → 工程專案
+    # （不同步 session 中的物件，避免刪除前先查出所有資料列；
+    # 先刪除摘要，子資料表的觸發程序就不必逐筆更新摘要）
+    for statement in (
+        delete(ProjectSummary).where(ProjectSummary.project_id == project_id),
+        delete(Photo).where(project_photos),
+        delete(QualityTest).where(QualityTest.project_id == project_id),
+        delete(ContractItem).where(ContractItem.project_id == project_id),
+        delete(Inspection).where(Inspection.project_id == project_id),
+        delete(Project).where(Project.id == project_id),
+    ):
+        db.execute(statement, execution_options={"synchronize_session": False})
     db.commit()
+    # 刪除的照片可能屬於其他專案的抽查或試驗，清除全部快取
+    cache.response_cache.clear()
+    
+    background_tasks.add_task(storage.purge_files, db.get_bind())
     return {"message": "Project deleted successfully"}
 
 # Contract Item endpoints
@@ -126,24 +294,216 @@ def create_contract_item(item: schemas.ContractItemCreate, db: Session = Depends
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    cache.response_cache.invalidate(item.project_id)
     return db_item
 
 @app.get("/contract-items/", response_model=List[schemas.ContractItem], tags=["contract items"])
-def read_contract_items(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """獲取所有契約項目列表"""
-    items = db.query(ContractItem).offset(skip).limit(limit).all()
-    return items
+@cache.cacheable
+def read_contract_items(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取所有契約項目列表（keyset 分頁）"""
+    return fast_json.paginate_list(db.query(ContractItem), schemas.ContractItem, [ContractItem.id], cursor, limit, response)
 
 @app.get("/projects/{project_id}/contract-items/", response_model=List[schemas.ContractItem], tags=["contract items"])
-def read_project_contract_items(project_id: int, db: Session = Depends(get_db)):
-    """獲取特定工程專案的契約項目列表"""
+@cache.cacheable
+def read_project_contract_items(
+    project_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取特定工程專案的契約項目列表（依匯入順序，keyset 分頁）"""
     # 驗證 project_id 是否存在
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail=f"Project with id {project_id} not found")
         
-    items = db.query(ContractItem).filter(ContractItem.project_id == project_id).all()
-    return items
+    query = db.query(ContractItem).filter(ContractItem.project_id == project_id)
+    return fast_json.paginate_list(query, schemas.ContractItem, [ContractItem.id], cursor, limit, response)
+
+@app.get("/projects/{project_id}/contract-items/export.{export_format}", tags=["contract items"])
+def export_contract_items(project_id: int, export_format: Literal["csv", "xlsx"], db: Session = Depends(get_db)):
+    """匯出工程專案的契約項目（CSV 或 XLSX）
+
+    以伺服器端游標逐批讀取並串流輸出，匯出筆數不影響記憶體用量。
+    """
+    project = db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail=f"Project with id {project_id} not found")
+    
+    statement = (
+        select(*(getattr(ContractItem, field) for field, _ in exporter.EXPORT_COLUMNS))
+        .where(ContractItem.project_id == project_id)
+        .order_by(ContractItem.id)
+    )
+    media_type, render = exporter.EXPORT_FORMATS[export_format]
+    filename = f"{project.name}_合約項目清單.{export_format}"
+    return StreamingResponse(
+        render(exporter.iter_batches(db.get_bind(), statement)),
+        media_type=media_type,
+        headers={"Content-Disposition": exporter.content_disposition(filename)},
+    )
+
+async def read_request_body(request: Request) -> bytes:
+    """讀取原始請求內容（供同步端點在 threadpool 中處理）"""
+    return await request.body()
+
+def parse_bulk_rows(body: bytes, content_type: str) -> list:
+    """解析批量匯入的請求內容，回傳 (列號, 資料) 的列表
+
+    支援 JSON 陣列與 NDJSON（每行一筆）。列號從 1 開始，與工作簿匯入的
+    Excel 列號一致：JSON 陣列為第幾筆資料，NDJSON 為行號（含空白行）。
+    NDJSON 中無法解析的行會以字串形式保留，交由逐筆驗證回報錯誤。
+    內容不是有效的 UTF-8 時回傳 400。
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"請求內容不是有效的 UTF-8: {e}")
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append((line_number, json.loads(line)))
+            except json.JSONDecodeError:
+                rows.append((line_number, line))
+        return rows
+
+    try:
+        rows = json.loads(body or b"[]")
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"請求內容不是有效的 UTF-8: {e}")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"無效的 JSON: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="請求內容必須是 JSON 陣列")
+    return list(enumerate(rows, start=1))
+
+def validate_contract_item_rows(project_id: int, rows):
+    """逐筆驗證契約項目，回傳可寫入的資料與錯誤列表
+
+    rows 為 (列號, 資料) 的迭代器，錯誤以該列號回報。
+    """
+    valid_rows = []
+    errors = []
+    for index, row in rows:
+        if not isinstance(row, dict):
+            errors.append({"row": index, "detail": "每筆資料必須是 JSON 物件"})
+            continue
+        if row.get("project_id", project_id) != project_id:
+            errors.append({"row": index, "detail": "project_id 與路徑不符"})
+            continue
+        try:
+            item = schemas.ContractItemBase.model_validate(row)
+        except ValidationError as e:
+            detail = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            errors.append({"row": index, "detail": detail})
+            continue
+        valid_rows.append({**item.model_dump(), "project_id": project_id})
+    return valid_rows, errors
+
+@app.post("/projects/{project_id}/contract-items/bulk", response_model=schemas.ContractItemBulkResult, tags=["contract items"])
+def bulk_create_contract_items(
+    project_id: int,
+    request: Request,
+    body: bytes = Depends(read_request_body),
+    db: Session = Depends(get_db)
+):
+    """批量匯入契約項目
+
+    請求內容為 ContractItemCreate 的 JSON 陣列或 NDJSON。專案只驗證一次，
+    通過驗證的資料以單一 executemany 在同一個交易中寫入，
+    未通過的資料逐筆回報錯誤（列號從 1 開始）。
+    """
+    project = db.query(Project.id).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail=f"Project with id {project_id} not found")
+
+    rows = parse_bulk_rows(body, request.headers.get("content-type", ""))
+    valid_rows, errors = validate_contract_item_rows(project_id, rows)
+
+    if valid_rows:
+        try:
+            db.execute(insert(ContractItem), valid_rows)
+            db.commit()
+            cache.response_cache.invalidate(project_id)
+        except Exception as e:
+            db.rollback()
+            logger.exception("批量匯入契約項目失敗")
+            raise HTTPException(status_code=400, detail=f"批量匯入失敗: {str(e)}")
+
+    return {
+        "project_id": project_id,
+        "total": len(rows),
+        "inserted": len(valid_rows),
+        "failed": len(errors),
+        "errors": errors
+    }
+
+@app.post("/projects/{project_id}/contract-items/import", response_model=schemas.ContractItemBulkResult, tags=["contract items"])
+def import_contract_items(
+    project_id: int,
+    file: UploadFile = File(...),
+    column_mapping: Optional[str] = Form(None),
+    header_row: int = Form(1),
+    sheet: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """從 Excel/PCCES 工作簿匯入契約項目
+
+    工作簿以唯讀模式逐列解析，依 column_mapping（欄位名稱對應表頭的 JSON，
+    預設對應「契約設定模板.xls」）轉換後分批寫入，全部資料在同一個交易中完成。
+    錯誤以 Excel 列號回報。
+    """
+    project = db.query(Project.id).filter(Project.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail=f"Project with id {project_id} not found")
+
+    try:
+        mapping = json.loads(column_mapping) if column_mapping else None
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"無效的欄位映射: {e}")
+
+    total = 0
+    inserted = 0
+    errors = []
+    try:
+        rows = importer.iter_contract_items(
+            file.file, file.filename, column_mapping=mapping, header_row=header_row, sheet=sheet
+        )
+        for batch in importer.batched(rows, IMPORT_BATCH_SIZE):
+            valid_rows, batch_errors = validate_contract_item_rows(project_id, batch)
+            if valid_rows:
+                db.execute(insert(ContractItem), valid_rows)
+            total += len(batch)
+            inserted += len(valid_rows)
+            errors.extend(batch_errors)
+        db.commit()
+        cache.response_cache.invalidate(project_id)
+    except importer.ImportFormatError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        db.rollback()
+        logger.exception("匯入契約項目失敗")
+        raise HTTPException(status_code=400, detail=f"匯入失敗: {str(e)}")
+
+    return {
+        "project_id": project_id,
+        "total": total,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors
+    }
 
 @app.put("/contract-items/{item_id}", response_model=schemas.ContractItem, tags=["contract items"])
 def update_contract_item(item_id: int, item: schemas.ContractItemUpdate, db: Session = Depends(get_db)):
@@ -158,6 +518,7 @@ def update_contract_item(item_id: int, item: schemas.ContractItemUpdate, db: Ses
     
     db.commit()
     db.refresh(db_item)
+    cache.response_cache.invalidate(db_item.project_id)
     return db_item
 
 @app.delete("/contract-items/{item_id}", tags=["contract items"])
@@ -167,8 +528,10 @@ def delete_contract_item(item_id: int, db: Session = Depends(get_db)):
     if db_item is None:
         raise HTTPException(status_code=404, detail="Contract item not found")
         
+    project_id = db_item.project_id
     db.delete(db_item)
     db.commit()
+    cache.response_cache.invalidate(project_id)
     return {"message": "Contract item deleted successfully"}
 
 # Test endpoints
@@ -182,19 +545,34 @@ def create_test(test: schemas.TestCreate, db: Session = Depends(get_db)):
     db.add(db_test)
     db.commit()
     db.refresh(db_test)
+    cache.response_cache.invalidate(test.project_id)
     return db_test
 
 @app.get("/projects/{project_id}/tests/", response_model=List[schemas.Test], tags=["tests"])
-def read_project_tests(project_id: int, db: Session = Depends(get_db)):
-    """獲取特定工程專案的品質試驗記錄列表"""
-    tests = db.query(QualityTest).filter(QualityTest.project_id == project_id).all()
-    return tests
+@cache.cacheable
+def read_project_tests(
+    project_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取特定工程專案的品質試驗記錄列表（keyset 分頁）"""
+    query = db.query(QualityTest).filter(QualityTest.project_id == project_id)
+    return fast_json.paginate_list(query, schemas.Test, [QualityTest.id], cursor, limit, response)
 
 @app.get("/contract-items/{item_id}/tests/", response_model=List[schemas.Test], tags=["tests"])
-def read_contract_item_tests(item_id: int, db: Session = Depends(get_db)):
-    """獲取特定契約項目的品質試驗記錄列表"""
-    tests = db.query(QualityTest).filter(QualityTest.contract_item_id == item_id).all()
-    return tests
+@cache.cacheable
+def read_contract_item_tests(
+    item_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取特定契約項目的品質試驗記錄列表（keyset 分頁）"""
+    query = db.query(QualityTest).filter(QualityTest.contract_item_id == item_id)
+    return fast_json.paginate_list(query, schemas.Test, [QualityTest.id], cursor, limit, response)
 
 # Inspection endpoints
 @app.post("/inspections/", response_model=schemas.Inspection, tags=["inspections"])
@@ -204,13 +582,60 @@ def create_inspection(inspection: schemas.InspectionCreate, db: Session = Depend
     db.add(db_inspection)
     db.commit()
     db.refresh(db_inspection)
+    cache.response_cache.invalidate(inspection.project_id)
     return db_inspection
 
 @app.get("/projects/{project_id}/inspections/", response_model=List[schemas.Inspection], tags=["inspections"])
-def read_project_inspections(project_id: int, db: Session = Depends(get_db)):
-    """獲取特定工程專案的施工抽查記錄列表"""
-    inspections = db.query(Inspection).filter(Inspection.project_id == project_id).all()
-    return inspections
+@cache.cacheable
+def read_project_inspections(
+    project_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取特定工程專案的施工抽查記錄列表（依抽查時間排序，keyset 分頁）"""
+    query = db.query(Inspection).filter(Inspection.project_id == project_id)
+    return fast_json.paginate_list(query, schemas.Inspection, [Inspection.inspection_time, Inspection.id], cursor, limit, response)
+
+@app.delete("/inspections", response_model=schemas.InspectionBatchDeleteResult, tags=["inspections"])
+def delete_inspections(
+    background_tasks: BackgroundTasks,
+    ids: List[int] = Query(..., min_length=1, max_length=schemas.MAX_BATCH_IDS),
+    db: Session = Depends(get_db)
+):
+    """批次刪除施工抽查記錄與電子檔
+
+    抽查記錄以集合式 DELETE 在同一個交易中刪除，照片保留但解除與抽查表的關聯；
+    電子檔路徑寫入待刪除佇列，回應送出後再由背景工作刪除沒有其他記錄引用的檔案。
+    """
+    requested = sorted(set(ids))
+    rows = db.execute(
+        select(Inspection.id, Inspection.project_id).where(Inspection.id.in_(requested))
+    ).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Inspection not found")
+    found = [row.id for row in rows]
+    
+    db.execute(insert(FilePurge).from_select(
+        ["file_path"],
+        select(Inspection.file_path).where(Inspection.id.in_(found), Inspection.file_path.is_not(None)).distinct(),
+    ))
+    db.execute(
+        update(Photo).where(Photo.inspection_id.in_(found)).values(inspection_id=None),
+        execution_options={"synchronize_session": False},
+    )
+    db.execute(
+        delete(Inspection).where(Inspection.id.in_(found)),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+    for project_id in {row.project_id for row in rows}:
+        cache.response_cache.invalidate(project_id)
+    
+    background_tasks.add_task(storage.purge_files, db.get_bind())
+    found_ids = set(found)
+    return {"deleted": len(found), "not_found": [i for i in requested if i not in found_ids]}
 
 @app.delete("/inspections/{inspection_id}", tags=["inspections"])
 def delete_inspection(inspection_id: int, db: Session = Depends(get_db)):
@@ -219,8 +644,11 @@ def delete_inspection(inspection_id: int, db: Session = Depends(get_db)):
     if db_inspection is None:
         raise HTTPException(status_code=404, detail="Inspection not found")
     
+    file_path, project_id = db_inspection.file_path, db_inspection.project_id
     db.delete(db_inspection)
     db.commit()
+    cache.response_cache.invalidate(project_id)
+    storage.release_files(db, [file_path])
     return {"message": "Inspection deleted successfully"}
 
 # File handling endpoints (RESTful)
@@ -229,10 +657,10 @@ async def upload_inspection_file(
     file: UploadFile = File(...),
     project_id: int = Form(...),
     inspection_id: int = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """上傳施工抽查相關文件"""
-    print(f"project_id: {project_id}, inspection_id: {inspection_id}")
+    logger.debug("上傳抽查文件 project_id=%s inspection_id=%s", project_id, inspection_id)
     try:
         # 驗證文件類型
         file_extension = Path(file.filename).suffix.lower()
@@ -248,28 +676,22 @@ async def upload_inspection_file(
                 detail="必須提供 project_id"
             )
         
-        # 創建基於專案ID的子目錄
-        project_dir = UPLOAD_DIR / f"project_{project_id}"
-        project_dir.mkdir(exist_ok=True)
+        # 分塊保存文件（以內容的 SHA-256 命名，重複上傳不會另存一份）
+        stored = await store_upload(file)
+        file_path = stored.path
         
-        # 生成唯一的文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_filename = f"inspection_{inspection_id}_{timestamp}{file_extension}"
-        file_path = project_dir / unique_filename
-        
-        # 保存文件
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # 更新數據庫中的文件路徑
+        # 更新數據庫中的文件路徑，並釋放不再被引用的舊文件
         if inspection_id:
-            inspection = db.query(Inspection).filter(Inspection.id == inspection_id).first()
+            inspection = await db.get(Inspection, inspection_id)
             if inspection:
-                inspection.file_path = str(file_path)
-                db.commit()
+                old_path = inspection.file_path
+                inspection.file_path = file_path
+                await db.commit()
+                cache.response_cache.invalidate(inspection.project_id)
+                if old_path != file_path:
+                    await storage.release_files_async(db, [old_path], engine)
         
-        return {"filename": unique_filename, "file_path": str(file_path)}
+        return {"filename": inspection_filename(inspection_id, file_path), "file_path": file_path}
     
     except HTTPException as he:
         raise he
@@ -281,29 +703,61 @@ async def upload_inspection_file(
 
 
 @app.get("/inspection-files/{inspection_id}", tags=["files"])
-async def download_inspection_file(inspection_id: int, db: Session = Depends(get_db)):
-    """下載施工抽查相關文件"""
-    inspection = db.query(Inspection).filter(Inspection.id == inspection_id).first()
+async def download_inspection_file(
+    inspection_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """下載施工抽查相關文件（支援 ETag/If-None-Match 與 Range）"""
+    inspection = await db.get(Inspection, inspection_id)
     if not inspection or not inspection.file_path:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="找不到指定的文件"
         )
     
-    file_path = Path(inspection.file_path)
-    if not file_path.exists():
+    try:
+        return await run_in_threadpool(
+            storage.conditional_file_response,
+            request,
+            inspection.file_path,
+            storage.INSPECTION_FILE_CACHE_CONTROL,
+            media_type="application/octet-stream",
+            filename=inspection_filename(inspection_id, inspection.file_path),
+        )
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="文件不存在"
         )
-    
-    return FileResponse(
-        path=file_path,
-        filename=file_path.name,
-        media_type="application/octet-stream"
-    )
 
 
+@app.post("/inspection-files/archive", tags=["files"])
+def download_inspection_files_archive(selection: schemas.InspectionIds, db: Session = Depends(get_db)):
+    """將多個施工抽查文件打包成 ZIP 下載
+
+    ZIP 邊讀取檔案邊送出，不會先在記憶體或磁碟上組成整個壓縮檔。
+    沒有電子檔或檔案已不存在的抽查記錄列在 X-Skipped-Ids 標頭。
+    """
+    rows = db.execute(
+        select(Inspection.id, Inspection.file_path)
+        .where(Inspection.id.in_(selection.ids), Inspection.file_path.is_not(None))
+        .order_by(Inspection.id)
+    ).all()
+    available = [row for row in rows if os.path.isfile(row.file_path)]
+    if not available:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="找不到指定的文件"
+        )
+    
+    entries = [(inspection_filename(row.id, row.file_path), row.file_path) for row in available]
+    skipped = sorted(set(selection.ids) - {row.id for row in available})
+    headers = {"Content-Disposition": 'attachment; filename="inspections.zip"'}
+    if skipped:
+        headers["X-Skipped-Ids"] = ",".join(map(str, skipped))
+    return StreamingResponse(zipstream.iter_zip(entries), media_type="application/zip", headers=headers)
+
 @app.delete("/inspection-files/{inspection_id}", tags=["files"])
 def delete_inspection_file(inspection_id: int, db: Session = Depends(get_db)):
     """刪除施工抽查相關文件"""
@@ -314,13 +768,12 @@ def delete_inspection_file(inspection_id: int, db: Session = Depends(get_db)):
             detail="找不到指定的文件"
         )
     
-    file_path = Path(inspection.file_path)
-    if file_path.exists():
-        file_path.unlink()
-    
-    # 清空數據庫中的文件路徑
+    # 清空數據庫中的文件路徑，沒有其他記錄引用時才刪除文件
+    file_path = inspection.file_path
     inspection.file_path = None
     db.commit()
+    cache.response_cache.invalidate(inspection.project_id)
+    storage.release_files(db, [file_path])
     
     return {"message": "文件刪除成功"}
 
@@ -328,12 +781,13 @@ def delete_inspection_file(inspection_id: int, db: Session = Depends(get_db)):
 
 @app.post("/photos/upload/", response_model=schemas.Photo, tags=["photos"])
 async def upload_photo(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     project_id: int = Form(...),
     quality_test_id: Optional[str] = Form(None),  
     inspection_id: Optional[int] = Form(None),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """上傳單張照片並關聯到專案、品質試驗或施工抽查"""
     
@@ -355,43 +809,39 @@ async def upload_photo(
                 detail="quality_test_id 必須是有效的整數"
             )
     
-    # 建立照片儲存目錄
-    photos_dir = UPLOAD_DIR / "photos"
-    photos_dir.mkdir(exist_ok=True)
-    
-    # 生成唯一的檔案名稱
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    new_filename = f"{timestamp}_{file.filename}"
-    file_path = photos_dir / new_filename
-    
     # 處理照片
-    file_path_str = await process_uploaded_photo(file, file_path)
+    file_path_str = await process_uploaded_photo(file)
     
     # 建立照片記錄
     photo_data = {
         "project_id": project_id,
         "quality_test_id": quality_test_id_int,
         "inspection_id": inspection_id,
-        "filename": new_filename,
+        "filename": original_filename(file),
         "file_path": file_path_str,
         "description": description
     }
     
     db_photo = Photo(**photo_data)
     db.add(db_photo)
-    db.commit()
-    db.refresh(db_photo)
+    await db.commit()
+    await db.refresh(db_photo)
+    cache.response_cache.invalidate(project_id)
+    
+    # 回應送出後在背景預先產生縮圖
+    background_tasks.add_task(thumbnails.generate_thumbnails, [file_path_str])
     
     return db_photo
 
 @app.post("/photos/bulk-upload/", response_model=List[schemas.Photo], tags=["photos"])
 async def bulk_upload_photos(
+    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     project_id: int = Form(...),
     quality_test_id: Optional[str] = Form(None),  
     inspection_id: Optional[int] = Form(None),
     description: Optional[str] = Form(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """批量上傳多張照片"""
     
@@ -406,56 +856,93 @@ async def bulk_upload_photos(
                 detail="quality_test_id 必須是有效的整數"
             )
     
-    photos_dir = UPLOAD_DIR / "photos"
-    photos_dir.mkdir(exist_ok=True)
+    # 驗證檔案類型
+    images = [file for file in files if file.content_type and file.content_type.startswith('image/')]
+    if not images:
+        return []
     
-    uploaded_photos = []
+    # 以有上限的並行數寫入檔案，內容相同的檔案共用同一份
+    semaphore = asyncio.Semaphore(BULK_UPLOAD_WORKERS)
     
-    for file in files:
-        # 驗證檔案類型
-        if not file.content_type.startswith('image/'):
-            continue
-        
-        # 生成唯一的檔案名稱
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        new_filename = f"{timestamp}_{file.filename}"
-        file_path = photos_dir / new_filename
-        
-        # 處理照片
-        file_path_str = await process_uploaded_photo(file, file_path)
-        
-        # 建立照片記錄
-        photo_data = {
+    async def save(file: UploadFile) -> dict:
+        async with semaphore:
+            file_path_str = await process_uploaded_photo(file)
+        return {
             "project_id": project_id,
             "quality_test_id": quality_test_id_int,
             "inspection_id": inspection_id,
-            "filename": new_filename,
+            "filename": original_filename(file),
             "file_path": file_path_str,
             "description": description
         }
-        
-        db_photo = Photo(**photo_data)
-        db.add(db_photo)
-        uploaded_photos.append(db_photo)
     
-    db.commit()
-    for photo in uploaded_photos:
-        db.refresh(photo)
+    results = await asyncio.gather(*(save(file) for file in images), return_exceptions=True)
+    photo_rows = [r for r in results if not isinstance(r, BaseException)]
+    failures = [r for r in results if isinstance(r, BaseException)]
+    if failures:
+        # 任何一個檔案失敗就釋放已寫入且未被引用的檔案，避免留下孤兒檔案
+        # （寬限期內的檔案可能正被其他上傳共用，留待之後清理）
+        await storage.release_files_async(db, [row["file_path"] for row in photo_rows], engine)
+        raise failures[0]
     
-    return uploaded_photos
+    # 以單一 INSERT ... RETURNING 寫入所有照片記錄，不需逐筆 refresh
+    # （SQLite 要求依參數順序回傳時會退回逐筆 INSERT；同一語句內 id 依插入順序遞增，
+    # 且重複內容的 file_path 相同，因此依 id 排序對回上傳順序）
+    result = await db.scalars(insert(Photo).returning(Photo), photo_rows)
+    photos = sorted(result.all(), key=lambda photo: photo.id)
+    await db.commit()
+    cache.response_cache.invalidate(project_id)
+    
+    # 回應送出後在背景預先產生縮圖
+    background_tasks.add_task(thumbnails.generate_thumbnails, [row["file_path"] for row in photo_rows])
+    
+    return photos
 
 @app.get("/photos/{photo_id}/view", response_class=FileResponse, tags=["photos"])
-async def view_photo(photo_id: int, db: Session = Depends(get_db)):
-    """查看特定照片"""
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+async def view_photo(photo_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """查看特定照片（支援 ETag/If-None-Match 與 Range）"""
+    photo = await db.get(Photo, photo_id)
     if photo is None:
         raise HTTPException(status_code=404, detail="照片不存在")
     
-    file_path = Path(photo.file_path)
-    if not file_path.exists():
+    try:
+        return await run_in_threadpool(
+            storage.conditional_file_response, request, photo.file_path, storage.PHOTO_CACHE_CONTROL
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="照片檔案不存在")
+
+@app.get("/photos/{photo_id}/thumbnail", response_class=FileResponse, tags=["photos"])
+async def view_photo_thumbnail(
+    photo_id: int,
+    request: Request,
+    size: int = thumbnails.DEFAULT_THUMBNAIL_SIZE,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """查看特定照片的縮圖（固定尺寸，第一次請求時產生並快取）"""
+    if size not in thumbnails.THUMBNAIL_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支援的縮圖尺寸。允許的尺寸: {', '.join(map(str, thumbnails.THUMBNAIL_SIZES))}"
+        )
     
-    return FileResponse(file_path)
+    photo = await db.get(Photo, photo_id)
+    if photo is None:
+        raise HTTPException(status_code=404, detail="照片不存在")
+    
+    try:
+        thumbnail_path = await run_in_threadpool(thumbnails.get_thumbnail, photo.file_path, size)
+        return await run_in_threadpool(
+            storage.conditional_file_response,
+            request,
+            thumbnail_path,
+            storage.THUMBNAIL_CACHE_CONTROL,
+            media_type=thumbnails.THUMBNAIL_MEDIA_TYPE,
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="照片檔案不存在")
+    except thumbnails.ThumbnailError:
+        raise HTTPException(status_code=415, detail="無法產生此檔案的縮圖")
 
 @app.put("/photos/{photo_id}", response_model=schemas.Photo, tags=["photos"])
 def update_photo(photo_id: int, photo: schemas.PhotoUpdate, db: Session = Depends(get_db)):
@@ -470,31 +957,43 @@ def update_photo(photo_id: int, photo: schemas.PhotoUpdate, db: Session = Depend
     
     db.commit()
     db.refresh(db_photo)
+    cache.response_cache.invalidate(db_photo.project_id)
     return db_photo
 
 @app.get("/projects/{project_id}/photos/", response_model=List[schemas.Photo], tags=["photos"])
-def read_project_photos(project_id: int, db: Session = Depends(get_db)):
-    """獲取特定工程專案的圖片列表"""
-    photos = db.query(Photo).filter(Photo.project_id == project_id).all()
-    return photos
+@cache.cacheable
+def read_project_photos(
+    project_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """獲取特定工程專案的圖片列表（keyset 分頁）"""
+    query = db.query(Photo).filter(Photo.project_id == project_id)
+    return fast_json.paginate_list(query, schemas.Photo, [Photo.id], cursor, limit, response)
 
 @app.get("/inspections/{inspection_id}/photos", response_model=List[schemas.Photo], tags=["photos"])
+@cache.cacheable
 async def get_inspection_photos(
     inspection_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """獲取特定施工抽查表下的所有照片"""
+    """獲取特定施工抽查表下的照片（keyset 分頁）"""
     # 檢查施工抽查表是否存在
-    inspection = db.query(Inspection).filter(Inspection.id == inspection_id).first()
+    inspection = await db.get(Inspection, inspection_id)
     if inspection is None:
         raise HTTPException(
             status_code=404,
             detail="施工抽查表不存在"
         )
     
-    # 獲取該施工抽查表下的所有照片
-    photos = db.query(Photo).filter(Photo.inspection_id == inspection_id).all()
-    return photos
+    # 獲取該施工抽查表下的照片
+    stmt = select(Photo).where(Photo.inspection_id == inspection_id)
+    return await fast_json.paginate_list_async(db, stmt, schemas.Photo, [Photo.id], cursor, limit, response)
 
 @app.delete("/photos/{photo_id}", tags=["photos"])
 def delete_photo(photo_id: int, db: Session = Depends(get_db)):
@@ -503,6 +1002,69 @@ def delete_photo(photo_id: int, db: Session = Depends(get_db)):
     if db_photo is None:
         raise HTTPException(status_code=404, detail="Photo not found")
         
+    file_path, project_id = db_photo.file_path, db_photo.project_id
     db.delete(db_photo)
     db.commit()
-    return {"message": "Photo deleted successfully"}
\ No newline at end of file
+    cache.response_cache.invalidate(project_id)
+    storage.release_files(db, [file_path])
+    return {"message": "Photo deleted successfully"}
+
+## 全文檢索
+
+@app.get("/search", response_model=List[schemas.SearchHit], tags=["search"])
+def search_all(
+    response: Response,
+    q: str = Query(..., min_length=1, description="檢索字詞，以空白分隔的字詞須全部符合"),
+    project_id: Optional[int] = None,
+    types: Optional[List[str]] = Query(None, description="限定資料類型：project、contract_item、inspection、photo"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """檢索工程專案、契約項目、施工抽查與照片描述（依相關度排序，keyset 分頁）"""
+    if types:
+        unknown = set(types) - set(search.SEARCH_ENTITIES)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支援的資料類型: {', '.join(sorted(unknown))}")
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="請輸入檢索字詞")
+    return search.search(db, q, response, limit, cursor=cursor, project_id=project_id, types=types)
+
+## 上傳目錄與資料庫的比對
+
+@app.post("/admin/reconcile", response_model=schemas.ReconcileReport, tags=["admin"])
+def reconcile_storage(
+    delete_orphans: bool = False,
+    fix_dangling: bool = False,
+    force: bool = False,
+    db: Session = Depends(get_db)
+):
+    """比對上傳目錄與資料庫，找出孤兒檔案與懸空引用（預設只產生報告）
+
+    上傳目錄不存在或懸空引用的比例過高時回傳 409，確認無誤後以 force 執行。
+    """
+    try:
+        report = reconcile.reconcile(db, delete_orphans=delete_orphans, fix_dangling=fix_dangling, force=force)
+    except reconcile.ReconcileRefused as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if report.deleted_photos or report.cleared_inspections:
+        cache.response_cache.clear()
+    return report
+
+## 回應快取
+
+@app.get("/admin/cache", response_model=schemas.CacheStats, tags=["admin"])
+def read_cache_stats():
+    """回應快取的命中率、大小與淘汰次數"""
+    return cache.response_cache.stats()
+
+@app.delete("/admin/cache", response_model=schemas.CacheStats, tags=["admin"])
+def clear_cache():
+    """清除回應快取（直接修改資料庫之後使用）"""
+    cache.response_cache.clear()
+    return cache.response_cache.stats()
+
+@app.get("/metrics", tags=["admin"])
+def read_metrics():
+    """Prometheus 文字格式的監控指標（路由延遲、資料庫查詢與連線池、上傳下載流量、快取命中率）"""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,411 @@
+"""Prometheus 格式的監控指標
+
+GET /metrics 以 Prometheus 文字格式（0.0.4）輸出，不依賴 prometheus_client：
+
+- http_request_duration_seconds：各路由（路徑樣板，例如 /projects/{project_id}）、
+  方法與狀態碼的回應時間直方圖；http_requests_in_progress：處理中的請求數
+- http_request_body_bytes_total / http_response_body_bytes_total：各路由收到與
+  送出的內容位元組數（上傳與下載端點的流量）
+- db_queries_per_request / db_query_seconds_per_request：每個請求執行的 SQL 數與
+  查詢時間，以 Engine 的 cursor 事件累計在請求的 contextvar 中
+- db_pool_checkouts_total / db_pool_checkout_wait_seconds / db_pool_connections：
+  連線池取得連線的次數、等待時間（含新建連線）與目前的連線數
+- cache_hits_total / cache_misses_total / cache_hit_ratio 等：以 register_cache
+  登記的快取統計
+
+指標只保存在單一行程內，以多個 worker 執行時需各自抓取。METRICS_ENABLED=0 時
+不加入中介層，也不掛上資料庫事件。
+"""
+import logging
+import os
+import threading
+import weakref
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 沒有對應路由的請求（404）共用一個標籤，避免任意路徑造成大量時間序列
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterValue:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+
+class _Metric:
+    """一個指標（同名的一組時間序列），以標籤值取得各時間序列"""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self, values: tuple, child) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._samples(values, child))
+        return lines
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self, values: tuple, child) -> List[str]:
+        with child._lock:
+            counts, total = list(child.counts), child.sum
+        bucket_names = self.labelnames + ("le",)
+        labels = _format_labels(self.labelnames, values)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            bucket_labels = _format_labels(bucket_names, values + (_format_value(float(bound)),))
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# 已登記的指標；render() 依序輸出，另加上 register_collector 登記的即時統計
+REGISTRY: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP 請求處理時間（秒）", ("method", "route", "status")
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "處理中的 HTTP 請求數", ("method",))
+HTTP_REQUEST_BYTES = Counter(
+    "http_request_body_bytes_total", "收到的請求內容位元組數", ("method", "route")
+)
+HTTP_RESPONSE_BYTES = Counter(
+    "http_response_body_bytes_total", "送出的回應內容位元組數", ("method", "route")
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "每個請求執行的 SQL 數", ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+)
+DB_QUERY_SECONDS_PER_REQUEST = Histogram(
+    "db_query_seconds_per_request", "每個請求執行 SQL 的總時間（秒）", ("method", "route")
+)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "從連線池取得連線的次數", ("pool",))
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "從連線池取得連線的等待時間（秒，含新建連線）", ("pool",),
+    buckets=POOL_WAIT_BUCKETS,
+)
+
+
+def register_collector(collector: Callable[[], Iterable[str]]):
+    """登記在輸出時才讀取的統計，collector 回傳 Prometheus 文字格式的各行"""
+    _collectors.append(collector)
+    return collector
+
+
+def render() -> str:
+    """以 Prometheus 文字格式輸出所有指標"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+## 每個請求的統計
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds", "request_bytes", "response_bytes", "status", "done")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.status = 500
+        # 回應送完後設為 True，之後背景工作執行的 SQL 不再計入
+        self.done = False
+
+
+# 目前請求的統計；run_in_threadpool 與 asyncio 驅動的 greenlet 都會沿用這個 context
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+class MetricsMiddleware:
+    """量測每個請求的處理時間、內容位元組數與 SQL 數
+
+    放在最外層，回應快取命中與請求大小限制回傳的 413 也會被量測。路由以
+    FastAPI 比對後寫入 scope 的 route 取得路徑樣板。送出最後一段回應內容時
+    就記錄指標；Starlette 的 BackgroundTasks 在那之後才執行，不計入請求。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _current_request.set(stats)
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                stats.request_bytes += len(message.get("body", b""))
+            return message
+
+        in_progress = HTTP_REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = perf_counter()
+
+        def finish():
+            if stats.done:
+                return
+            stats.done = True
+            elapsed = perf_counter() - start
+            in_progress.dec()
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            HTTP_REQUEST_DURATION.labels(method, route, str(stats.status)).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(method, route).observe(stats.queries)
+            DB_QUERY_SECONDS_PER_REQUEST.labels(method, route).observe(stats.query_seconds)
+            if stats.request_bytes:
+                HTTP_REQUEST_BYTES.labels(method, route).inc(stats.request_bytes)
+            if stats.response_bytes:
+                HTTP_RESPONSE_BYTES.labels(method, route).inc(stats.response_bytes)
+
+        async def counting_send(message):
+            if message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            elif message["type"] == "http.response.start":
+                stats.status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish()
+
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            # 沒有送完回應（例外或中斷連線）時在這裡記錄
+            finish()
+            _current_request.reset(token)
+
+
+## 資料庫
+
+_QUERY_START = "metrics_query_start"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info[_QUERY_START] = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop(_QUERY_START, None)
+    stats = _current_request.get()
+    if stats is not None and not stats.done and started is not None:
+        stats.queries += 1
+        stats.query_seconds += perf_counter() - started
+
+
+if METRICS_ENABLED:
+    # 掛在 Engine 類別上，所有引擎（含 asyncio 引擎底層的同步引擎）都會計入
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+_pools: "weakref.WeakSet[QueuePool]" = weakref.WeakSet()
+
+
+class TimedQueuePool(QueuePool):
+    """記錄取得連線次數與等待時間的 QueuePool（SQLAlchemy 沒有等待連線的事件）"""
+
+    metrics_label = "sync"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _pools.add(self)
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(self.metrics_label).observe(perf_counter() - start)
+        DB_POOL_CHECKOUTS.labels(self.metrics_label).inc()
+        return connection
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+# SQLAlchemy 以類別所在的模組命名連線池的 logger，這裡與 sqlalchemy.pool 相同
+# 預設只輸出警告，不讓連線池的 INFO 訊息混入應用程式的日誌
+for _pool_class in (TimedQueuePool, TimedAsyncAdaptedQueuePool):
+    _pool_logger = logging.getLogger(f"{__name__}.{_pool_class.__name__}")
+    if _pool_logger.level == logging.NOTSET:
+        _pool_logger.setLevel(logging.WARNING)
+
+
+def timed_pool_class(is_async: bool = False):
+    """建立引擎時使用的連線池類別；停用指標時回傳 None（沿用 SQLAlchemy 的預設）"""
+    if not METRICS_ENABLED:
+        return None
+    return TimedAsyncAdaptedQueuePool if is_async else TimedQueuePool
+
+
+@register_collector
+def _collect_pools() -> List[str]:
+    totals: Dict[Tuple[str, str], int] = {}
+    for pool in list(_pools):
+        for state, value in (
+            ("checked_out", pool.checkedout()),
+            ("idle", pool.checkedin()),
+            ("overflow", max(pool.overflow(), 0)),
+        ):
+            key = (pool.metrics_label, state)
+            totals[key] = totals.get(key, 0) + value
+    lines = [
+        "# HELP db_pool_connections 連線池目前的連線數",
+        "# TYPE db_pool_connections gauge",
+    ]
+    for (label, state), value in sorted(totals.items()):
+        lines.append(f"db_pool_connections{_format_labels(('pool', 'state'), (label, state))} {value}")
+    return lines
+
+
+## 快取
+
+_caches: List[Tuple[str, Callable[[], dict]]] = []
+
+CACHE_FIELDS = [
+    ("hits", "cache_hits_total", "counter", "快取命中次數"),
+    ("misses", "cache_misses_total", "counter", "快取未命中次數"),
+    ("hit_ratio", "cache_hit_ratio", "gauge", "快取命中率（命中 / 查詢次數）"),
+    ("evictions", "cache_evictions_total", "counter", "因超過容量而刪除的項目數"),
+    ("entries", "cache_entries", "gauge", "快取中的項目數"),
+    ("bytes", "cache_bytes", "gauge", "快取使用的位元組數"),
+]
+
+
+def register_cache(name: str, stats: Callable[[], dict]):
+    """登記快取的統計函式，回傳的 dict 需有 hits 與 misses，其他欄位可省略"""
+    _caches.append((name, stats))
+
+
+@register_collector
+def _collect_caches() -> List[str]:
+    snapshots = []
+    for name, stats in _caches:
+        values = dict(stats())
+        lookups = values.get("hits", 0) + values.get("misses", 0)
+        values["hit_ratio"] = values["hits"] / lookups if lookups else 0.0
+        snapshots.append((name, values))
+
+    lines = []
+    for field, metric, metric_type, documentation in CACHE_FIELDS:
+        samples = [(name, values[field]) for name, values in snapshots if values.get(field) is not None]
+        if not samples:
+            continue
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} {metric_type}")
+        for name, value in samples:
+            lines.append(f"{metric}{_format_labels(('cache',), (name,))} {_format_value(value)}")
+    return lines
@@ -0,0 +1,148 @@
+"""啟動時的資料庫結構檢查
+
+以 Alembic 記錄在 alembic_version 資料表中的版本判斷資料庫結構是否為最新：
+
+- 版本與 SCHEMA_REVISION 相同：不做任何事，只需要一次查詢，也不載入 Alembic
+- 全新的資料庫：以 create_all 建立資料表、索引、觸發程序與 FTS5 索引，再寫入版本
+- 版本不同：以 Alembic 執行 upgrade head
+- 有資料表但沒有版本紀錄（導入 Alembic 之前以 create_all 建立的資料庫）：資料表與
+  初始版本 INITIAL_REVISION 相同時，記錄為初始版本後以 Alembic 執行 upgrade head，
+  補建索引、統計摘要與 FTS5 索引；結構無法辨識時只以 create_all 補建缺少的資料表並
+  提出警告（已存在的資料表不會觸發 after_create，觸發程序與 FTS5 索引不會建立）
+
+Alembic 與遷移腳本只在需要升級時才載入；容器映像檔沒有 alembic/ 目錄時，
+全新與已是最新版本的資料庫仍可正常啟動。
+"""
+import logging
+import os
+from pathlib import Path
+
+from sqlalchemy import Column, MetaData, PrimaryKeyConstraint, String, Table, delete, insert, inspect, select
+
+import search  # noqa: F401  註冊 FTS5 索引的 DDL，create_all 時一併建立
+from database import Base, ensure_sqlite_directory
+
+logger = logging.getLogger(__name__)
+
+# 目前模型對應的 Alembic 版本（新增遷移時一併更新，tests/test_migrations.py 會檢查）
+SCHEMA_REVISION = "5a9f2c7e3b18"
+
+ALEMBIC_CONFIG = Path(os.getenv("ALEMBIC_CONFIG", str(Path(__file__).resolve().parent.parent / "alembic.ini")))
+
+# 導入 Alembic 之前，程式啟動時以 create_all 建立的結構即為初始版本
+INITIAL_REVISION = "85305a3975e8"
+INITIAL_TABLES = {
+    "projects": {"id", "name", "contract_number", "contractor", "location", "created_at", "updated_at"},
+    "contract_items": {
+        "id", "project_id", "pcces_code", "name", "unit", "quantity", "unit_price", "total_price",
+        "created_at", "updated_at",
+    },
+    "tests": {
+        "id", "project_id", "contract_item_id", "name", "test_item", "test_sets", "test_result",
+        "created_at", "updated_at",
+    },
+    "inspections": {
+        "id", "project_id", "name", "inspection_time", "location", "file_path", "is_pass",
+        "created_at", "updated_at",
+    },
+    "photos": {
+        "id", "project_id", "inspection_id", "quality_test_id", "filename", "file_path", "description",
+        "created_at", "updated_at",
+    },
+}
+
+# 與 Alembic 建立的版本資料表相同
+alembic_version = Table(
+    "alembic_version",
+    MetaData(),
+    Column("version_num", String(32), nullable=False),
+    PrimaryKeyConstraint("version_num", name="alembic_version_pkc"),
+)
+
+
+def current_revision(connection):
+    """資料庫目前的 Alembic 版本，沒有版本資料表時回傳 None"""
+    if not inspect(connection).has_table(alembic_version.name):
+        return None
+    return connection.execute(select(alembic_version.c.version_num)).scalar()
+
+
+def matches_initial_schema(connection) -> bool:
+    """資料表是否與初始版本相同（沒有其他資料表，且各資料表具有初始版本的欄位）"""
+    inspector = inspect(connection)
+    if set(inspector.get_table_names()) - {alembic_version.name} != set(INITIAL_TABLES):
+        return False
+    return all(
+        columns <= {column["name"] for column in inspector.get_columns(table)}
+        for table, columns in INITIAL_TABLES.items()
+    )
+
+
+def stamp(connection, revision):
+    """記錄資料庫目前的版本（與 alembic stamp 相同）"""
+    alembic_version.create(connection, checkfirst=True)
+    connection.execute(delete(alembic_version))
+    connection.execute(insert(alembic_version).values(version_num=revision))
+
+
+def create_schema(engine):
+    """建立全部資料表並記錄為目前的版本"""
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        stamp(connection, SCHEMA_REVISION)
+
+
+def upgrade(engine, from_revision=None):
+    """以 Alembic 將資料庫升級到最新版本（沿用 engine 的連線，不另外讀取 sqlalchemy.url）
+
+    from_revision：先將沒有版本紀錄的資料庫記錄為此版本再升級
+    """
+    if not ALEMBIC_CONFIG.is_file():
+        raise RuntimeError(
+            f"資料庫結構需要升級到 {SCHEMA_REVISION}，但找不到 {ALEMBIC_CONFIG}；"
+            "請設定 ALEMBIC_CONFIG 指向 alembic.ini 或先執行 alembic upgrade head"
+        )
+
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_CONFIG))
+    script_location = config.get_main_option("script_location")
+    config.set_main_option("script_location", str(ALEMBIC_CONFIG.parent / script_location))
+    with engine.begin() as connection:
+        if from_revision is not None:
+            stamp(connection, from_revision)
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+
+def prepare_database(engine) -> str:
+    """確認資料庫結構為最新版本，回傳採取的動作（current/created/upgraded/unversioned）"""
+    ensure_sqlite_directory(engine.url)
+    with engine.connect() as connection:
+        revision = current_revision(connection)
+        has_tables = bool(set(inspect(connection).get_table_names()) - {alembic_version.name})
+        initial = revision is None and has_tables and matches_initial_schema(connection)
+
+    if revision == SCHEMA_REVISION:
+        return "current"
+    if not has_tables:
+        create_schema(engine)
+        logger.info("已建立資料庫結構（版本 %s）", SCHEMA_REVISION)
+        return "created"
+    if initial:
+        upgrade(engine, from_revision=INITIAL_REVISION)
+        logger.info("已將沒有版本紀錄的資料庫從初始版本 %s 升級到 %s", INITIAL_REVISION, SCHEMA_REVISION)
+        return "upgraded"
+    if revision is None:
+        Base.metadata.create_all(engine)
+        logger.warning(
+            "資料庫沒有 Alembic 版本紀錄，資料表也與初始版本 %s 不同，只以 create_all 補建缺少的資料表；"
+            "既有資料表的索引、觸發程序與 FTS5 索引不會建立。請確認結構對應的版本，"
+            "以 alembic stamp <版本> 記錄後再執行 alembic upgrade head",
+            INITIAL_REVISION,
+        )
+        return "unversioned"
+    upgrade(engine)
+    logger.info("已將資料庫從版本 %s 升級到 %s", revision, SCHEMA_REVISION)
+    return "upgraded"
@@ -3,7 +3,7 @@
 # 2. 優化了關聯關係的定義
 # 3. 添加了中文註釋以提高可讀性
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, DDL, event, text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -30,9 +30,12 @@ class Project(Base):
 class ContractItem(Base):
     """契約項目模型"""
     __tablename__ = "contract_items"
+    __table_args__ = (
+        Index("ix_contract_items_project_id_pcces_code", "project_id", "pcces_code"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
     pcces_code = Column(String, index=True, comment="PCCES編號")
     name = Column(String, comment="項目名稱")
     unit = Column(String, comment="單位")
@@ -55,8 +58,8 @@ class QualityTest(Base):
     __tablename__ = "tests"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    contract_item_id = Column(Integer, ForeignKey("contract_items.id"))
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    contract_item_id = Column(Integer, ForeignKey("contract_items.id"), index=True)
     name = Column(String, comment="自定義試驗名稱")
     test_item = Column(String, comment="對應試驗項目")
     test_sets = Column(Integer, comment="試驗組數")
@@ -72,13 +75,16 @@ class QualityTest(Base):
 class Inspection(Base):
     """施工抽查紀錄模型"""
     __tablename__ = "inspections"
+    __table_args__ = (
+        Index("ix_inspections_project_id_inspection_time", "project_id", "inspection_time"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
     name = Column(String, comment="抽查表名稱")
     inspection_time = Column(DateTime, comment="抽查時間")
     location = Column(String, comment="抽查地點")
-    file_path = Column(String, comment="電子檔路徑")
+    file_path = Column(String, index=True, comment="電子檔路徑")
     is_pass=Column(String, comment="是否合格")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -92,11 +98,11 @@ class Photo(Base):
     __tablename__ = "photos"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id"))
-    inspection_id = Column(Integer, ForeignKey("inspections.id"), nullable=True)
-    quality_test_id = Column(Integer, ForeignKey("tests.id"), nullable=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), index=True)
+    inspection_id = Column(Integer, ForeignKey("inspections.id"), nullable=True, index=True)
+    quality_test_id = Column(Integer, ForeignKey("tests.id"), nullable=True, index=True)
     filename = Column(String, comment="檔案名稱")
-    file_path = Column(String, comment="圖片路徑")
+    file_path = Column(String, index=True, comment="圖片路徑")
     description = Column(String, nullable=True, comment="圖片描述")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -106,3 +112,95 @@ class Photo(Base):
     inspection = relationship("Inspection", back_populates="photos")
     quality_test = relationship("QualityTest", back_populates="photos")
     # contract_item = relationship("ContractItem", back_populates="photos")
+
+class FilePurge(Base):
+    """待刪除檔案佇列
+
+    刪除工程專案時，關聯檔案的路徑在同一交易中寫入此表，
+    再由背景工作分批確認沒有其他記錄引用後刪除檔案。
+    """
+    __tablename__ = "file_purge_queue"
+
+    id = Column(Integer, primary_key=True)
+    file_path = Column(String, nullable=False, comment="待刪除的檔案路徑")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ProjectSummary(Base):
+    """工程專案摘要
+
+    由 SQLite 觸發程序在契約項目、品質試驗、施工抽查與照片寫入時增量更新，
+    讀取摘要只需查詢一筆資料，不必彙總整個專案。
+    """
+    __tablename__ = "project_summaries"
+
+    project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
+    item_count = Column(Integer, nullable=False, server_default=text("0"), comment="契約項目數")
+    total_contract_value = Column(Float, nullable=False, server_default=text("0"), comment="契約總價")
+    test_count = Column(Integer, nullable=False, server_default=text("0"), comment="品質試驗數")
+    test_set_total = Column(Integer, nullable=False, server_default=text("0"), comment="試驗組數合計")
+    inspection_count = Column(Integer, nullable=False, server_default=text("0"), comment="施工抽查數")
+    inspection_pass_count = Column(Integer, nullable=False, server_default=text("0"), comment="合格的施工抽查數")
+    photo_count = Column(Integer, nullable=False, server_default=text("0"), comment="照片數")
+    last_activity_at = Column(DateTime, comment="最後異動時間")
+
+# 各資料表對摘要欄位的增量（{row} 代入 NEW 或 OLD）
+# is_pass 以字串儲存，布林值寫入後為 '1' / '0'
+SUMMARY_DELTAS = {
+    "contract_items": {"item_count": "1", "total_contract_value": "COALESCE({row}.total_price, 0)"},
+    "tests": {"test_count": "1", "test_set_total": "COALESCE({row}.test_sets, 0)"},
+    "inspections": {
+        "inspection_count": "1",
+        "inspection_pass_count": "(COALESCE(lower({row}.is_pass), '') IN ('1', 'true'))",
+    },
+    "photos": {"photo_count": "1"},
+}
+
+def summary_trigger_ddl(table: str) -> list:
+    """產生維護 project_summaries 的觸發程序
+
+    新增時以 UPSERT 累加（摘要列不存在時建立），刪除時扣回；
+    更新時先扣回舊值再累加新值，因此也能處理 project_id 的變更。
+    """
+    deltas = SUMMARY_DELTAS[table]
+    columns = ", ".join(deltas)
+
+    def add(row):
+        values = ", ".join(expr.format(row=row) for expr in deltas.values())
+        updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in deltas)
+        return (
+            f"INSERT INTO project_summaries (project_id, {columns}, last_activity_at) "
+            f"SELECT {row}.project_id, {values}, CURRENT_TIMESTAMP WHERE {row}.project_id IS NOT NULL "
+            f"ON CONFLICT(project_id) DO UPDATE SET {updates}, last_activity_at = excluded.last_activity_at;"
+        )
+
+    def subtract(row):
+        updates = ", ".join(f"{col} = {col} - {expr.format(row=row)}" for col, expr in deltas.items())
+        return (
+            f"UPDATE project_summaries SET {updates}, last_activity_at = CURRENT_TIMESTAMP "
+            f"WHERE project_id = {row}.project_id;"
+        )
+
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_insert AFTER INSERT ON {table} "
+        f"BEGIN {add('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_delete AFTER DELETE ON {table} "
+        f"BEGIN {subtract('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_summary_update AFTER UPDATE ON {table} "
+        f"BEGIN {subtract('OLD')} {add('NEW')} END",
+    ]
+
+PROJECT_SUMMARY_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS projects_summary_insert AFTER INSERT ON projects "
+    "BEGIN INSERT OR IGNORE INTO project_summaries (project_id, last_activity_at) "
+    "VALUES (NEW.id, CURRENT_TIMESTAMP); END",
+    "CREATE TRIGGER IF NOT EXISTS projects_summary_delete AFTER DELETE ON projects "
+    "BEGIN DELETE FROM project_summaries WHERE project_id = OLD.id; END",
+]
+
+# 建立資料表後一併建立觸發程序（刪除資料表時 SQLite 會自動刪除其觸發程序）
+for _table, _statements in [
+    (Project.__table__, PROJECT_SUMMARY_TRIGGERS),
+    *((Base.metadata.tables[name], summary_trigger_ddl(name)) for name in SUMMARY_DELTAS),
+]:
+    for _statement in _statements:
+        event.listen(_table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
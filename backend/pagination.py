@@ -0,0 +1,96 @@
+"""清單端點的 keyset（cursor）分頁
+
+游標是最後一筆資料排序鍵 (sort_key, id) 的 base64 編碼，下一頁以
+`(sort_key, id) > 游標值` 接續查詢，因此第 N 頁與第一頁一樣只需走一次索引，
+不會像 OFFSET 一樣越翻越慢。下一頁的游標放在回應標頭 X-Next-Cursor，
+回應內容維持原本的列表格式。
+"""
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, and_, or_, tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    """將排序鍵編碼成不透明的游標字串"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _cursor_value(column, value):
+    """檢查游標值的型別與欄位相符（DateTime 以 ISO 字串表示），不符時拋出 ValueError"""
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError
+        return datetime.fromisoformat(value)
+    python_type = column.type.python_type
+    expected = (int, float) if python_type is float else python_type
+    if isinstance(value, bool) or not isinstance(value, expected):
+        raise ValueError
+    return value
+
+
+def decode_cursor(cursor: str, columns) -> list:
+    """解碼游標，依欄位型別檢查並還原排序鍵（排序欄位可為 NULL，最後的 id 不可）"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns) or values[-1] is None:
+            raise ValueError
+        return [None if v is None else _cursor_value(col, v) for col, v in zip(columns, values)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="無效的分頁游標")
+
+
+def _after(columns, values):
+    """產生「排在游標之後」的條件（SQLite 預設 NULL 排在最前面）"""
+    if len(columns) == 1:
+        return columns[0] > values[0]
+    sort_column, id_column = columns
+    sort_value, id_value = values
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > id_value), sort_column.is_not(None))
+    return tuple_(sort_column, id_column) > tuple_(sort_value, id_value)
+
+
+def _page_query(query, columns, cursor, limit):
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns)))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def _trim_page(rows, columns, limit, response: Response) -> list:
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, col.key) for col in columns])
+    return rows
+
+
+def paginate(query, columns, cursor, limit, response: Response) -> list:
+    """以 keyset 分頁執行查詢
+
+    columns 為排序欄位，最後一個必須是唯一的 id。有下一頁時在
+    response 設定 X-Next-Cursor 標頭。
+    """
+    rows = _page_query(query, columns, cursor, limit).all()
+    return _trim_page(rows, columns, limit, response)
+
+
+async def paginate_async(db, stmt, columns, cursor, limit, response: Response) -> list:
+    """paginate 的 AsyncSession 版本，stmt 為 select() 語句"""
+    rows = (await db.scalars(_page_query(stmt, columns, cursor, limit))).all()
+    return _trim_page(list(rows), columns, limit, response)
+
+
+async def paginate_rows_async(db, stmt, columns, cursor, limit, response: Response) -> list:
+    """與 paginate_async 相同，但回傳資料列（stmt 選取多個欄位時使用）"""
+    rows = (await db.execute(_page_query(stmt, columns, cursor, limit))).all()
+    return _trim_page(rows, columns, limit, response)
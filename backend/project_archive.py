@@ -0,0 +1,316 @@
+"""工程專案封存檔的匯出與匯入
+
+封存檔是 ZIP，內容依序為：
+
+- manifest.json：格式版本與工程專案本身的欄位
+- contract_items.ndjson、tests.ndjson、inspections.ndjson、photos.ndjson：
+  各資料表屬於該專案的資料列，每行一筆，保留原本的 id 供匯入時對應外鍵
+- files/：照片與抽查表電子檔，同一個檔案只收錄一次，資料列的 file_path
+  改寫為壓縮檔內的名稱
+
+匯出以伺服器端游標逐批讀取資料列、逐塊讀取檔案，經 zipstream 邊產生邊送出，
+記憶體用量與專案大小無關。匯入時先把檔案寫入內容定址儲存區，再於單一交易中
+分批寫入並重新配置 id，依序對應契約項目、試驗與抽查的外鍵。
+
+封存檔來自用戶端，匯入時只寫入 NDJSON 資料列有引用的檔案；每個檔案解壓縮後
+不得超過 MAX_UPLOAD_SIZE，檔案合計不得超過 ARCHIVE_MAX_FILES_SIZE（以 ZIP 目錄
+記錄的大小在寫入任何檔案之前檢查）。NDJSON 以有長度上限的 readline 逐行讀取，
+單行超過 ARCHIVE_MAX_LINE_BYTES 即拒絕，不會把過長的一行整個讀進記憶體。
+"""
+import hashlib
+import os
+import time
+import zipfile
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, Optional
+
+import orjson
+from sqlalchemy import DateTime, func, insert, select, union
+from sqlalchemy.orm import Session
+
+import storage
+import zipstream
+from importer import batched
+from models import ContractItem, Inspection, Photo, Project, QualityTest
+
+ARCHIVE_FORMAT = "st_constructionlog.project-archive"
+ARCHIVE_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+FILES_PREFIX = "files/"
+
+# 匯出與匯入時每批處理的資料列數
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# 匯入時封存檔內檔案解壓縮後的合計大小上限（0 表示不限制）；匯出的檔案以
+# ZIP_STORED 儲存，合計不會超過封存檔本身，預設與請求大小上限相同
+ARCHIVE_MAX_FILES_SIZE = int(os.getenv("ARCHIVE_MAX_FILES_SIZE", str(storage.MAX_REQUEST_SIZE)))
+# 匯入時 NDJSON 單行（一筆資料列，不含換行）的位元組數上限
+ARCHIVE_MAX_LINE_BYTES = int(os.getenv("ARCHIVE_MAX_LINE_BYTES", str(1024 * 1024)))
+
+# 資料表依外鍵相依順序排列：(壓縮檔內名稱, 模型, {外鍵欄位: 參照的資料表})
+ARCHIVE_TABLES = [
+    ("contract_items", ContractItem, {}),
+    ("tests", QualityTest, {"contract_item_id": "contract_items"}),
+    ("inspections", Inspection, {}),
+    ("photos", Photo, {"inspection_id": "inspections", "quality_test_id": "tests"}),
+]
+# 引用檔案的欄位
+FILE_COLUMN = "file_path"
+
+PROJECT_FIELDS = ["name", "contract_number", "contractor", "location", "created_at", "updated_at"]
+
+
+class ArchiveFormatError(ValueError):
+    """封存檔格式錯誤"""
+
+
+class ProjectExistsError(ValueError):
+    """契約編號已被其他工程專案使用"""
+
+
+class ArchiveTooLarge(ValueError):
+    """封存檔內的檔案超過大小上限"""
+
+
+def archive_name(file_path: str) -> str:
+    """檔案在封存檔中的名稱（由原路徑決定，同一路徑只對應一個名稱）"""
+    digest = hashlib.sha256(file_path.encode("utf-8")).hexdigest()
+    return f"{FILES_PREFIX}{digest}{Path(file_path).suffix.lower()}"
+
+
+def _dump(row: dict) -> bytes:
+    return orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE)
+
+
+def _deflated(name: str, date_time) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _iter_partitions(connection, statement, batch_size: int):
+    result = connection.execution_options(yield_per=batch_size).execute(statement)
+    yield from result.partitions()
+
+
+def _iter_table_ndjson(connection, model, project_id: int, batch_size: int) -> Iterator[bytes]:
+    """逐批輸出資料表中屬於該專案的資料列（不含 project_id）"""
+    table = model.__table__
+    statement = (
+        select(*(column for column in table.c if column.name != "project_id"))
+        .where(table.c.project_id == project_id)
+        .order_by(table.c.id)
+    )
+    keys = [column.name for column in statement.selected_columns]
+    for batch in _iter_partitions(connection, statement, batch_size):
+        chunk = bytearray()
+        for row in batch:
+            values = dict(zip(keys, row))
+            if values.get(FILE_COLUMN):
+                values[FILE_COLUMN] = archive_name(values[FILE_COLUMN])
+            chunk += _dump(values)
+        yield bytes(chunk)
+
+
+def _iter_file_paths(connection, project_id: int, batch_size: int) -> Iterator[tuple]:
+    """專案引用的檔案（去除重複）：(壓縮檔內名稱, 檔案路徑)"""
+    statement = union(
+        select(Photo.file_path).where(Photo.project_id == project_id, Photo.file_path.is_not(None)),
+        select(Inspection.file_path).where(Inspection.project_id == project_id, Inspection.file_path.is_not(None)),
+    )
+    for batch in _iter_partitions(connection, statement, batch_size):
+        for (file_path,) in batch:
+            yield archive_name(file_path), file_path
+
+
+def iter_project_archive(bind, project_id: int, batch_size: int = ARCHIVE_BATCH_SIZE) -> Iterator[bytes]:
+    """產生工程專案封存檔的內容
+
+    自行開啟連線，回應串流期間請求相依性結束也不受影響。
+    """
+    date_time = time.localtime()[:6]
+    with bind.connect() as connection:
+        project = connection.execute(
+            select(*(getattr(Project, field) for field in PROJECT_FIELDS)).where(Project.id == project_id)
+        ).one()
+        manifest = {
+            "format": ARCHIVE_FORMAT,
+            "version": ARCHIVE_VERSION,
+            "exported_at": datetime.now().isoformat(timespec="seconds"),
+            "project": dict(project._mapping),
+            "tables": [name for name, _, _ in ARCHIVE_TABLES],
+        }
+
+        def entries():
+            yield _deflated(MANIFEST_NAME, date_time), [orjson.dumps(manifest, option=orjson.OPT_INDENT_2)]
+            for name, model, _ in ARCHIVE_TABLES:
+                yield (
+                    _deflated(f"{name}.ndjson", date_time),
+                    _iter_table_ndjson(connection, model, project_id, batch_size),
+                )
+            # 照片與 PDF 本身已經壓縮，以 ZIP_STORED 儲存
+            yield from zipstream.file_entries(_iter_file_paths(connection, project_id, batch_size))
+
+        yield from zipstream.iter_zip_entries(entries())
+
+
+def _read_manifest(archive: zipfile.ZipFile) -> dict:
+    try:
+        manifest = orjson.loads(archive.read(MANIFEST_NAME))
+    except KeyError:
+        raise ArchiveFormatError(f"封存檔缺少 {MANIFEST_NAME}")
+    except orjson.JSONDecodeError as e:
+        raise ArchiveFormatError(f"{MANIFEST_NAME} 格式錯誤: {e}")
+    if manifest.get("format") != ARCHIVE_FORMAT:
+        raise ArchiveFormatError("不是工程專案封存檔")
+    if manifest.get("version") != ARCHIVE_VERSION:
+        raise ArchiveFormatError(f"不支援的封存檔版本: {manifest.get('version')}")
+    return manifest
+
+
+def _iter_records(archive: zipfile.ZipFile, member: str) -> Iterator[dict]:
+    """逐行讀取 NDJSON，略過空白行；單行超過 ARCHIVE_MAX_LINE_BYTES 時拋出 ArchiveTooLarge"""
+    with archive.open(member) as raw:
+        while True:
+            line = raw.readline(ARCHIVE_MAX_LINE_BYTES + 1)
+            if not line:
+                return
+            if len(line) > ARCHIVE_MAX_LINE_BYTES and not line.endswith(b"\n"):
+                raise ArchiveTooLarge(f"{member} 有超過 {ARCHIVE_MAX_LINE_BYTES} bytes 的資料列")
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError as e:
+                raise ArchiveFormatError(f"{member} 格式錯誤: {e}")
+            if not isinstance(record, dict):
+                raise ArchiveFormatError(f"{member} 格式錯誤: 每行必須是 JSON 物件")
+            yield record
+
+
+def _referenced_files(archive: zipfile.ZipFile, names: set) -> set:
+    """NDJSON 資料列引用的檔案名稱（逐行讀取，不保留資料列）"""
+    referenced = set()
+    for name, model, _ in ARCHIVE_TABLES:
+        member = f"{name}.ndjson"
+        if FILE_COLUMN not in model.__table__.c or member not in names:
+            continue
+        for record in _iter_records(archive, member):
+            file_path = record.get(FILE_COLUMN)
+            if isinstance(file_path, str):
+                referenced.add(file_path)
+    return referenced
+
+
+def _restore_files(archive: zipfile.ZipFile, referenced: set) -> Dict[str, str]:
+    """把封存檔中有引用的檔案寫入內容定址儲存區，回傳 {壓縮檔內名稱: 儲存路徑}
+
+    寫入前先以 ZIP 目錄記錄的大小檢查單一檔案與合計的上限；解壓縮時
+    write_blob 仍以 MAX_UPLOAD_SIZE 限制實際寫入的大小。
+    """
+    members = [
+        info for info in archive.infolist()
+        if info.filename in referenced and info.filename.startswith(FILES_PREFIX) and not info.is_dir()
+    ]
+    for info in members:
+        if storage.MAX_UPLOAD_SIZE and info.file_size > storage.MAX_UPLOAD_SIZE:
+            raise ArchiveTooLarge(f"{info.filename} 超過檔案大小上限 {storage.MAX_UPLOAD_SIZE} bytes")
+    total = sum(info.file_size for info in members)
+    if ARCHIVE_MAX_FILES_SIZE and total > ARCHIVE_MAX_FILES_SIZE:
+        raise ArchiveTooLarge(f"封存檔內的檔案合計 {total} bytes，超過上限 {ARCHIVE_MAX_FILES_SIZE} bytes")
+
+    stored = {}
+    for info in members:
+        suffix = PurePosixPath(info.filename).suffix
+        with archive.open(info) as source:
+            try:
+                stored[info.filename] = storage.write_blob(source, suffix).path
+            except storage.UploadTooLarge as e:
+                raise ArchiveTooLarge(f"{info.filename}: {e}")
+    return stored
+
+
+def _datetime_columns(model) -> set:
+    return {column.name for column in model.__table__.c if isinstance(column.type, DateTime)}
+
+
+def _parse_datetimes(values: dict, columns: set) -> dict:
+    for name in columns:
+        if isinstance(values.get(name), str):
+            values[name] = datetime.fromisoformat(values[name])
+    return values
+
+
+def restore_project(
+    db: Session,
+    fileobj,
+    contract_number: Optional[str] = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> dict:
+    """將封存檔還原為新的工程專案，所有 id 重新配置
+
+    呼叫端負責 commit；失敗時 rollback，已寫入的檔案沒有記錄引用，
+    會在寬限期後由 /admin/reconcile 清除。
+    """
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile:
+        raise ArchiveFormatError("不是有效的 ZIP 檔案")
+
+    with archive:
+        manifest = _read_manifest(archive)
+        project_values = {
+            field: manifest["project"].get(field) for field in PROJECT_FIELDS if field in manifest["project"]
+        }
+        if contract_number:
+            project_values["contract_number"] = contract_number
+        existing = db.scalar(
+            select(Project.id).where(Project.contract_number == project_values.get("contract_number"))
+        )
+        if existing is not None:
+            raise ProjectExistsError(f"契約編號 {project_values.get('contract_number')} 已存在")
+
+        names = set(archive.namelist())
+        stored_files = _restore_files(archive, _referenced_files(archive, names))
+
+        project = Project(**_parse_datetimes(project_values, _datetime_columns(Project)))
+        db.add(project)
+        db.flush()
+
+        result = {"project_id": project.id, "files": len(stored_files), "missing_files": 0}
+        id_maps: Dict[str, Dict[int, int]] = {}
+        for name, model, foreign_keys in ARCHIVE_TABLES:
+            id_map = id_maps[name] = {}
+            result[name] = 0
+            member = f"{name}.ndjson"
+            if member not in names:
+                continue
+
+            # 新增工程專案後交易已持有 SQLite 的寫入鎖，其他連線無法同時配置 id，
+            # 因此可以直接接續目前最大的 id，以 executemany 批次寫入（SQLite 的
+            # INSERT ... RETURNING 無法保證批次回傳順序，會退回逐筆執行）
+            next_id = (db.scalar(select(func.max(model.id))) or 0) + 1
+            columns = {column.name for column in model.__table__.c} - {"id", "project_id"}
+            datetime_columns = _datetime_columns(model)
+            for batch in batched(_iter_records(archive, member), batch_size):
+                old_ids = []
+                rows = []
+                for record in batch:
+                    old_ids.append(record.get("id"))
+                    values = {key: value for key, value in record.items() if key in columns}
+                    values["project_id"] = project.id
+                    for column, target in foreign_keys.items():
+                        if values.get(column) is not None:
+                            values[column] = id_maps[target].get(values[column])
+                    if values.get(FILE_COLUMN) is not None:
+                        values[FILE_COLUMN] = stored_files.get(values[FILE_COLUMN])
+                        if values[FILE_COLUMN] is None:
+                            result["missing_files"] += 1
+                    rows.append(_parse_datetimes(values, datetime_columns))
+
+                for old_id, values in zip(old_ids, rows):
+                    values["id"] = id_map[old_id] = next_id
+                    next_id += 1
+                db.execute(insert(model), rows)
+                result[name] += len(rows)
+    return result
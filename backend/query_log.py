@@ -0,0 +1,212 @@
+"""慢查詢紀錄與 N+1 偵測
+
+models.py 的關聯（Project.photos、Inspection.photos、QualityTest.photos 等）預設
+延遲載入，在迴圈中存取時每一筆資料列都會多一次查詢。QueryLogMiddleware 在每個
+請求開始時建立 RequestQueries，Engine 的 before/after_cursor_execute 事件把每個
+SQL 依正規化後的文字（參數、字串與數字常數以 ? 表示，IN 清單只保留一個 ?）
+累計執行次數與時間：
+
+- 單次執行超過 SLOW_QUERY_MS 毫秒：立即寫入 query_log.slow
+- 回應送完時，同一個 SQL 執行超過 N_PLUS_ONE_THRESHOLD 次：寫入
+  query_log.n_plus_one，通常代表在迴圈中延遲載入關聯
+
+紀錄的訊息是一行 JSON（也以 extra 的 query_log 屬性提供），可直接交給日誌收集
+工具；兩種事件的次數另外在 /metrics 以 db_slow_queries_total 與
+db_repeated_statements_total 輸出。query_log 的日誌層級設為 DEBUG 時，每個請求
+結束都會列出全部 SQL 的統計。QUERY_LOG_ENABLED=0 停用。
+"""
+import functools
+import logging
+import os
+import re
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import metrics
+
+QUERY_LOG_ENABLED = os.getenv("QUERY_LOG_ENABLED", "1") == "1"
+# 單次執行超過此毫秒數的 SQL 記錄為慢查詢
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# 同一請求中同一個 SQL 執行超過此次數時視為疑似 N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger(f"{__name__}.slow")
+n_plus_one_logger = logging.getLogger(f"{__name__}.n_plus_one")
+
+SLOW_QUERIES = metrics.Counter(
+    "db_slow_queries_total", "執行時間超過 SLOW_QUERY_MS 的 SQL 數", ("method", "route")
+)
+REPEATED_STATEMENTS = metrics.Counter(
+    "db_repeated_statements_total", "同一請求中執行超過 N_PLUS_ONE_THRESHOLD 次的 SQL 數（疑似 N+1）",
+    ("method", "route"),
+)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST_RE = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize(statement: str) -> str:
+    """SQL 的正規化文字：常數改為 ?，不同長度的 IN 清單與多列 VALUES 視為同一個 SQL"""
+    text = _STRING_RE.sub("?", statement)
+    text = _NUMBER_RE.sub("?", text)
+    text = _PLACEHOLDER_LIST_RE.sub("(?)", text)
+    text = _VALUES_LIST_RE.sub("(?)", text)
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def _log(target: logging.Logger, level: int, event_name: str, fields: dict):
+    record = {"event": event_name, **fields}
+    target.log(level, orjson.dumps(record).decode(), extra={"query_log": record})
+
+
+class StatementStats:
+    __slots__ = ("count", "seconds", "max_seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+
+class RequestQueries:
+    """一個請求執行過的 SQL：{正規化文字: 次數與時間}"""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.statements: Dict[str, StatementStats] = {}
+        # 回應送完後設為 True，之後背景工作執行的 SQL 不屬於這個請求
+        self.closed = False
+
+    def _context(self) -> dict:
+        return {
+            "method": self.scope.get("method"),
+            "route": getattr(self.scope.get("route"), "path", metrics.UNMATCHED_ROUTE),
+            "path": self.scope.get("path"),
+        }
+
+    def record(self, statement: str, seconds: float, executemany: bool = False):
+        key = normalize(statement)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = StatementStats()
+        stats.count += 1
+        stats.seconds += seconds
+        if seconds > stats.max_seconds:
+            stats.max_seconds = seconds
+
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            context = self._context()
+            SLOW_QUERIES.labels(context["method"], context["route"]).inc()
+            _log(slow_logger, logging.WARNING, "slow_query", {
+                **context,
+                "statement": key,
+                "duration_ms": round(seconds * 1000, 3),
+                "executemany": executemany,
+            })
+
+    def repeated(self, threshold: int) -> List[Tuple[str, StatementStats]]:
+        """執行超過 threshold 次的 SQL，依次數由多到少排列"""
+        return sorted(
+            ((key, stats) for key, stats in self.statements.items() if stats.count > threshold),
+            key=lambda item: -item[1].count,
+        )
+
+    def close(self):
+        """停止收集並記錄疑似 N+1 的 SQL，重複呼叫時不再記錄"""
+        if not self.closed:
+            self.closed = True
+            self.report()
+
+    def report(self):
+        """請求結束時記錄疑似 N+1 的 SQL（DEBUG 時另外列出全部 SQL）"""
+        repeated = self.repeated(N_PLUS_ONE_THRESHOLD)
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if not repeated and not debug:
+            return
+        context = self._context()
+        for key, stats in repeated:
+            REPEATED_STATEMENTS.labels(context["method"], context["route"]).inc()
+            _log(n_plus_one_logger, logging.WARNING, "n_plus_one", {
+                **context,
+                "statement": key,
+                "count": stats.count,
+                "total_ms": round(stats.seconds * 1000, 3),
+                "threshold": N_PLUS_ONE_THRESHOLD,
+            })
+        if debug:
+            _log(logger, logging.DEBUG, "request_queries", {
+                **context,
+                "statements": [
+                    {"statement": key, "count": stats.count, "total_ms": round(stats.seconds * 1000, 3),
+                     "max_ms": round(stats.max_seconds * 1000, 3)}
+                    for key, stats in self.statements.items()
+                ],
+            })
+
+
+_current_request: ContextVar[Optional[RequestQueries]] = ContextVar("query_log_request", default=None)
+
+
+class QueryLogMiddleware:
+    """為每個 HTTP 請求記錄執行過的 SQL，結束時檢查重複執行的 SQL
+
+    送出最後一段回應內容時就結束收集；Starlette 的 BackgroundTasks（產生縮圖、
+    清理檔案等）在那之後才執行，它們的 SQL 不計入請求。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope)
+        token = _current_request.set(queries)
+
+        async def closing_send(message):
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                queries.close()
+
+        try:
+            await self.app(scope, receive, closing_send)
+        finally:
+            _current_request.reset(token)
+            queries.close()
+
+
+_QUERY_START = "query_log_start"
+
+
+def _collecting() -> Optional[RequestQueries]:
+    queries = _current_request.get()
+    return None if queries is None or queries.closed else queries
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _collecting() is not None:
+        conn.info[_QUERY_START] = perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = _collecting()
+    started = conn.info.pop(_QUERY_START, None)
+    if queries is not None and started is not None:
+        queries.record(statement, perf_counter() - started, executemany)
+
+
+if QUERY_LOG_ENABLED:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,261 @@
+"""上傳目錄與資料庫的比對與清理
+
+平行走訪上傳目錄（每個子目錄由執行緒池中的 os.scandir 處理），再一次讀出
+照片與抽查表引用的所有檔案路徑，以集合差找出：
+
+- 孤兒檔案：磁碟上有、資料庫沒有引用的檔案（包含上傳失敗留下的暫存檔）
+- 懸空引用：資料庫引用、磁碟上卻不存在的檔案
+
+預設只產生報告；指定 delete_orphans 才刪除孤兒檔案，指定 fix_dangling 才刪除
+懸空的照片記錄並清空抽查表的電子檔路徑。最近寫入的檔案可能屬於尚未提交的上傳，
+在寬限期內不視為孤兒。縮圖快取目錄不在比對範圍內。
+
+資料庫中的相對路徑以 UPLOAD_DIR 開頭（相對於服務的工作目錄），比對時改以上傳目錄
+解析，與執行時的目前目錄無關。上傳目錄不存在，或修正懸空引用時懸空的比例超過
+RECONCILE_MAX_DANGLING_RATIO（通常代表上傳目錄指錯位置），除非指定 force，
+否則拒絕執行。
+
+用法（在 backend 目錄，或以 --upload-dir 指定上傳目錄）：
+    python reconcile.py              # 只產生報告
+    python reconcile.py --delete --fix-dangling
+"""
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select, union, update
+from sqlalchemy.orm import Session
+
+import storage
+from models import Photo, Inspection
+from schemas import ReconcileReport
+
+# 走訪目錄的執行緒數
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", str(min(32, (os.cpu_count() or 1) * 4))))
+# 上傳失敗留下的暫存檔超過此秒數才清除
+TEMP_FILE_GRACE_SECONDS = float(os.getenv("TEMP_FILE_GRACE_SECONDS", "3600"))
+# 報告中列出的路徑數量上限
+REPORT_SAMPLE_SIZE = 100
+# 每次更新資料庫時處理的路徑數（避免超過 SQLite 的參數數量上限）
+DB_BATCH_SIZE = 500
+# 修正懸空引用時，懸空引用占全部引用的比例超過此值就拒絕執行（除非指定 force）
+RECONCILE_MAX_DANGLING_RATIO = float(os.getenv("RECONCILE_MAX_DANGLING_RATIO", "0.5"))
+
+
+class ReconcileRefused(Exception):
+    """比對結果不可信（上傳目錄不存在或懸空引用過多），未指定 force 時拒絕執行"""
+
+
+def _normalize(path: str) -> str:
+    return os.path.normpath(os.path.abspath(path))
+
+
+def resolve_stored_path(raw: str, upload_dir: str) -> str:
+    """資料庫中的檔案路徑對應的絕對路徑
+
+    以 UPLOAD_DIR 開頭的相對路徑（例如 uploads/blobs/...）改為相對於 upload_dir
+    解析；絕對路徑與其他相對路徑照原樣正規化。
+    """
+    path = Path(raw)
+    prefix = storage.UPLOAD_DIR.parts
+    if not path.is_absolute() and not storage.UPLOAD_DIR.is_absolute() and path.parts[:len(prefix)] == prefix:
+        return _normalize(os.path.join(upload_dir, *path.parts[len(prefix):]))
+    return _normalize(raw)
+
+
+def _scan_dir(path: str):
+    """列出單一目錄的檔案與子目錄"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(entry.path)
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    return files, dirs
+
+
+def walk_files(root: str, workers: Optional[int] = None, exclude=()) -> List[str]:
+    """平行走訪 root 下所有檔案，回傳絕對路徑；exclude 中的目錄不進入"""
+    root = _normalize(root)
+    exclude = {_normalize(path) for path in exclude}
+    files: List[str] = []
+    with ThreadPoolExecutor(max_workers=workers or RECONCILE_WORKERS) as pool:
+        pending = {pool.submit(_scan_dir, root)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, dirs = future.result()
+                files.extend(found)
+                for directory in dirs:
+                    if directory not in exclude:
+                        pending.add(pool.submit(_scan_dir, directory))
+    return files
+
+
+def referenced_paths(db: Session, upload_dir: Optional[str] = None) -> Dict[str, List[str]]:
+    """資料庫中所有被引用的檔案路徑：{正規化的絕對路徑: [資料庫中的原始字串]}"""
+    upload_dir = _normalize(str(storage.UPLOAD_DIR if upload_dir is None else upload_dir))
+    stmt = union(
+        select(Photo.file_path).where(Photo.file_path.is_not(None)),
+        select(Inspection.file_path).where(Inspection.file_path.is_not(None)),
+    )
+    paths: Dict[str, List[str]] = {}
+    for raw in db.scalars(stmt):
+        paths.setdefault(resolve_stored_path(raw, upload_dir), []).append(raw)
+    return paths
+
+
+def _split_recent(paths, now: float):
+    """依寬限期把候選孤兒分成 (可刪除, 最近寫入)，並回傳可刪除檔案的總大小"""
+    stale, recent, total_bytes = [], [], 0
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        is_temp = os.path.basename(path).startswith(storage.TEMP_PREFIX)
+        grace = TEMP_FILE_GRACE_SECONDS if is_temp else storage.BLOB_RELEASE_GRACE_SECONDS
+        if now - storage.last_written(stat) < grace:
+            recent.append(path)
+        else:
+            stale.append(path)
+            total_bytes += stat.st_size
+    return stale, recent, total_bytes
+
+
+def _unlink_all(paths, workers: int) -> int:
+    def unlink(path):
+        try:
+            os.unlink(path)
+            return 1
+        except FileNotFoundError:
+            return 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(unlink, paths, chunksize=256))
+
+
+def _fix_dangling(db: Session, raw_paths: List[str]):
+    """刪除指向不存在檔案的照片記錄，並清空抽查表的電子檔路徑"""
+    deleted_photos = cleared_inspections = 0
+    for start in range(0, len(raw_paths), DB_BATCH_SIZE):
+        batch = raw_paths[start:start + DB_BATCH_SIZE]
+        deleted_photos += db.execute(
+            delete(Photo).where(Photo.file_path.in_(batch)),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+        cleared_inspections += db.execute(
+            update(Inspection).where(Inspection.file_path.in_(batch)).values(file_path=None),
+            execution_options={"synchronize_session": False},
+        ).rowcount
+    db.commit()
+    return deleted_photos, cleared_inspections
+
+
+def reconcile(
+    db: Session,
+    delete_orphans: bool = False,
+    fix_dangling: bool = False,
+    workers: Optional[int] = None,
+    force: bool = False,
+    upload_dir: Optional[str] = None,
+) -> ReconcileReport:
+    """比對上傳目錄與資料庫，依參數清理孤兒檔案與懸空引用
+
+    upload_dir 預設為 storage.UPLOAD_DIR。比對結果不可信時拋出 ReconcileRefused，
+    不修改任何檔案或資料。
+    """
+    workers = workers or RECONCILE_WORKERS
+    started = time.perf_counter()
+
+    upload_dir = _normalize(str(storage.UPLOAD_DIR if upload_dir is None else upload_dir))
+    if not os.path.isdir(upload_dir) and not force:
+        raise ReconcileRefused(f"上傳目錄 {upload_dir} 不存在，請確認工作目錄或 UPLOAD_DIR")
+
+    # 先處理刪除工程專案時排入佇列的檔案
+    purged = storage.drain_purge_queue(db.get_bind()) if delete_orphans else 0
+
+    cache_dir = os.path.join(upload_dir, "cache")
+    on_disk = set(walk_files(upload_dir, workers, exclude=[cache_dir]))
+    referenced = referenced_paths(db, upload_dir)
+
+    candidates = on_disk - referenced.keys()
+    dangling = {
+        path for path in referenced.keys() - on_disk
+        if path.startswith(upload_dir + os.sep) and not path.startswith(cache_dir + os.sep)
+    }
+    if fix_dangling and not force and len(dangling) > len(referenced) * RECONCILE_MAX_DANGLING_RATIO:
+        raise ReconcileRefused(
+            f"{len(dangling)} / {len(referenced)} 個引用的檔案不存在，超過 "
+            f"RECONCILE_MAX_DANGLING_RATIO={RECONCILE_MAX_DANGLING_RATIO}；請確認上傳目錄 {upload_dir}"
+        )
+    orphans, recent, orphan_bytes = _split_recent(sorted(candidates), time.time())
+
+    report = {
+        "scanned_files": len(on_disk),
+        "referenced_paths": len(referenced),
+        "orphan_files": len(orphans),
+        "orphan_bytes": orphan_bytes,
+        "skipped_recent": len(recent),
+        "dangling_references": len(dangling),
+        "purged_from_queue": purged,
+        "orphan_samples": orphans[:REPORT_SAMPLE_SIZE],
+        "dangling_samples": sorted(dangling)[:REPORT_SAMPLE_SIZE],
+    }
+    if delete_orphans and orphans:
+        report["deleted_files"] = _unlink_all(orphans, workers)
+    if fix_dangling and dangling:
+        # 資料庫中的路徑可能是相對路徑，以原始字串比對
+        raw_paths = [raw for path in dangling for raw in referenced[path]]
+        report["deleted_photos"], report["cleared_inspections"] = _fix_dangling(db, raw_paths)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["files_per_second"] = round(len(on_disk) / elapsed, 1) if elapsed else 0.0
+    return ReconcileReport(**report)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比對上傳目錄與資料庫，找出孤兒檔案與懸空引用")
+    parser.add_argument("--delete", action="store_true", help="刪除孤兒檔案")
+    parser.add_argument("--fix-dangling", action="store_true", help="刪除懸空的照片記錄並清空抽查表電子檔路徑")
+    parser.add_argument("--workers", type=int, default=RECONCILE_WORKERS, help="走訪目錄的執行緒數")
+    parser.add_argument("--verbose", action="store_true", help=f"列出孤兒檔案與懸空引用的路徑（各最多 {REPORT_SAMPLE_SIZE} 筆）")
+    parser.add_argument("--upload-dir", help="上傳目錄（預設為 UPLOAD_DIR，相對於目前目錄）")
+    parser.add_argument("--force", action="store_true", help="上傳目錄不存在或懸空引用過多時仍然執行")
+    args = parser.parse_args(argv)
+
+    from database import SessionLocal
+
+    with SessionLocal() as db:
+        try:
+            report = reconcile(
+                db, args.delete, args.fix_dangling, args.workers, force=args.force, upload_dir=args.upload_dir
+            )
+        except ReconcileRefused as e:
+            parser.exit(1, f"拒絕執行: {e}（確認無誤後以 --force 執行）\n")
+
+    print(f"掃描檔案: {report.scanned_files}（{report.files_per_second:.0f} 檔/秒，{report.elapsed_seconds:.2f} 秒）")
+    print(f"資料庫引用: {report.referenced_paths}")
+    print(f"孤兒檔案: {report.orphan_files}（{report.orphan_bytes / 1024 / 1024:.1f} MiB），寬限期內略過: {report.skipped_recent}")
+    print(f"懸空引用: {report.dangling_references}")
+    if args.delete:
+        print(f"已刪除檔案: {report.deleted_files}，佇列中清除: {report.purged_from_queue}")
+    if args.fix_dangling:
+        print(f"已刪除照片記錄: {report.deleted_photos}，已清空抽查表路徑: {report.cleared_inspections}")
+    if args.verbose:
+        for path in report.orphan_samples:
+            print(f"orphan\t{path}")
+        for path in report.dangling_samples:
+            print(f"dangling\t{path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,9 @@ class ContractItemBase(BaseModel):
     unit_price: float
     total_price: float
 
+    # NaN 在 SQLite 中存成 NULL，之後讀取列表時會驗證失敗，因此拒絕非有限數值
+    model_config = ConfigDict(allow_inf_nan=False)
+
 class ContractItemCreate(ContractItemBase):
     project_id: int
 
@@ -42,9 +45,9 @@ class ContractItemUpdate(BaseModel):
     pcces_code: Optional[str] = None
     name: Optional[str] = None
     unit: Optional[str] = None
-    quantity: Optional[float] = Field(gt=0, default=None)
-    unit_price: Optional[float] = Field(ge=0, default=None)
-    total_price: Optional[float] = Field(ge=0, default=None)
+    quantity: Optional[float] = Field(gt=0, default=None, allow_inf_nan=False)
+    unit_price: Optional[float] = Field(ge=0, default=None, allow_inf_nan=False)
+    total_price: Optional[float] = Field(ge=0, default=None, allow_inf_nan=False)
 
 class ContractItem(ContractItemBase):
     id: int
@@ -54,6 +57,17 @@ class ContractItem(ContractItemBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+class ContractItemBulkError(BaseModel):
+    row: int
+    detail: str
+
+class ContractItemBulkResult(BaseModel):
+    project_id: int
+    total: int
+    inserted: int
+    failed: int
+    errors: List[ContractItemBulkError] = []
+
 # Test Schemas
 class TestBase(BaseModel):
     name: str
@@ -93,6 +107,16 @@ class Inspection(InspectionBase):
     
     model_config = ConfigDict(from_attributes=True)
 
+# 批次操作一次最多處理的筆數
+MAX_BATCH_IDS = 1000
+
+class InspectionIds(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_IDS)
+
+class InspectionBatchDeleteResult(BaseModel):
+    deleted: int
+    not_found: List[int] = []
+
 # Photo Schemas
 class PhotoBase(BaseModel):
     filename: str
@@ -120,3 +144,68 @@ class Photo(PhotoBase):
     updated_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
+
+# Project Summary Schemas
+class ProjectSummary(BaseModel):
+    project_id: int
+    item_count: int = 0
+    total_contract_value: float = 0
+    test_count: int = 0
+    test_set_total: int = 0
+    inspection_count: int = 0
+    inspection_pass_count: int = 0
+    pass_rate: Optional[float] = None
+    photo_count: int = 0
+    last_activity_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Project Archive Schemas
+class ProjectArchiveImportResult(BaseModel):
+    """工程專案封存檔匯入結果（各資料表寫入的筆數）"""
+    project_id: int
+    contract_items: int
+    tests: int
+    inspections: int
+    photos: int
+    files: int
+    missing_files: int = 0
+
+# Search Schemas
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    project_id: Optional[int] = None
+    title: Optional[str] = None
+    rank: float
+
+# Storage Reconciliation Schemas
+class ReconcileReport(BaseModel):
+    """上傳目錄與資料庫的比對結果"""
+    scanned_files: int
+    referenced_paths: int
+    orphan_files: int
+    orphan_bytes: int
+    skipped_recent: int
+    dangling_references: int
+    deleted_files: int = 0
+    deleted_photos: int = 0
+    cleared_inspections: int = 0
+    purged_from_queue: int = 0
+    elapsed_seconds: float
+    files_per_second: float
+    orphan_samples: List[str] = []
+    dangling_samples: List[str] = []
+
+# Response Cache Schemas
+class CacheStats(BaseModel):
+    """回應快取的統計"""
+    enabled: bool
+    entries: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    hit_rate: Optional[float] = None
+    evictions: int
+    invalidations: int
@@ -0,0 +1,211 @@
+"""全文檢索（SQLite FTS5）
+
+工程專案、契約項目、施工抽查與照片描述各有一個 external-content 的 FTS5 虛擬表，
+使用 trigram 分詞器，中文等沒有空白分隔的文字也能以任意三個字以上的片段查詢。
+索引由觸發程序與原資料表同步；虛擬表在原資料表建立後建立、刪除前刪除。
+
+以空白分隔的字詞須全部符合。至少三個字的字詞走 FTS5 索引並依 bm25 排序；較短
+的字詞 trigram 無法使用索引，改以 LIKE 比對原資料表（每個字詞一個條件），與 FTS5
+一同使用時只比對索引找到的資料列，全部都是短字詞時 rank 固定為 0。結果以
+(rank, type, id) 做 keyset 分頁。
+
+bm25 的計算量與符合的筆數成正比，常見字詞在百萬筆資料中可能符合十萬筆以上，
+因此每種資料只對最新的 SEARCH_RANK_WINDOW 筆符合資料計算相關度並排序。符合的
+筆數超過上限時，較舊的資料不會出現在結果中，回應標頭 X-Search-Truncated 列出
+被截斷的資料類型（以逗號分隔），用戶端可提示使用者加上更多字詞。
+"""
+import os
+from typing import List, Optional
+
+from fastapi import Response
+from sqlalchemy import DDL, Float, Integer, String, event, literal_column, text
+from sqlalchemy.orm import Session
+
+from models import Project, ContractItem, Inspection, Photo
+from pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
+
+# trigram 分詞器可使用索引的最短字詞長度
+MIN_TRIGRAM_LENGTH = 3
+# 每種資料計算相關度的符合筆數上限（取最新的資料）
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "10000"))
+
+# 列出符合筆數超過 SEARCH_RANK_WINDOW、結果不完整的資料類型
+TRUNCATED_HEADER = "X-Search-Truncated"
+
+# 每個子查詢先以游標條件篩選並各取 limit 筆，外層再合併排序
+_AFTER_CURSOR = " AND ({rank}, '{type}', t.id) > (:after_rank, :after_type, :after_id)"
+
+
+class SearchEntity:
+    """一種可檢索的資料：FTS 虛擬表、索引欄位與結果的顯示欄位"""
+
+    def __init__(self, type_name: str, model, columns: List[str], title: str, project_column: str):
+        self.type_name = type_name
+        self.table = model.__table__
+        self.columns = columns
+        self.title = title
+        self.project_column = project_column
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.table.name}_fts"
+
+    def ddl(self) -> List[str]:
+        """建立 FTS 虛擬表與同步觸發程序"""
+        table, fts = self.table.name, self.fts_table
+        cols = ", ".join(self.columns)
+        new_values = ", ".join(f"new.{col}" for col in self.columns)
+        old_values = ", ".join(f"old.{col}" for col in self.columns)
+        insert_new = f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_values});"
+        delete_old = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete_old} END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {cols} ON {table} "
+            f"BEGIN {delete_old} {insert_new} END",
+        ]
+
+    def like_conditions(self, alias: str, count: int) -> str:
+        """每個短字詞一個條件（任一欄位包含該字詞），全部以 AND 連接"""
+        return " AND ".join(
+            "(" + " OR ".join(f"{alias}.{col} LIKE :like_{index} ESCAPE '\\'" for col in self.columns) + ")"
+            for index in range(count)
+        )
+
+    def _fts_join(self, by_project: bool, like_count: int) -> str:
+        """依工程專案或短字詞篩選時，FTS 虛擬表與原資料表的 JOIN"""
+        conditions = []
+        if by_project:
+            conditions.append(f"p.{self.project_column} = :project_id")
+        if like_count:
+            conditions.append(self.like_conditions("p", like_count))
+        if not conditions:
+            return ""
+        return f" JOIN {self.table.name} AS p ON p.id = {self.fts_table}.rowid AND {' AND '.join(conditions)}"
+
+    def fts_select(self, by_project: bool, after_cursor: bool, like_count: int = 0) -> str:
+        """以 FTS5 索引查詢，rank 為 bm25（越小越相關）；短字詞在索引找到的資料列中以 LIKE 篩選"""
+        table, fts = self.table.name, self.fts_table
+        table_join = self._fts_join(by_project, like_count)
+        after = _AFTER_CURSOR.format(rank="f.rank", type=self.type_name) if after_cursor else ""
+        return (
+            f"SELECT * FROM (SELECT '{self.type_name}' AS type, t.id AS id, "
+            f"t.{self.project_column} AS project_id, t.{self.title} AS title, f.rank AS rank "
+            f"FROM (SELECT {fts}.rowid AS id, bm25({fts}) AS rank FROM {fts}{table_join} "
+            f"WHERE {fts} MATCH :match ORDER BY {fts}.rowid DESC LIMIT :window) AS f "
+            f"JOIN {table} AS t ON t.id = f.id WHERE 1{after} ORDER BY f.rank, t.id LIMIT :limit)"
+        )
+
+    def truncated_select(self, by_project: bool, like_count: int) -> str:
+        """符合筆數超過 :window 時回傳一列資料類型（只走訪索引，不計算 bm25）"""
+        fts = self.fts_table
+        return (
+            f"SELECT * FROM (SELECT '{self.type_name}' AS type FROM {fts}"
+            f"{self._fts_join(by_project, like_count)} WHERE {fts} MATCH :match "
+            f"ORDER BY {fts}.rowid DESC LIMIT 1 OFFSET :window)"
+        )
+
+    def like_select(self, by_project: bool, after_cursor: bool, like_count: int) -> str:
+        """字詞都太短時以 LIKE 比對原資料表，rank 固定為 0"""
+        conditions = self.like_conditions("t", like_count)
+        project_filter = f" AND t.{self.project_column} = :project_id" if by_project else ""
+        after = _AFTER_CURSOR.format(rank="0.0", type=self.type_name) if after_cursor else ""
+        return (
+            f"SELECT * FROM (SELECT '{self.type_name}' AS type, t.id AS id, "
+            f"t.{self.project_column} AS project_id, t.{self.title} AS title, 0.0 AS rank "
+            f"FROM {self.table.name} AS t WHERE {conditions}{project_filter}{after} "
+            f"ORDER BY t.id LIMIT :limit)"
+        )
+
+
+SEARCH_ENTITIES = {
+    entity.type_name: entity
+    for entity in [
+        SearchEntity("project", Project, ["name", "contractor", "location"], "name", "id"),
+        SearchEntity("contract_item", ContractItem, ["name"], "name", "project_id"),
+        SearchEntity("inspection", Inspection, ["name", "location"], "name", "project_id"),
+        SearchEntity("photo", Photo, ["description"], "description", "project_id"),
+    ]
+}
+
+# 原資料表建立後建立 FTS 虛擬表與觸發程序，刪除前先刪除虛擬表
+for _entity in SEARCH_ENTITIES.values():
+    for _statement in _entity.ddl():
+        event.listen(_entity.table, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+    event.listen(
+        _entity.table,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {_entity.fts_table}").execute_if(dialect="sqlite"),
+    )
+
+# 游標的排序鍵：(rank, type, id)
+_CURSOR_COLUMNS = [
+    literal_column("rank", Float),
+    literal_column("type", String),
+    literal_column("id", Integer),
+]
+
+
+def _match_expression(terms: List[str]) -> str:
+    """每個字詞當作一個片語，全部都要符合"""
+    return " AND ".join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+
+def _like_pattern(query: str) -> str:
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search(
+    db: Session,
+    query: str,
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    project_id: Optional[int] = None,
+    types: Optional[List[str]] = None,
+) -> list:
+    """跨資料表檢索，依相關度排序並以 keyset 分頁"""
+    terms = query.split()
+    fts_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_LENGTH]
+    like_terms = [term for term in terms if len(term) < MIN_TRIGRAM_LENGTH]
+    use_fts = bool(fts_terms)
+    params = {"limit": limit + 1, "project_id": project_id}
+    if use_fts:
+        params["match"] = _match_expression(fts_terms)
+        params["window"] = SEARCH_RANK_WINDOW
+    for index, term in enumerate(like_terms):
+        params[f"like_{index}"] = _like_pattern(term)
+    if cursor:
+        params["after_rank"], params["after_type"], params["after_id"] = decode_cursor(cursor, _CURSOR_COLUMNS)
+
+    by_project, after_cursor = project_id is not None, cursor is not None
+    entities = [entity for entity in SEARCH_ENTITIES.values() if not types or entity.type_name in types]
+    if not entities:
+        return []
+    selects = [
+        entity.fts_select(by_project, after_cursor, len(like_terms)) if use_fts
+        else entity.like_select(by_project, after_cursor, len(like_terms))
+        for entity in entities
+    ]
+
+    if use_fts:
+        truncated = db.scalars(text(" UNION ALL ".join(
+            entity.truncated_select(by_project, len(like_terms)) for entity in entities
+        )), params).all()
+        if truncated:
+            response.headers[TRUNCATED_HEADER] = ",".join(truncated)
+
+    statement = text(
+        f"SELECT type, id, project_id, title, rank FROM ({' UNION ALL '.join(selects)}) "
+        f"ORDER BY rank, type, id LIMIT :limit"
+    )
+    rows = db.execute(statement, params).mappings().all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last["rank"], last["type"], last["id"]])
+    return [dict(row) for row in rows]
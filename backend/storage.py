@@ -0,0 +1,405 @@
+"""上傳檔案的磁碟儲存
+
+上傳內容以固定大小的區塊寫入暫存檔並同時計算 SHA-256，完成後再以 os.replace
+原子性地改名為以內容雜湊命名的檔案，因此每個上傳的記憶體用量只與區塊大小有關，
+失敗或超過大小上限時不會留下寫到一半的檔案，重複上傳的內容也只保存一份。
+
+檔案的引用計數來自 Photo.file_path 與 Inspection.file_path：刪除或改寫記錄後
+呼叫 release_files，沒有任何記錄引用的檔案才會被刪除；最近寫入的檔案先放入
+待刪除檔案佇列，寬限期後再刪除。
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import IO, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import delete, func, insert, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import Photo, Inspection, FilePurge
+
+logger = logging.getLogger(__name__)
+
+# 設定文件上傳目錄
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+# 內容定址儲存區：檔案以內容的 SHA-256 命名，相同內容只保存一份
+BLOB_DIR = UPLOAD_DIR / "blobs"
+
+# 檔案不再被引用時，最近寫入的檔案在寬限期（秒）內不刪除
+BLOB_RELEASE_GRACE_SECONDS = float(os.getenv("BLOB_RELEASE_GRACE_SECONDS", "60"))
+# 背景清理待刪除檔案佇列時每批處理的筆數
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+
+# 每次讀寫的區塊大小與單一檔案的大小上限（位元組，0 代表不限制）
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+# 單一請求的大小上限（批量上傳包含多個檔案）
+MAX_REQUEST_SIZE = int(os.getenv("MAX_REQUEST_SIZE", str(500 * 1024 * 1024)))
+
+# 寫入中的暫存檔名前綴
+TEMP_PREFIX = ".upload-"
+
+REQUEST_TOO_LARGE_DETAIL = "請求內容超過大小上限"
+
+# 下載回應的 Cache-Control：照片與縮圖的內容不會改變，抽查表電子檔可能被取代，每次都要重新驗證
+PHOTO_CACHE_CONTROL = os.getenv("PHOTO_CACHE_CONTROL", "private, max-age=86400")
+THUMBNAIL_CACHE_CONTROL = os.getenv("THUMBNAIL_CACHE_CONTROL", "private, max-age=604800")
+INSPECTION_FILE_CACHE_CONTROL = os.getenv("INSPECTION_FILE_CACHE_CONTROL", "private, no-cache")
+
+_CONTENT_HASH_RE = re.compile(r"^[0-9a-f]{64}")
+
+
+class UploadTooLarge(Exception):
+    """上傳內容超過大小上限"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"檔案超過大小上限 {limit} bytes")
+        self.limit = limit
+
+
+class StoredFile(NamedTuple):
+    """寫入內容定址儲存區的檔案"""
+    path: str
+    size: int
+    sha256: str
+
+
+def blob_path(digest: str, suffix: str = "") -> Path:
+    """依 SHA-256 取得檔案在儲存區中的路徑（以前兩碼分目錄）"""
+    return BLOB_DIR / digest[:2] / f"{digest}{suffix.lower()}"
+
+
+def write_blob(
+    src: IO[bytes],
+    suffix: str = "",
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredFile:
+    """將檔案物件分塊寫入內容定址儲存區
+
+    寫入暫存檔的同時計算 SHA-256，完成後以 os.replace 原子性地改名為
+    blobs/<前兩碼>/<sha256><副檔名>。內容相同的檔案已存在時不重複保存，只更新其
+    存取時間（見 last_written）。超過 max_bytes 時立即停止並刪除暫存檔，
+    拋出 UploadTooLarge。
+    """
+    max_bytes = MAX_UPLOAD_SIZE if max_bytes is None else max_bytes
+    chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+
+    BLOB_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=BLOB_DIR)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                hasher.update(chunk)
+                out.write(chunk)
+
+        dest = blob_path(hasher.hexdigest(), suffix)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if dest.exists():
+            # 重複的內容：保留既有檔案，更新存取時間讓它避開釋放的寬限期；
+            # 修改時間（Last-Modified）不變
+            os.unlink(tmp_path)
+            os.utime(dest, ns=(time.time_ns(), dest.stat().st_mtime_ns))
+        else:
+            os.replace(tmp_path, dest)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return StoredFile(str(dest), size, hasher.hexdigest())
+
+
+async def save_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> StoredFile:
+    """將上傳檔案寫入內容定址儲存區（在 threadpool 中執行）"""
+    await file.seek(0)
+    suffix = Path(file.filename or "").suffix
+    return await run_in_threadpool(write_blob, file.file, suffix, max_bytes, chunk_size)
+
+
+def reference_query(paths):
+    """查詢 paths 中仍被照片或抽查表引用的路徑"""
+    return union(
+        select(Photo.file_path).where(Photo.file_path.in_(paths)),
+        select(Inspection.file_path).where(Inspection.file_path.in_(paths)),
+    )
+
+
+def is_managed_path(path: str) -> bool:
+    """只處理上傳目錄內的檔案，避免誤刪其他位置的檔案"""
+    try:
+        return Path(path).resolve().is_relative_to(UPLOAD_DIR.resolve())
+    except (OSError, ValueError):
+        return False
+
+
+def last_written(stat: os.stat_result) -> float:
+    """檔案最近一次寫入或被重複上傳的時間
+
+    重複上傳同樣的內容時修改時間不變，只更新存取時間，因此取兩者較晚的。
+    讀取檔案也可能更新存取時間（relatime），只會讓刪除稍微延後。
+    """
+    return max(stat.st_mtime, stat.st_atime)
+
+
+def remove_unreferenced(
+    paths, referenced, grace_seconds: Optional[float] = None
+) -> Tuple[List[str], List[str]]:
+    """刪除沒有被引用的檔案，回傳 (實際刪除的路徑, 因寬限期而延後的路徑)
+
+    最近 grace_seconds 秒內寫入或被重複上傳的檔案不刪除，
+    避免與尚未提交的上傳互相競爭。
+    """
+    grace_seconds = BLOB_RELEASE_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    now = time.time()
+    removed, deferred = [], []
+    for path in set(paths) - set(referenced):
+        if not path or not is_managed_path(path):
+            continue
+        try:
+            if now - last_written(os.stat(path)) < grace_seconds:
+                deferred.append(path)
+                continue
+            os.unlink(path)
+            removed.append(path)
+        except FileNotFoundError:
+            continue
+    return removed, deferred
+
+
+def release_files(db: Session, paths) -> List[str]:
+    """在刪除或改寫記錄並 commit 之後呼叫：釋放不再被引用的檔案
+
+    仍在寬限期內的檔案寫入待刪除檔案佇列，寬限期後由 purge_files 再確認一次。
+    """
+    paths = [p for p in paths if p]
+    if not paths:
+        return []
+    referenced = db.scalars(reference_query(paths)).all()
+    removed, deferred = remove_unreferenced(paths, referenced)
+    if deferred:
+        db.execute(insert(FilePurge), [{"file_path": path} for path in deferred])
+        db.commit()
+        schedule_purge_retry(db.get_bind())
+    return removed
+
+
+async def release_files_async(db: AsyncSession, paths, bind=None) -> List[str]:
+    """release_files 的 AsyncSession 版本
+
+    bind 為同步的資料庫引擎，寬限期後的清理在背景執行緒中以它執行；
+    為 None 時延後的檔案只寫入佇列，等下一次清理（例如啟動時）再處理。
+    """
+    paths = [p for p in paths if p]
+    if not paths:
+        return []
+    referenced = (await db.scalars(reference_query(paths))).all()
+    removed, deferred = await run_in_threadpool(remove_unreferenced, paths, referenced)
+    if deferred:
+        await db.execute(insert(FilePurge), [{"file_path": path} for path in deferred])
+        await db.commit()
+        if bind is not None:
+            schedule_purge_retry(bind)
+    return removed
+
+
+def drain_purge_queue(bind, batch_size: Optional[int] = None) -> int:
+    """分批處理待刪除檔案佇列，回傳刪除的檔案數
+
+    每批在自己的交易中確認路徑沒有被引用後刪除檔案，並移除佇列中的記錄；
+    仍在寬限期內的檔案留在佇列中，等下一次清理時再處理（purge_files 會在
+    寬限期後自動再清理一次）。
+    bind 為資料庫引擎，讓背景工作使用與請求相同的資料庫。
+    """
+    batch_size = batch_size or PURGE_BATCH_SIZE
+    removed_count = 0
+    last_id = 0
+    while True:
+        with Session(bind) as db:
+            rows = db.execute(
+                select(FilePurge.id, FilePurge.file_path)
+                .where(FilePurge.id > last_id)
+                .order_by(FilePurge.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return removed_count
+            last_id = rows[-1].id
+
+            paths = {row.file_path for row in rows}
+            referenced = db.scalars(reference_query(paths)).all()
+            removed, deferred = remove_unreferenced(paths, referenced)
+            removed_count += len(removed)
+            deferred = set(deferred)
+
+            done = [row.id for row in rows if row.file_path not in deferred]
+            db.execute(delete(FilePurge).where(FilePurge.id.in_(done)))
+            db.commit()
+
+
+# 佇列中仍有寬限期內的檔案時，等待寬限期後再清理一次的計時器（同時只有一個）
+_purge_retry: Optional[threading.Timer] = None
+_purge_retry_lock = threading.Lock()
+
+
+def purge_files(bind) -> int:
+    """背景工作：清理待刪除檔案佇列，回傳刪除的檔案數
+
+    因寬限期延後的檔案不必等下一次刪除工程專案或執行 reconcile，
+    而是在寬限期過後自動再清理一次。
+    """
+    try:
+        removed = drain_purge_queue(bind)
+        with Session(bind) as db:
+            pending = db.scalar(select(func.count()).select_from(FilePurge))
+    except Exception:
+        logger.exception("清理待刪除檔案佇列失敗")
+        return 0
+    if pending:
+        schedule_purge_retry(bind)
+    return removed
+
+
+def schedule_purge_retry(bind, delay: Optional[float] = None):
+    """在寬限期過後再執行一次 purge_files（已有等待中的計時器時不重複排程）"""
+    global _purge_retry
+    delay = BLOB_RELEASE_GRACE_SECONDS + 1 if delay is None else delay
+    with _purge_retry_lock:
+        if _purge_retry is not None and _purge_retry.is_alive():
+            return
+        _purge_retry = threading.Timer(delay, purge_files, args=(bind,))
+        _purge_retry.daemon = True
+        _purge_retry.start()
+
+
+def cancel_purge_retry():
+    """取消等待中的清理（關閉應用程式時呼叫）"""
+    global _purge_retry
+    with _purge_retry_lock:
+        if _purge_retry is not None:
+            _purge_retry.cancel()
+            _purge_retry = None
+
+
+def file_etag(path: Path, stat: os.stat_result) -> str:
+    """檔案的強 ETag
+
+    內容定址的檔案（檔名以 SHA-256 開頭，包含縮圖）直接使用檔名，
+    內容相同 ETag 就相同；其他檔案以修改時間與大小計算。
+    """
+    if _CONTENT_HASH_RE.match(path.stem):
+        return f'"{path.stem}"'
+    raw = f"{stat.st_mtime_ns}-{stat.st_size}"
+    return f'"{hashlib.sha256(raw.encode("ascii")).hexdigest()[:32]}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 使用弱比較：忽略 W/ 前綴"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """依條件式請求標頭判斷能否回傳 304（有 If-None-Match 時忽略 If-Modified-Since）"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def conditional_file_response(
+    request: Request,
+    path,
+    cache_control: str,
+    media_type: Optional[str] = None,
+    filename: Optional[str] = None,
+) -> Response:
+    """回傳帶有 ETag、Last-Modified 與 Cache-Control 的檔案回應
+
+    條件式請求的內容沒有改變時回傳 304；Range 與 If-Range 由 FileResponse 處理，
+    回傳 206。檔案不存在時拋出 FileNotFoundError。
+    """
+    path = Path(path)
+    stat = os.stat(path)
+    headers = {
+        "etag": file_etag(path, stat),
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+    }
+    if is_not_modified(request, headers["etag"], stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path,
+        headers=headers,
+        media_type=media_type,
+        filename=filename,
+        stat_result=stat,
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """在解析 multipart 之前限制請求大小
+
+    有 Content-Length 時直接比對；chunked 傳輸則在接收時累計位元組數，
+    超過上限就中止讀取並回傳 413。
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_SIZE):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = JSONResponse({"detail": REQUEST_TOO_LARGE_DETAIL}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # 由 FastAPI 的例外處理轉成 413 回應
+                    raise HTTPException(status_code=413, detail=REQUEST_TOO_LARGE_DETAIL)
+            return message
+
+        await self.app(scope, limited_receive, send)
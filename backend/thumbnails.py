@@ -0,0 +1,213 @@
+"""照片縮圖的產生與磁碟快取
+
+縮圖只提供固定的幾種尺寸，存放在 uploads/cache/thumbnails。原始檔位於內容定址
+儲存區時以其 SHA-256 作為快取鍵，內容改變就會是另一個鍵，舊縮圖不會被誤用；
+其他位置的原始檔則以路徑、修改時間與大小組成快取鍵，檔案被覆寫後自動重新產生。
+
+快取有總大小上限：每次讀取縮圖都會更新檔案的存取時間（atime），超過上限時從最久
+未使用的縮圖開始刪除（LRU）。修改時間保持為產生縮圖的時間，作為回應的
+Last-Modified，因此 If-Modified-Since 可以得到 304。
+
+Pillow 在第一次產生縮圖或查詢縮圖格式時才載入，不影響服務的啟動時間。
+"""
+import functools
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import storage
+
+logger = logging.getLogger(__name__)
+
+# 縮圖快取目錄
+THUMBNAIL_DIR = storage.UPLOAD_DIR / "cache" / "thumbnails"
+
+# 提供的縮圖尺寸（長邊像素）與預設尺寸
+THUMBNAIL_SIZES = (128, 256, 512, 1024)
+DEFAULT_THUMBNAIL_SIZE = 256
+# 上傳後立即產生的尺寸（其餘尺寸在第一次請求時產生）
+EAGER_THUMBNAIL_SIZES = tuple(
+    int(size) for size in os.getenv("EAGER_THUMBNAIL_SIZES", "256").split(",") if size.strip()
+)
+
+# 快取總大小上限（位元組），超過時刪除最久未使用的縮圖，降到上限的 90%
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+# 縮圖格式以模組屬性提供，第一次存取時才檢查 Pillow 的 WebP 支援
+_FORMAT_ATTRIBUTES = {"THUMBNAIL_FORMAT": 0, "THUMBNAIL_SUFFIX": 1, "THUMBNAIL_MEDIA_TYPE": 2}
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# 快取目前的大小（位元組）；None 代表尚未掃描
+_cache_bytes: Optional[int] = None
+_cache_lock = threading.Lock()
+# 讀取縮圖的命中、未命中（需要產生）與清理的次數，由 /metrics 輸出
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+class ThumbnailError(Exception):
+    """原始檔無法產生縮圖（不是圖片或檔案已損毀）"""
+
+
+@functools.lru_cache(maxsize=None)
+def thumbnail_format() -> Tuple[str, str, str]:
+    """縮圖的 (Pillow 格式, 副檔名, media type)：優先使用 WebP，沒有 WebP 支援時改用 JPEG"""
+    from PIL import features
+
+    if features.check("webp"):
+        return "WEBP", ".webp", "image/webp"
+    return "JPEG", ".jpg", "image/jpeg"
+
+
+def __getattr__(name: str):
+    if name in _FORMAT_ATTRIBUTES:
+        return thumbnail_format()[_FORMAT_ATTRIBUTES[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def cache_key(source: Path) -> str:
+    """取得原始檔的快取鍵"""
+    if _SHA256_RE.match(source.stem):
+        return source.stem
+    stat = source.stat()
+    raw = f"{source.resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def thumbnail_path(source: Path, size: int) -> Path:
+    """縮圖在快取中的路徑"""
+    key = cache_key(source)
+    return THUMBNAIL_DIR / key[:2] / f"{key}_{size}{thumbnail_format()[1]}"
+
+
+def _render(source: Path, dest: Path, size: int) -> int:
+    """產生縮圖並原子性地寫入 dest，回傳檔案大小"""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    image_format = thumbnail_format()[0]
+    try:
+        with Image.open(source) as image:
+            # JPEG 可在解碼時直接縮小，避免完整解碼大張照片
+            image.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if image.mode not in ("RGB", "RGBA") or (image_format == "JPEG" and image.mode == "RGBA"):
+                image = image.convert("RGB")
+
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=storage.TEMP_PREFIX, dir=dest.parent)
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    image.save(out, image_format, quality=THUMBNAIL_QUALITY)
+                os.replace(tmp_path, dest)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except FileNotFoundError:
+                    pass
+                raise
+    except FileNotFoundError:
+        raise
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ThumbnailError(f"無法產生縮圖: {e}") from e
+    return dest.stat().st_size
+
+
+def _scan_cache():
+    """列出快取中的縮圖：(最近使用時間, 大小, 路徑)"""
+    entries = []
+    if not THUMBNAIL_DIR.exists():
+        return entries
+    for directory in os.scandir(THUMBNAIL_DIR):
+        if not directory.is_dir():
+            continue
+        for entry in os.scandir(directory.path):
+            if entry.is_file() and not entry.name.startswith(storage.TEMP_PREFIX):
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+    return entries
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """快取超過上限時，從最久未使用的縮圖開始刪除，回傳刪除的檔案數"""
+    global _cache_bytes
+    max_bytes = THUMBNAIL_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _cache_lock:
+        entries = _scan_cache()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > max_bytes:
+            target = max_bytes * 9 // 10
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        _cache_bytes = total
+        _stats["evictions"] += removed
+    return removed
+
+
+def _account(added: int):
+    """累計新寫入的縮圖大小，超過上限時觸發清理"""
+    global _cache_bytes
+    with _cache_lock:
+        if _cache_bytes is not None:
+            _cache_bytes += added
+        over_budget = _cache_bytes is None or _cache_bytes > THUMBNAIL_CACHE_MAX_BYTES
+    if over_budget:
+        evict()
+
+
+def get_thumbnail(source_path: str, size: int = DEFAULT_THUMBNAIL_SIZE) -> Path:
+    """取得原始檔的縮圖路徑，快取中沒有時立即產生
+
+    原始檔不存在時拋出 FileNotFoundError，無法解碼時拋出 ThumbnailError。
+    """
+    if size not in THUMBNAIL_SIZES:
+        raise ValueError(f"不支援的縮圖尺寸: {size}")
+    source = Path(source_path)
+    dest = thumbnail_path(source, size)
+    try:
+        # 只更新存取時間作為 LRU 的最近使用時間，修改時間（Last-Modified）不變
+        os.utime(dest, ns=(time.time_ns(), dest.stat().st_mtime_ns))
+    except FileNotFoundError:
+        pass
+    else:
+        _count("hits")
+        return dest
+    _count("misses")
+    _account(_render(source, dest, size))
+    return dest
+
+
+def _count(name: str):
+    with _cache_lock:
+        _stats[name] += 1
+
+
+def cache_stats() -> dict:
+    """縮圖快取的統計（bytes 在第一次清理或掃描前為 None）"""
+    with _cache_lock:
+        return {**_stats, "bytes": _cache_bytes}
+
+
+def generate_thumbnails(source_paths: Iterable[str], sizes: Iterable[int] = EAGER_THUMBNAIL_SIZES):
+    """上傳後在背景預先產生縮圖；失敗只記錄，不影響上傳結果"""
+    for source_path in dict.fromkeys(source_paths):
+        for size in sizes:
+            try:
+                get_thumbnail(source_path, size)
+            except (ThumbnailError, FileNotFoundError, ValueError) as e:
+                logger.info("略過縮圖 %s (%s): %s", source_path, size, e)
@@ -0,0 +1,91 @@
+"""邊讀取邊送出的 ZIP 串流
+
+zipfile 寫入不可 seek 的輸出時，會在每個檔案內容之後以 data descriptor 記錄
+CRC 與大小，因此不需要先知道壓縮結果即可開始輸出。每讀取一個區塊就把已產生
+的位元組送出，記憶體中只保留一個區塊，檔案數量與大小都不影響記憶體用量。
+
+抽查表多為 PDF、照片多為 JPEG，本身已經壓縮，預設以 ZIP_STORED 儲存。
+"""
+import os
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple
+
+# 每次讀取與送出的區塊大小
+ARCHIVE_CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamBuffer:
+    """只能寫入的緩衝區，供 zipfile 當作不可 seek 的輸出"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip_entries(entries: Iterable[Tuple[zipfile.ZipInfo, Iterable[bytes]]]) -> Iterator[bytes]:
+    """依序把 (ZipInfo, 內容區塊) 寫入 ZIP，邊產生邊回傳位元組
+
+    壓縮方式依各項目的 ZipInfo.compress_type；內容區塊可以是產生器，
+    在壓縮檔寫到該項目時才開始產生。
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", allowZip64=True) as archive:
+        for info, chunks in entries:
+            with archive.open(info, "w") as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    # 中央目錄在關閉壓縮檔時寫入
+    yield buffer.drain()
+
+
+def file_entries(
+    entries: Iterable[Tuple[str, str]],
+    compression: int = zipfile.ZIP_STORED,
+    chunk_size: int = ARCHIVE_CHUNK_SIZE,
+) -> Iterator[Tuple[zipfile.ZipInfo, Iterator[bytes]]]:
+    """開啟 (壓縮檔內名稱, 檔案路徑) 並產生 (ZipInfo, 內容區塊)，供 iter_zip_entries 使用
+
+    串流開始後才消失的檔案直接略過。
+    """
+    for arcname, path in entries:
+        try:
+            source = open(path, "rb")
+        except FileNotFoundError:
+            continue
+        with source:
+            stat = os.fstat(source.fileno())
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(stat.st_mtime)[:6])
+            info.compress_type = compression
+            # 預先提供大小，超過 4 GiB 時 zipfile 會改用 ZIP64 標頭
+            info.file_size = stat.st_size
+            yield info, iter(lambda: source.read(chunk_size), b"")
+
+
+def iter_zip(
+    entries: Iterable[Tuple[str, str]],
+    compression: int = zipfile.ZIP_STORED,
+    chunk_size: int = ARCHIVE_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """依序把 (壓縮檔內名稱, 檔案路徑) 寫入 ZIP，邊產生邊回傳位元組
+
+    串流開始後才消失的檔案直接略過。
+    """
+    return iter_zip_entries(file_entries(entries, compression, chunk_size))
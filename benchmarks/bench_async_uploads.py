@@ -0,0 +1,97 @@
+"""照片上傳進行中的讀取延遲
+
+在同一個事件迴圈上同時進行 N 個照片上傳，量測讀取端點的 p50/p99 延遲，
+並與沒有上傳時的基準比較。上傳處理若阻塞事件迴圈，p99 會明顯上升。
+回應快取停用，每次讀取都經過資料庫查詢。
+
+用法（在專案根目錄）：
+    PYTHONPATH=backend python benchmarks/bench_async_uploads.py --uploads 20 --size-mb 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_uploads_")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+# 停用回應快取，否則讀取大多由記憶體回傳，量測不到資料庫查詢的延遲
+os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+os.chdir(WORKDIR)
+
+import httpx  # noqa: E402
+from main import app  # noqa: E402
+from database import Base, engine  # noqa: E402
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def measure_reads(client, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = await client.get("/projects/1/contract-items/", params={"limit": 50})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def upload_loop(client, payload, stop):
+    uploaded = 0
+    while not stop.is_set():
+        response = await client.post(
+            "/photos/upload/",
+            files={"file": ("bench.jpg", payload, "image/jpeg")},
+            data={"project_id": "1"},
+        )
+        response.raise_for_status()
+        uploaded += 1
+    return uploaded
+
+
+async def run(args):
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/projects/", json={
+            "name": "效能測試", "contract_number": "BENCH-1", "contractor": "-", "location": "-"
+        })
+        await client.post("/projects/1/contract-items/bulk", json=[
+            {"pcces_code": f"1-{i}", "name": "工項", "unit": "式",
+             "quantity": 1, "unit_price": 1, "total_price": 1}
+            for i in range(1000)
+        ])
+
+        idle = await measure_reads(client, args.reads)
+
+        payload = os.urandom(int(args.size_mb * 1024 * 1024))
+        stop = asyncio.Event()
+        uploaders = [asyncio.create_task(upload_loop(client, payload, stop)) for _ in range(args.uploads)]
+        await asyncio.sleep(0.2)
+        busy = await measure_reads(client, args.reads)
+        stop.set()
+        uploaded = sum(await asyncio.gather(*uploaders))
+
+    for name, latencies in (("idle", idle), (f"{args.uploads} uploads", busy)):
+        print(
+            f"{name:<12} reads={len(latencies):>4}  p50={statistics.median(latencies) * 1000:8.2f}ms  "
+            f"p99={percentile(latencies, 0.99) * 1000:8.2f}ms"
+        )
+    print(f"uploads completed during measurement: {uploaded}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=20, help="同時進行的上傳數")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="每張照片的大小")
+    parser.add_argument("--reads", type=int, default=200, help="量測的讀取次數")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""契約項目匯出：DataFrame + BytesIO 與串流匯出的比較
+
+建立 N 筆契約項目，分別以兩種方式產生 1k、10k、100k 筆的 XLSX：
+
+- dataframe：原本前端的做法，讀出全部資料建立 DataFrame，價格轉成千分位字串，
+  以 pandas.ExcelWriter(openpyxl) 寫入 BytesIO
+- stream：exporter 的路徑，以伺服器端游標逐批讀取，邊產生邊輸出
+
+量測總耗時、第一個位元組的時間與 Python 配置的記憶體峰值（tracemalloc）。
+串流路徑的輸出只計算長度，模擬直接寫入網路連線。tracemalloc 會拖慢兩者的耗時，
+比較時看相對值即可。
+
+用法（在專案根目錄）：
+    PYTHONPATH=backend python benchmarks/bench_contract_item_export.py
+"""
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_export_")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.chdir(WORKDIR)
+
+from sqlalchemy import insert, select  # noqa: E402
+
+import exporter  # noqa: E402
+from database import Base, SessionLocal, engine  # noqa: E402
+from models import ContractItem, Project  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def populate(project_id, rows, batch=50_000):
+    rng = random.Random(20)
+    with SessionLocal() as db:
+        db.execute(insert(Project), [
+            {"id": project_id, "name": f"匯出測試工程 {rows}", "contract_number": f"E-{rows}",
+             "contractor": "營造", "location": "台中市"}
+        ])
+        for start in range(0, rows, batch):
+            db.execute(insert(ContractItem), [
+                {
+                    "project_id": project_id,
+                    "pcces_code": f"{rng.randint(1, 9999):04d}",
+                    "name": f"預拌混凝土 210kgf/cm2 第{n}項",
+                    "unit": "m3",
+                    "quantity": round(rng.uniform(1, 1000), 2),
+                    "unit_price": round(rng.uniform(10, 5000), 1),
+                    "total_price": round(rng.uniform(100, 1e6), 0),
+                }
+                for n in range(start, min(rows, start + batch))
+            ])
+        db.commit()
+
+
+def statement(project_id):
+    return (
+        select(*(getattr(ContractItem, field) for field, _ in exporter.EXPORT_COLUMNS))
+        .where(ContractItem.project_id == project_id)
+        .order_by(ContractItem.id)
+    )
+
+
+def dataframe_path(project_id):
+    import pandas as pd
+
+    with SessionLocal() as db:
+        rows = db.execute(statement(project_id)).all()
+    df = pd.DataFrame(rows, columns=[header for _, header in exporter.EXPORT_COLUMNS])
+    df["單價"] = df["單價"].apply(lambda x: f"{x:,.2f}")
+    df["複價"] = df["複價"].apply(lambda x: f"{x:,.2f}")
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="合約項目")
+    yield output.getvalue()
+
+
+def stream_path(project_id):
+    return exporter.iter_xlsx(exporter.iter_batches(engine, statement(project_id)))
+
+
+def measure(make_chunks, project_id):
+    tracemalloc.start()
+    begin = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in make_chunks(project_id):
+        if first is None:
+            first = time.perf_counter() - begin
+        size += len(chunk)
+    total = time.perf_counter() - begin
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total * 1000, first * 1000, peak / 1024 / 1024, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--skip-dataframe", action="store_true", help="未安裝 pandas 時只量測串流路徑")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    for project_id, size in enumerate(SIZES, start=1):
+        populate(project_id, size)
+
+    paths = [("stream", stream_path)]
+    if not args.skip_dataframe:
+        paths.insert(0, ("dataframe", dataframe_path))
+    for project_id, size in enumerate(SIZES, start=1):
+        for name, path in paths:
+            total_ms, first_ms, peak_mib, length = measure(path, project_id)
+            print(
+                f"{size:>7} 筆  {name:<9}  總計 {total_ms:8.1f} ms  第一個位元組 {first_ms:8.1f} ms  "
+                f"記憶體峰值 {peak_mib:7.1f} MiB  {length / 1024:8.0f} KiB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""清單輸出：ORM + response_model 與資料列 + orjson 的比較
+
+建立 N 筆契約項目，分別以兩種方式產生 1k、10k、100k 筆的 JSON：
+
+- orm：查詢 ORM 物件，以 List[schemas.ContractItem] 驗證（from_attributes）後
+  dump_json，與 FastAPI 依 response_model 輸出的流程相同
+- fast：fast_json 的路徑，只查詢 schema 欄位的資料列，轉成 dict 後以 orjson 輸出
+
+兩者的輸出會先比對是否完全相同。清單端點每頁最多 MAX_PAGE_SIZE 筆，此處直接
+量測查詢與序列化，不經過 HTTP。
+
+用法（在專案根目錄）：
+    PYTHONPATH=backend python benchmarks/bench_list_serialization.py --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_list_")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.chdir(WORKDIR)
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert, select  # noqa: E402
+
+import schemas  # noqa: E402
+from database import Base, SessionLocal, engine  # noqa: E402
+from fast_json import ORJSONResponse, row_serializer  # noqa: E402
+from models import ContractItem, Project  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+
+
+def populate(rows, batch=50_000):
+    rng = random.Random(16)
+    with SessionLocal() as db:
+        db.execute(insert(Project), [
+            {"id": 1, "name": "序列化測試工程", "contract_number": "B-1", "contractor": "營造", "location": "台中市"}
+        ])
+        for start in range(0, rows, batch):
+            db.execute(insert(ContractItem), [
+                {
+                    "project_id": 1,
+                    "pcces_code": f"{rng.randint(1, 9999):04d}",
+                    "name": f"預拌混凝土 210kgf/cm2 第{n}項",
+                    "unit": "m3",
+                    "quantity": round(rng.uniform(1, 1000), 2),
+                    "unit_price": round(rng.uniform(10, 5000), 1),
+                    "total_price": round(rng.uniform(100, 1e6), 0),
+                }
+                for n in range(start, min(rows, start + batch))
+            ])
+        db.commit()
+
+
+def orm_path(size: int, adapter: TypeAdapter) -> bytes:
+    with SessionLocal() as db:
+        items = db.scalars(select(ContractItem).order_by(ContractItem.id).limit(size)).all()
+        return adapter.dump_json(adapter.validate_python(items))
+
+
+def fast_path(size: int) -> bytes:
+    serializer = row_serializer(schemas.ContractItem, ContractItem)
+    with SessionLocal() as db:
+        rows = db.execute(select(*serializer.columns).order_by(ContractItem.id).limit(size)).all()
+        return ORJSONResponse(serializer.to_dicts(rows), fallback=serializer.list_adapter).body
+
+
+def measure(func, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    populate(max(SIZES))
+    adapter = TypeAdapter(List[schemas.ContractItem])
+
+    for size in SIZES:
+        expected, actual = orm_path(size, adapter), fast_path(size)
+        if expected != actual:
+            print(f"{size} 筆的輸出不一致", file=sys.stderr)
+            sys.exit(1)
+        orm_ms = measure(orm_path, args.repeat, size, adapter)
+        fast_ms = measure(fast_path, args.repeat, size)
+        print(
+            f"{size:>7} 筆  {len(actual) / 1024:8.0f} KiB  "
+            f"orm {orm_ms:8.1f} ms  fast {fast_ms:8.1f} ms  {orm_ms / fast_ms:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""監控指標對清單端點的額外開銷
+
+在同一個行程中建立兩個 middleware stack：一個包含 MetricsMiddleware 並掛上資料庫
+事件，另一個兩者都沒有。直接以 ASGI 呼叫（不經過 HTTP 與 TestClient，開銷只與
+端點本身比較），停用回應快取讓每個請求都執行查詢：
+
+- /projects/
+- /projects/1/contract-items/?limit=100
+- /projects/1/photos/?limit=100
+
+兩種設定以短區塊交替執行，抵銷機器負載的變化，比較每個請求時間的中位數。
+
+用法（在專案根目錄）：
+    python benchmarks/bench_metrics_overhead.py --block 20 --rounds 200
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_metrics_")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.environ.setdefault("UPLOAD_DIR", os.path.join(WORKDIR, "uploads"))
+os.environ["RESPONSE_CACHE_MAX_BYTES"] = "0"
+os.environ["METRICS_ENABLED"] = "1"
+os.chdir(WORKDIR)
+
+from sqlalchemy import event, insert  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+import migrations  # noqa: E402
+from database import SessionLocal, engine  # noqa: E402
+from models import ContractItem, Photo, Project  # noqa: E402
+
+ENDPOINTS = [
+    ("/projects/", b""),
+    ("/projects/1/contract-items/", b"limit=100"),
+    ("/projects/1/photos/", b"limit=100"),
+]
+QUERY_HOOKS = [
+    ("before_cursor_execute", metrics._before_cursor_execute),
+    ("after_cursor_execute", metrics._after_cursor_execute),
+]
+
+
+def populate(rows: int):
+    migrations.prepare_database(engine)
+    with SessionLocal() as db:
+        db.execute(insert(Project), [
+            {"id": n, "name": f"監控測試工程 {n}", "contract_number": f"M-{n}", "contractor": "營造", "location": "台中市"}
+            for n in range(1, 21)
+        ])
+        db.execute(insert(ContractItem), [
+            {"project_id": 1, "pcces_code": f"{n:04d}", "name": f"預拌混凝土 第{n}項", "unit": "m3",
+             "quantity": 1.5, "unit_price": 2300.0, "total_price": 3450.0}
+            for n in range(rows)
+        ])
+        db.execute(insert(Photo), [
+            {"project_id": 1, "filename": f"{n}.jpg", "file_path": f"uploads/blobs/00/{n:064d}.jpg", "description": "施工照片"}
+            for n in range(rows)
+        ])
+        db.commit()
+
+
+def build_stacks():
+    """(停用, 啟用) 兩個 middleware stack"""
+    enabled = main.app.build_middleware_stack()
+    middleware = main.app.user_middleware
+    main.app.user_middleware = [m for m in middleware if m.cls is not metrics.MetricsMiddleware]
+    try:
+        disabled = main.app.build_middleware_stack()
+    finally:
+        main.app.user_middleware = middleware
+    return disabled, enabled
+
+
+def set_query_hooks(enabled: bool):
+    for name, hook in QUERY_HOOKS:
+        if enabled and not event.contains(Engine, name, hook):
+            event.listen(Engine, name, hook)
+        elif not enabled and event.contains(Engine, name, hook):
+            event.remove(Engine, name, hook)
+
+
+async def call(app, path: str, query: bytes):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": query, "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80), "app": main.app,
+    }
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    assert status == 200, (path, status)
+
+
+async def measure(block: int, rounds: int):
+    stacks = build_stacks()
+    timings = {(endpoint, enabled): [] for endpoint in ENDPOINTS for enabled in (False, True)}
+    for round_number in range(rounds + 1):
+        for endpoint in ENDPOINTS:
+            for enabled in (False, True):
+                # 切換事件後的第一個請求不列入
+                set_query_hooks(enabled)
+                await call(stacks[enabled], *endpoint)
+                for _ in range(block):
+                    start = time.perf_counter()
+                    await call(stacks[enabled], *endpoint)
+                    elapsed = time.perf_counter() - start
+                    # 第一輪只用來預熱
+                    if round_number:
+                        timings[endpoint, enabled].append(elapsed)
+    return timings
+
+
+def main_():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--block", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    try:
+        populate(args.rows)
+        timings = asyncio.run(measure(args.block, args.rounds))
+    finally:
+        engine.dispose()
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+
+    print(f"{'端點':<42}{'停用 (µs)':>12}{'啟用 (µs)':>12}{'差異':>9}")
+    for path, query in ENDPOINTS:
+        off = statistics.median(timings[(path, query), False]) * 1e6
+        on = statistics.median(timings[(path, query), True]) * 1e6
+        label = f"{path}?{query.decode()}" if query else path
+        print(f"{label:<42}{off:>12.1f}{on:>12.1f}{(on - off) / off:>+9.1%}")
+
+
+if __name__ == "__main__":
+    main_()
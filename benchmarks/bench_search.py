@@ -0,0 +1,84 @@
+"""全文檢索延遲
+
+建立 N 筆契約項目（名稱由常見工項詞彙組合）與少量工程專案、抽查、照片，
+量測 /search 在不同查詢下的 p50/p99 延遲。
+
+用法（在專案根目錄）：
+    PYTHONPATH=backend python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="bench_search_")
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}")
+os.chdir(WORKDIR)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from database import Base, SessionLocal, engine  # noqa: E402
+from main import app  # noqa: E402
+from models import ContractItem, Project  # noqa: E402
+
+WORDS = [
+    "預拌混凝土", "鋼筋加工及組立", "模板組立", "瀝青混凝土鋪面", "級配粒料底層", "排水溝",
+    "擋土牆", "植生綠化", "交通維持", "施工便道", "鋼板樁", "AC 路面刨除", "標線", "護欄",
+    "人孔", "管涵", "基樁", "預力鋼腱", "伸縮縫", "防水層",
+]
+SPECS = ["210kgf/cm2", "280kgf/cm2", "SD420W", "D13", "D25", "厚 5cm", "寬 30cm", "H=2m"]
+
+QUERIES = ["混凝土", "鋼筋加工", "伸縮縫 D25", "預力鋼腱", "不存在的工項", "鋼板", "AC"]
+
+
+def populate(rows, batch=50_000):
+    rng = random.Random(15)
+    with SessionLocal() as db:
+        db.execute(insert(Project), [
+            {"id": i, "name": f"第{i}標道路改善工程", "contract_number": f"B-{i}", "contractor": "營造", "location": "台中市"}
+            for i in range(1, 101)
+        ])
+        for start in range(0, rows, batch):
+            db.execute(insert(ContractItem), [
+                {
+                    "project_id": rng.randint(1, 100),
+                    "pcces_code": f"{rng.randint(1, 9999):04d}",
+                    "name": f"{rng.choice(WORDS)} {rng.choice(SPECS)} 第{n}項",
+                }
+                for n in range(start, min(rows, start + batch))
+            ])
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    start = time.perf_counter()
+    populate(args.rows)
+    print(f"建立 {args.rows} 筆契約項目與索引: {time.perf_counter() - start:.1f} 秒", file=sys.stderr)
+
+    with TestClient(app) as client:
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.repeat):
+                begin = time.perf_counter()
+                response = client.get("/search", params={"q": query, "limit": 50})
+                latencies.append((time.perf_counter() - begin) * 1000)
+                response.raise_for_status()
+            latencies.sort()
+            print(
+                f"{query:<12} 回傳 {len(response.json()):>3} 筆  "
+                f"p50 {statistics.median(latencies):7.1f} ms  p99 {latencies[int(len(latencies) * 0.99)]:7.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""SQLite 連線設定的混合讀寫效能比較
+
+比較預設的 rollback journal 與 database.SQLITE_PRAGMAS（WAL）兩種設定，
+在多執行緒同時讀取契約項目、寫入照片記錄時的吞吐量與 "database is locked" 次數。
+
+用法（在專案根目錄）：
+    PYTHONPATH=backend python benchmarks/bench_sqlite_profile.py --threads 16 --seconds 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, create_db_engine, SQLITE_PRAGMAS
+from models import Project, ContractItem, Photo
+
+PROFILES = {
+    "rollback-journal": {},
+    "wal-tuned": SQLITE_PRAGMAS,
+}
+
+
+def seed(engine, items):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Project), [{"id": 1, "name": "效能測試", "contract_number": "BENCH-1"}])
+        conn.execute(insert(ContractItem), [
+            {"project_id": 1, "pcces_code": f"1-{i}", "name": f"工項 {i}", "unit": "式",
+             "quantity": 1.0, "unit_price": 100.0, "total_price": 100.0}
+            for i in range(items)
+        ])
+
+
+def worker(Session, stop, write_ratio, stats, lock):
+    rng = random.Random(threading.get_ident())
+    reads = writes = locked = 0
+    latencies = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        db = Session()
+        try:
+            if rng.random() < write_ratio:
+                db.execute(insert(Photo).values(project_id=1, filename="bench.jpg", file_path="uploads/photos/bench.jpg"))
+                db.commit()
+                writes += 1
+            else:
+                db.execute(
+                    select(ContractItem).where(ContractItem.project_id == 1).limit(100)
+                ).all()
+                reads += 1
+                latencies.append(time.perf_counter() - start)
+        except OperationalError as e:
+            db.rollback()
+            if "locked" not in str(e):
+                raise
+            locked += 1
+        finally:
+            db.close()
+    with lock:
+        stats["reads"] += reads
+        stats["writes"] += writes
+        stats["locked"] += locked
+        stats["latencies"].extend(latencies)
+
+
+def run_profile(name, pragmas, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = create_db_engine(url, pragmas=pragmas)
+        seed(engine, args.items)
+        Session = sessionmaker(bind=engine)
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        stats = {"reads": 0, "writes": 0, "locked": 0, "latencies": []}
+        threads = [
+            threading.Thread(target=worker, args=(Session, stop, args.write_ratio, stats, lock))
+            for _ in range(args.threads)
+        ]
+        for t in threads:
+            t.start()
+        time.sleep(args.seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+
+    latencies = sorted(stats["latencies"]) or [0.0]
+    p99 = latencies[int(len(latencies) * 0.99) - 1 if len(latencies) > 1 else 0]
+    total = stats["reads"] + stats["writes"]
+    print(
+        f"{name:<18} ops/s={total / args.seconds:>9.1f}  reads={stats['reads']:>7}  "
+        f"writes={stats['writes']:>6}  locked={stats['locked']:>5}  read_p99={p99 * 1000:.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    for name, pragmas in PROFILES.items():
+        run_profile(name, pragmas, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""後端冷啟動時間
+
+每次量測都啟動新的直譯器（與容器重新啟動、測試執行相同，沒有已載入的模組）：
+
+- import：匯入 main 的時間
+- 第一個成功請求：從啟動 uvicorn 行程到 GET /projects/ 回傳 200 的時間，
+  分為全新的資料庫（建立結構）與既有的資料庫（重新啟動）兩種情況
+
+另外列出匯入 main 後已載入的重量級模組，確認只在需要時才載入。
+
+用法（在專案根目錄）：
+    python benchmarks/bench_startup.py --repeat 5
+"""
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+HEAVY_MODULES = ("PIL", "alembic", "openpyxl", "xlrd", "pandas")
+
+IMPORT_SNIPPET = """
+import sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+print(elapsed * 1000)
+print(",".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def environment(workdir: Path) -> dict:
+    return {
+        **os.environ,
+        "PYTHONPATH": str(BACKEND_DIR),
+        "SQLALCHEMY_DATABASE_URL": f"sqlite:///{workdir / 'data' / 'sql_app.db'}",
+        "UPLOAD_DIR": str(workdir / "uploads"),
+    }
+
+
+def measure_import(workdir: Path):
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(modules=HEAVY_MODULES)],
+        cwd=workdir, env=environment(workdir), capture_output=True, text=True, check=True,
+    )
+    elapsed, loaded = result.stdout.split("\n")[:2]
+    return float(elapsed), loaded
+
+
+def measure_first_request(workdir: Path, timeout: float = 30.0) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/projects/"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=environment(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.005)
+        raise RuntimeError("後端未在時限內啟動")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, fresh, restart = [], [], []
+    loaded = ""
+    for _ in range(args.repeat):
+        workdir = Path(tempfile.mkdtemp(prefix="bench_startup_"))
+        try:
+            elapsed, loaded = measure_import(workdir)
+            imports.append(elapsed)
+            fresh.append(measure_first_request(workdir))
+            restart.append(measure_first_request(workdir))
+        finally:
+            shutil.rmtree(workdir)
+
+    # 行程啟動時間受系統負載影響大，同時列出中位數與最小值
+    for label, timings in [
+        ("import main                  ", imports),
+        ("第一個成功請求（全新資料庫） ", fresh),
+        ("第一個成功請求（重新啟動）   ", restart),
+    ]:
+        print(f"{label}  中位數 {statistics.median(timings):8.1f} ms  最小 {min(timings):8.1f} ms")
+    print(f"匯入後已載入的重量級模組：{loaded or '無'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,179 @@
-from re import A
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import tempfile
+import threading
+import time
 
 # 從環境變量或默認值配置 API URL
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+# 連線池大小（Streamlit 每個使用者工作階段一個執行緒，共用同一個連線池）
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "20"))
+# 連線失敗或 502/503/504 時的重試次數（只重試 GET 等冪等請求）
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+# 讀取結果的快取秒數，0 代表不快取
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "30"))
+# 快取最多保留的結果數，超過時先移除最早到期的
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))
+
+# 寫入某個端點時，一併失效的其他端點
+# （抽查表電子檔的路徑出現在抽查表列表中）
+RELATED_ENDPOINTS = {
+    "inspection-files": ["inspections"],
+}
+
+
+def create_session():
+    """建立共用連線池、失敗自動重試的 requests.Session"""
+    session = requests.Session()
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# 模組層級的 Session，Streamlit 重新執行頁面時沿用已建立的連線
+session = create_session()
+
+# 讀取結果的快取：{(端點, 專案, 網址, 參數): (到期時間, 資料, 下一頁游標)}
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(endpoint, project_id, url, params):
+    return (endpoint, project_id, url, tuple(sorted((params or {}).items())))
+
+
+def cached_get(endpoint, url, project_id=None, params=None):
+    """以 GET 取得 JSON，成功的結果在 API_CACHE_TTL 秒內直接由快取回傳
+
+    回傳 (資料, 下一頁游標)；失敗時拋出 requests.HTTPError 或 RequestException。
+    """
+    key = _cache_key(endpoint, project_id, url, params)
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None and entry[0] > now:
+        return entry[1], entry[2]
+
+    response = session.get(url, params=params)
+    response.raise_for_status()
+    result = (response.json(), response.headers.get("X-Next-Cursor"))
+    if API_CACHE_TTL > 0 and API_CACHE_MAX_ENTRIES > 0:
+        with _cache_lock:
+            _cache.pop(key, None)
+            _prune_cache(now)
+            _cache[key] = (now + API_CACHE_TTL, *result)
+    return result
+
+
+def _prune_cache(now):
+    """移除已過期的快取，仍超過 API_CACHE_MAX_ENTRIES 時移除最早到期的（呼叫者須持有 _cache_lock）
+
+    到期時間是寫入時間加上固定的 API_CACHE_TTL，因此字典的插入順序就是到期順序。
+    """
+    for key in [key for key, entry in _cache.items() if entry[0] <= now]:
+        del _cache[key]
+    while len(_cache) >= API_CACHE_MAX_ENTRIES:
+        del _cache[next(iter(_cache))]
+
+
+def invalidate_cache(endpoint=None):
+    """寫入後清除相關的讀取快取
+
+    清除端點第一段路徑（例如 inspections/3 → inspections）開頭的所有快取，
+    包含各工程專案底下的同名列表。刪除或修改工程專案會連帶影響其他資料，
+    因此清除全部快取；endpoint 為 None 時也清除全部。
+    """
+    root = endpoint.strip("/").split("/")[0] if endpoint else None
+    with _cache_lock:
+        if root is None or root == "projects":
+            _cache.clear()
+            return
+        prefixes = [root] + RELATED_ENDPOINTS.get(root, [])
+        for key in [key for key in _cache if key[0].startswith(tuple(prefixes))]:
+            del _cache[key]
+
+
+def _error_text(error):
+    """取得錯誤訊息（HTTP 錯誤顯示後端回傳的內容）"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.text
+    return str(error)
+
+
 def fetch_data(endpoint, project_id=None):
     """從 API 獲取數據"""
     try:
         url = f"{API_URL}/{endpoint}"
         if project_id is not None:
             url = f"{API_URL}/projects/{project_id}/{endpoint}"
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"獲取數據失敗：{response.text}")
-            return []
+        data, _ = cached_get(endpoint, url, project_id)
+        return data
     except requests.RequestException as e:
-        st.error(f"獲取數據失敗：{str(e)}")
+        st.error(f"獲取數據失敗：{_error_text(e)}")
         return []
     
+def fetch_pages(endpoint, project_id=None, pages=1, limit=100):
+    """依序取得前 pages 頁資料（後端以 X-Next-Cursor 標頭提供下一頁游標）
+
+    pages 為 None 時取得全部分頁。回傳 (資料列表, 是否還有下一頁)。
+    """
+    url = f"{API_URL}/{endpoint}"
+    if project_id is not None:
+        url = f"{API_URL}/projects/{project_id}/{endpoint}"
+
+    items = []
+    params = {"limit": limit}
+    fetched = 0
+    try:
+        while True:
+            data, cursor = cached_get(endpoint, url, project_id, params)
+            items.extend(data)
+            fetched += 1
+            if not cursor:
+                return items, False
+            if pages is not None and fetched >= pages:
+                return items, True
+            params = {"limit": limit, "cursor": cursor}
+    except requests.RequestException as e:
+        st.error(f"獲取數據失敗：{_error_text(e)}")
+        return items, False
+
+def fetch_all(endpoint, project_id=None, limit=1000):
+    """取得全部資料（依游標讀完所有分頁），用於工程專案選單等筆數不多的列表"""
+    items, _ = fetch_pages(endpoint, project_id, pages=None, limit=limit)
+    return items
+    
 def fetch_data_by_id(endpoint, id):
     """從 API 獲取數據"""
     try:
         url = f"{API_URL}/{endpoint}/{id}"
         st.toast(url)
-        response = requests.get(url)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"獲取數據失敗：{response.text}")
-            return []
+        data, _ = cached_get(f"{endpoint}/{id}", url)
+        return data
     except requests.RequestException as e:
-        st.error(f"獲取數據失敗：{str(e)}")
+        st.error(f"獲取數據失敗：{_error_text(e)}")
         return []
 
 def create_data(endpoint, data):
     """創建新數據"""
     try:
-        response = requests.post(
+        response = session.post(
             f"{API_URL}/{endpoint}",
             json=data
         )
+        invalidate_cache(endpoint)
         if response.status_code == 200:
             st.success("創建成功！")
             return response.json()
@@ -58,10 +188,11 @@ def create_data(endpoint, data):
 def update_data(endpoint, id, data):
     """更新數據"""
     try:
-        response = requests.put(
+        response = session.put(
             f"{API_URL}/{endpoint}/{id}",
             json=data
         )
+        invalidate_cache(endpoint)
         if response.status_code == 200:
             st.success("更新成功！")
             return response.json()
@@ -75,7 +206,8 @@ def update_data(endpoint, id, data):
 def delete_data(endpoint, id):
     """刪除數據"""
     try:
-        response = requests.delete(f"{API_URL}/{endpoint}/{id}")
+        response = session.delete(f"{API_URL}/{endpoint}/{id}")
+        invalidate_cache(endpoint)
         if response.status_code == 200:
             # st.success("刪除成功！")
             return True
@@ -86,11 +218,26 @@ def delete_data(endpoint, id):
         # st.error(f"刪除失敗：{str(e)}")
         return False
     
+def delete_many(endpoint, ids):
+    """批次刪除數據（單一請求，ids 以查詢參數傳遞），回傳刪除筆數"""
+    try:
+        response = session.delete(f"{API_URL}/{endpoint}", params={"ids": list(ids)})
+        invalidate_cache(endpoint)
+        if response.status_code == 200:
+            return response.json()["deleted"]
+        else:
+            st.error(f"刪除失敗：{response.text}")
+            return 0
+    except requests.RequestException as e:
+        st.error(f"刪除失敗：{str(e)}")
+        return 0
+
 def upload_file(endpoint, files, data):
     """上傳文件"""
 
     try:
-        response = requests.post(f"{API_URL}/{endpoint}", files=files, data=data)
+        response = session.post(f"{API_URL}/{endpoint}", files=files, data=data)
+        invalidate_cache(endpoint)
         st.write(f"{API_URL}/{endpoint}")
         if response.status_code == 200:
             return response.json()
@@ -104,7 +251,7 @@ def upload_file(endpoint, files, data):
 def download_file(endpoint,id):
     """下載文件"""
     try:
-        response = requests.get(f"{API_URL}/{endpoint}/{id}")
+        response = session.get(f"{API_URL}/{endpoint}/{id}")
         if response.status_code == 200:
             return response.content
         else:
@@ -112,4 +259,31 @@ def download_file(endpoint,id):
             return None
     except requests.RequestException as e:
         st.error(f"文件下載失敗：{str(e)}")
-        return None
\ No newline at end of file
+        return None
+
+def _download_to_tempfile(method, url, chunk_size, **kwargs):
+    """以串流方式把回應寫入暫存檔，不在記憶體中保留整個檔案
+
+    回傳已移到開頭的暫存檔（可直接交給 st.download_button），失敗時回傳 None。
+    """
+    try:
+        with session.request(method, url, stream=True, **kwargs) as response:
+            if response.status_code != 200:
+                st.error(f"文件下載失敗：{response.text}")
+                return None
+            output = tempfile.TemporaryFile()
+            for chunk in response.iter_content(chunk_size):
+                output.write(chunk)
+        output.seek(0)
+        return output
+    except requests.RequestException as e:
+        st.error(f"文件下載失敗：{str(e)}")
+        return None
+
+def download_archive(endpoint, ids, chunk_size=1024 * 1024):
+    """以單一請求下載多個文件的 ZIP（串流寫入暫存檔）"""
+    return _download_to_tempfile("POST", f"{API_URL}/{endpoint}", chunk_size, json={"ids": list(ids)})
+
+def download_export(endpoint, chunk_size=1024 * 1024):
+    """下載後端產生的匯出檔（串流寫入暫存檔）"""
+    return _download_to_tempfile("GET", f"{API_URL}/{endpoint}", chunk_size)
@@ -68,7 +68,7 @@ def create_inspection_UI():
 project_id = st.session_state.project_id
 
 if project_id is None:
-    project_list=utils.fetch_data("projects", project_id=None)
+    project_list=utils.fetch_all("projects")
     if project_list:
         project_names = {f"{p['name']} ({p['contract_number']})": p['id'] for p in project_list}
         selected_project = st.sidebar.selectbox("選擇工程專案", options=list(project_names.keys()))
@@ -77,7 +77,10 @@ if project_id is None:
 
 # 抽查表清單
 
-inspections = utils.fetch_data("inspections", project_id)
+# 分頁載入，按「載入更多」才取得下一頁
+pages_key = f"inspection_pages_{project_id}"
+pages = st.session_state.get(pages_key, 1)
+inspections, has_more = utils.fetch_pages("inspections", project_id, pages=pages)
 
 df= pd.DataFrame(inspections)
 
@@ -94,6 +97,10 @@ if inspections:
                         selection_mode="multi-row"
     )
 
+    if has_more and st.button("載入更多"):
+        st.session_state[pages_key] = pages + 1
+        st.rerun()
+
     # 檢查是否有選擇專案
     if event :
         inspec_data = event.selection.rows  # 選擇的行索引列表
@@ -103,26 +110,26 @@ if inspections:
         # st.write("選擇的抽查表資料：")
         # st.dataframe(selected_rows_df,hide_index=True)  # 顯示合併後的 DataFrame
 
-        if st.sidebar.button("刪除抽查表"):
+        selected_ids = [int(i) for i in selected_rows_df['id']]
 
-            for index, row in selected_rows_df.iterrows():
-                utils.delete_data("inspection-files",row['id'])
-                utils.delete_data("inspections",row['id'])
+        if st.sidebar.button("刪除抽查表") and selected_ids:
+            # 抽查記錄與電子檔以單一請求刪除
+            utils.delete_many("inspections", selected_ids)
 
             time.sleep(1)
             st.rerun()
 
-        if st.sidebar.button("下載抽查表"):
-            for index, row in selected_rows_df.iterrows():
-                response = utils.download_file("inspection-files", row['id'])
-                if response:
-                    # 提供下載連結
-                    st.download_button(
-                        "點擊下載",
-                        response,
-                        f"inspection_{row['id']}.pdf",
-                        "application/pdf"
-                    )
+        if st.sidebar.button("下載抽查表") and selected_ids:
+            # 選取的抽查表以單一請求打包成 ZIP 下載
+            archive = utils.download_archive("inspection-files/archive", selected_ids)
+            if archive:
+                # 提供下載連結
+                st.download_button(
+                    "點擊下載",
+                    archive,
+                    "inspections.zip",
+                    "application/zip"
+                )
 
 else:
     st.info("尚無抽查表")
@@ -3,17 +3,22 @@ import re
 from requests import get
 import streamlit as st
 import pandas as pd
-from utils import fetch_data, create_data
-import io
+from utils import fetch_all, fetch_pages, upload_file, download_export
+import json
 
-def get_project_id():
+EXPORT_MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+def select_project():
     st.header("合約項目管理")
 
     # 獲取專案列表
-    projects = fetch_data("projects")
+    projects = fetch_all("projects")
     if not projects:
         st.error("無法獲取專案列表")
-        return
+        st.stop()
 
     # 選擇專案
     project_names = {p['name']: p['id'] for p in projects}
@@ -23,28 +28,29 @@ def get_project_id():
     )
     
     project_id = project_names[selected_project]
-    return project_id
+    return project_id, selected_project
 
 # Excel 上傳和導入功能
 
-project_id = get_project_id()
+project_id, selected_project = select_project()
 
 st.subheader("從 Excel 導入合約項目")
 uploaded_file = st.file_uploader("上傳 Excel 檔案", type=['xlsx', 'xls'])
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
+        # 只讀取前幾列做預覽與欄位映射，完整解析交給後端
+        df = pd.read_excel(uploaded_file, nrows=5)
         
         # 顯示預覽
         st.write("### 資料預覽")
-        st.dataframe(df.head())
+        st.dataframe(df)
         
         # 欄位映射
         st.write("### 欄位映射")
         st.info("請選擇對應的欄位名稱")
         
-        columns = list(df.columns)
+        columns = [str(c) for c in df.columns]
         item_no = st.selectbox("契約項次", options=columns)
         name = st.selectbox("工項名稱", options=columns)
         unit = st.selectbox("單位", options=columns)
@@ -53,47 +59,37 @@ if uploaded_file:
         total_price = st.selectbox("複價", options=columns)
         
         if st.button("確認導入"):
-            # 開始處理數據
-            success_count = 0
-            error_count = 0
-            
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            column_mapping = {
+                "pcces_code": item_no,
+                "name": name,
+                "unit": unit,
+                "quantity": quantity,
+                "unit_price": unit_price,
+                "total_price": total_price
+            }
+            files = {"file": (uploaded_file.name, uploaded_file.getvalue(), "application/octet-stream")}
             
-            for index, row in df.iterrows():
-                progress = (index + 1) / len(df)
-                progress_bar.progress(progress)
-                
-                try:
-                    item_data = {
-                        "pcces_code": str(row[item_no]),
-                        "name": str(row[name]),
-                        "unit": str(row[unit]),
-                        "quantity": float(row[quantity]),
-                        "unit_price": float(row[unit_price]),
-                        "total_price": float(row[total_price]),
-                        "project_id": project_id
-                    }
-                    
-                    if create_data("contract-items", item_data):
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        
-                except Exception as e:
-                    error_count += 1
-                    st.error(f"處理第 {index + 1} 行時發生錯誤: {str(e)}")
-                
-                status_text.text(f"處理進度: {index + 1}/{len(df)}")
+            with st.spinner("正在匯入合約項目..."):
+                result = upload_file(
+                    f"projects/{project_id}/contract-items/import",
+                    files,
+                    {"column_mapping": json.dumps(column_mapping, ensure_ascii=False)}
+                )
             
-            st.success(f"導入完成！成功: {success_count} 筆，失敗: {error_count} 筆")
+            if result:
+                for error in result["errors"]:
+                    st.error(f"第 {error['row']} 列匯入失敗: {error['detail']}")
+                st.success(f"導入完成！成功: {result['inserted']} 筆，失敗: {result['failed']} 筆")
             
     except Exception as e:
         st.error(f"讀取 Excel 檔案時發生錯誤: {str(e)}")
 
 # 顯示現有合約項目
 st.subheader("現有合約項目")
-items = fetch_data("contract-items", project_id)
+# 分頁載入，按「載入更多」才取得下一頁
+pages_key = f"contract_item_pages_{project_id}"
+pages = st.session_state.get(pages_key, 1)
+items, has_more = fetch_pages("contract-items", project_id, pages=pages)
 
 if items:
     # 將數據轉換為 DataFrame 以表格形式顯示
@@ -111,18 +107,21 @@ if items:
         use_container_width=True
     )
     
-    # 匯出功能
-    if st.button("匯出為 Excel"):
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            items_df.to_excel(writer, index=False, sheet_name='合約項目')
-        
-        output.seek(0)
-        st.download_button(
-            label="下載 Excel 檔案",
-            data=output,
-            file_name=f"{selected_project}_合約項目清單.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+    if has_more and st.button("載入更多"):
+        st.session_state[pages_key] = pages + 1
+        st.rerun()
+    
+    # 匯出功能：由後端串流產生完整清單（不限於已載入的頁面）
+    export_format = st.radio("匯出格式", options=list(EXPORT_MIME_TYPES), horizontal=True)
+    if st.button("匯出合約項目"):
+        with st.spinner("正在匯出合約項目..."):
+            output = download_export(f"projects/{project_id}/contract-items/export.{export_format}")
+        if output:
+            st.download_button(
+                label="下載匯出檔案",
+                data=output,
+                file_name=f"{selected_project}_合約項目清單.{export_format}",
+                mime=EXPORT_MIME_TYPES[export_format]
+            )
 else:
     st.info("目前沒有合約項目")
\ No newline at end of file
@@ -63,7 +63,9 @@ if st.sidebar.button("刪除專案"):
 
 ## 顯示現有工程專案
 
-projects = utils.fetch_data("projects")
+# 分頁載入，按「載入更多」才取得下一頁
+pages = st.session_state.get("project_pages", 1)
+projects, has_more = utils.fetch_pages("projects", pages=pages)
 
 project_df = pd.DataFrame(projects)
 project_df = project_df[['id','name', 'contract_number', 'contractor', 'location', 'created_at', 'updated_at']]
@@ -76,6 +78,10 @@ event=st.dataframe(project_df,
                     selection_mode="multi-row"
 )
 
+if has_more and st.button("載入更多"):
+    st.session_state["project_pages"] = pages + 1
+    st.rerun()
+
 # 檢查是否有選擇專案
 if event :
     project = event.selection.rows  # 選擇的行索引列表
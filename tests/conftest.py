@@ -1,11 +1,17 @@
 import pytest
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 
+import main
+import migrations
 from database import Base
 from main import app
-from main import get_db
+from main import get_db, get_async_db
+from cache import response_cache
+from pagination import NEXT_CURSOR_HEADER
 
 # 使用 SQLite 的記憶體模式來建立測試資料庫
 # 2023-12-16: 修復了磁盤I/O錯誤，改用內存數據庫替代文件數據庫
@@ -13,30 +19,103 @@ from main import get_db
 # 1. 避免了文件系統權限問題
 # 2. 提高了測試速度
 # 3. 每次測試都從乾淨的狀態開始
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# 2026-10-17: 改為每個測試使用 tmp_path 下的獨立資料庫檔案
+# 1. 端點在 threadpool 中執行，記憶體資料庫在不同執行緒之間不共享
+# 2. 工作目錄切換到 tmp_path，上傳檔案不會寫入專案目錄
+# 3. 依賴覆寫只在 fixture 期間生效，不影響 test_api.py 自行設定的覆寫
+# 4. 每個測試開始前清除回應快取，不會讀到前一個測試資料庫的回應
 
-# 建立測試用的資料庫引擎
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# 覆寫資料庫相依性
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
-        yield db
-    finally:
-        db.close()
+# 測試用的資料庫引擎 fixture
+@pytest.fixture
+def db_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False}
+    )
+    # 在每個測試開始前建立資料表
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    # 在每個測試結束後清除資料表
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
 
-app.dependency_overrides[get_db] = override_get_db
+# 測試用的 asyncio 資料庫引擎 fixture
+# 與 db_engine 使用同一個資料庫檔案；NullPool 避免連線跨越不同的事件迴圈
+@pytest.fixture
+def async_db_engine(db_engine, tmp_path):
+    return create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool
+    )
 
 # 測試用的客戶端 fixture
 @pytest.fixture
-def client():
-    # 在每個測試開始前建立資料表
-    Base.metadata.create_all(bind=engine)
+def client(db_engine, async_db_engine, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    # 覆寫資料庫相依性
+    def override_get_db():
+        try:
+            db = TestingSessionLocal()
+            yield db
+        finally:
+            db.close()
+
+    TestingAsyncSessionLocal = async_sessionmaker(async_db_engine, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, override_get_db)
+    monkeypatch.setitem(app.dependency_overrides, get_async_db, override_get_async_db)
+    response_cache.clear()
+    response_cache.reset_stats()
+    use_test_engines(monkeypatch, db_engine, async_db_engine)
+
     with TestClient(app) as c:
         yield c
-    # 在每個測試結束後清除資料表
-    Base.metadata.drop_all(bind=engine)
+
+
+def use_test_engines(monkeypatch, engine, async_engine=None):
+    """讓 lifespan 使用測試資料庫，不在工作目錄建立或升級 ./data/sql_app.db
+
+    資料表已由測試自行以 create_all 建立，因此略過 prepare_database；啟動時的
+    待刪除檔案清理與關閉時釋放連線池都作用在測試用的引擎上。
+    """
+    monkeypatch.setattr(main, "engine", engine)
+    if async_engine is not None:
+        monkeypatch.setattr(main, "async_engine", async_engine)
+    monkeypatch.setattr(migrations, "prepare_database", lambda engine: "current")
+
+def create_project(client, contract_number="TEST-001", name="測試工程"):
+    """以 API 建立測試用的工程專案，回傳 id"""
+    response = client.post(
+        "/projects/",
+        json={
+            "name": name,
+            "contract_number": contract_number,
+            "contractor": "測試承包商",
+            "location": "測試地點"
+        }
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+# 測試用的工程專案 fixture
+@pytest.fixture
+def project_id(client):
+    return create_project(client)
+
+
+def fetch_pages(client, url, limit):
+    """沿著 X-Next-Cursor 取得所有頁面的原始回應"""
+    responses = []
+    params = {"limit": limit}
+    while True:
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        responses.append(response)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return responses
+        params = {"limit": limit, "cursor": cursor}
@@ -12,6 +12,7 @@ from datetime import datetime
 from database import Base
 from main import app, get_db
 from models import Project, ContractItem, QualityTest, Inspection, Photo
+from .conftest import use_test_engines
 
 # 測試用資料庫設定
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -28,8 +29,9 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 
 @pytest.fixture
-def client():
+def client(monkeypatch):
     Base.metadata.create_all(bind=engine)
+    use_test_engines(monkeypatch, engine)
     with TestClient(app) as c:
         yield c
     Base.metadata.drop_all(bind=engine)
@@ -0,0 +1,118 @@
+import pytest
+
+from cache import CACHE_HEADER, CachedResponse, ResponseCache
+from .conftest import create_project
+
+
+def create_item(client, project_id, code):
+    response = client.post(
+        "/contract-items/",
+        json={"project_id": project_id, "pcces_code": code, "name": f"工項 {code}", "unit": "式",
+              "quantity": 1.0, "unit_price": 1.0, "total_price": 1.0}
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_reads_are_cached_until_a_write(client):
+    """測試重複讀取由快取回應，寫入後重新查詢"""
+    project_id = create_project(client, "CACHE-001")
+    url = f"/projects/{project_id}/contract-items/"
+
+    first = client.get(url)
+    second = client.get(url)
+    assert first.headers[CACHE_HEADER] == "MISS"
+    assert second.headers[CACHE_HEADER] == "HIT"
+    assert second.content == first.content == b"[]"
+
+    create_item(client, project_id, "1")
+    third = client.get(url)
+    assert third.headers[CACHE_HEADER] == "MISS"
+    assert [item["pcces_code"] for item in third.json()] == ["1"]
+
+    item_id = third.json()[0]["id"]
+    client.put(f"/contract-items/{item_id}", json={"name": "已修改"})
+    assert client.get(url).json()[0]["name"] == "已修改"
+
+    client.delete(f"/contract-items/{item_id}")
+    assert client.get(url).json() == []
+
+
+def test_invalidation_is_scoped_to_the_project(client):
+    """測試寫入只讓該專案與跨專案列表的快取失效"""
+    first = create_project(client, "CACHE-001")
+    second = create_project(client, "CACHE-002")
+    client.get(f"/projects/{first}/contract-items/")
+    client.get("/contract-items/")
+
+    create_item(client, second, "2")
+
+    assert client.get(f"/projects/{first}/contract-items/").headers[CACHE_HEADER] == "HIT"
+    all_items = client.get("/contract-items/")
+    assert all_items.headers[CACHE_HEADER] == "MISS"
+    assert len(all_items.json()) == 1
+
+
+def test_cursor_pages_and_errors(client):
+    """測試分頁標頭隨快取回應送出，錯誤回應不快取"""
+    project_id = create_project(client, "CACHE-001")
+    for code in "123":
+        create_item(client, project_id, code)
+    url = f"/projects/{project_id}/contract-items/"
+
+    first = client.get(url, params={"limit": 2})
+    cached = client.get(url, params={"limit": 2})
+    assert cached.headers[CACHE_HEADER] == "HIT"
+    assert cached.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
+    assert client.get(url, params={"limit": 3}).headers[CACHE_HEADER] == "MISS"
+
+    assert client.get("/projects/999/contract-items/").status_code == 404
+    missing = client.get("/projects/999/contract-items/")
+    assert missing.status_code == 404
+    assert missing.headers[CACHE_HEADER] == "MISS"
+
+
+def test_cache_stats_endpoint(client):
+    """測試命中與未命中的統計"""
+    project_id = create_project(client, "CACHE-001")
+    for _ in range(3):
+        client.get(f"/projects/{project_id}")
+
+    stats = client.get("/admin/cache").json()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    assert stats["entries"] == 1
+
+    assert client.delete("/admin/cache").json()["entries"] == 0
+    assert client.get(f"/projects/{project_id}").headers[CACHE_HEADER] == "MISS"
+
+
+def test_lru_eviction_by_size():
+    """測試超過大小上限時淘汰最久未使用的回應"""
+    cache = ResponseCache(max_bytes=800)
+    version = cache.version(1)
+    for key in "abc":
+        cache.put(key, CachedResponse(version, 200, [], b"x" * 100))
+    assert cache.get("a", 1) is not None  # a 變成最近使用
+
+    for key in "defghi":
+        cache.put(key, CachedResponse(version, 200, [], b"x" * 100))
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.stats()["bytes"] <= 800
+    assert cache.stats()["evictions"] == 1
+
+
+def test_response_computed_before_a_write_is_not_served():
+    """測試查詢期間發生寫入時，存入的回應已過期"""
+    cache = ResponseCache(max_bytes=1024)
+    version = cache.version(1)
+    cache.invalidate(1)
+    cache.put("a", CachedResponse(version, 200, [], b"[]"))
+    assert cache.get("a", 1) is None
+
+    cache.put("b", CachedResponse(cache.version(2), 200, [], b"[]"))
+    cache.invalidate(1)
+    assert cache.get("b", 2) is not None
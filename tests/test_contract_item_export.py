@@ -0,0 +1,89 @@
+import csv
+import io
+from urllib.parse import quote
+
+import pytest
+from openpyxl import load_workbook
+
+import exporter
+from .conftest import create_project
+
+HEADERS = ["契約項次", "工項名稱", "單位", "數量", "單價", "複價"]
+
+
+@pytest.fixture
+def project_id(client):
+    project_id = create_project(client, "EXPORT-001", name="匯出測試工程")
+
+    rows = [
+        {"pcces_code": f"1-{i}", "name": f"工項 {i}", "unit": "m3",
+         "quantity": 0.5 * i, "unit_price": 1234.5, "total_price": 617.25 * i}
+        for i in range(1, 2501)
+    ]
+    rows[0]["name"] = '混凝土 <210kgf/cm2> & "鋼筋"'
+    response = client.post(f"/projects/{project_id}/contract-items/bulk", json=rows)
+    assert response.json()["inserted"] == 2500
+    return project_id
+
+
+def test_export_xlsx(client, project_id):
+    """測試串流匯出的 XLSX 可由 openpyxl 讀取，價格為數值並帶千分位格式"""
+    with client.stream("GET", f"/projects/{project_id}/contract-items/export.xlsx") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == exporter.EXPORT_FORMATS["xlsx"][0]
+        assert response.headers["content-disposition"] == (
+            "attachment; filename*=utf-8''" + quote("匯出測試工程_合約項目清單.xlsx")
+        )
+        content = b"".join(response.iter_bytes())
+
+    workbook = load_workbook(io.BytesIO(content))
+    sheet = workbook["合約項目"]
+    rows = list(sheet.iter_rows(values_only=True))
+    assert list(rows[0]) == HEADERS
+    assert len(rows) == 2501
+    assert rows[1] == ("1-1", '混凝土 <210kgf/cm2> & "鋼筋"', "m3", 0.5, 1234.5, 617.25)
+    assert rows[-1] == ("1-2500", "工項 2500", "m3", 1250.0, 1234.5, 617.25 * 2500)
+    assert sheet["E2"].number_format == "#,##0.00"
+    assert sheet["D2"].number_format == "General"
+
+
+def test_export_csv(client, project_id):
+    """測試 CSV 匯出（UTF-8 BOM）"""
+    response = client.get(f"/projects/{project_id}/contract-items/export.csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+    assert response.content.startswith("\ufeff".encode("utf-8"))
+
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == HEADERS
+    assert len(rows) == 2501
+    assert rows[1] == ["1-1", '混凝土 <210kgf/cm2> & "鋼筋"', "m3", "0.5", "1234.5", "617.25"]
+
+
+def test_export_errors(client, project_id):
+    """測試不存在的工程專案回傳 404，不支援的格式回傳 422"""
+    assert client.get("/projects/999/contract-items/export.xlsx").status_code == 404
+    assert client.get(f"/projects/{project_id}/contract-items/export.pdf").status_code == 422
+
+
+@pytest.mark.parametrize("export_format", ["csv", "xlsx"])
+def test_export_streams_batches_as_they_are_read(export_format):
+    """測試第一個位元組在讀取任何資料之前送出，之後每讀取一批就送出一段"""
+    consumed = []
+
+    def batches():
+        for i in range(3):
+            consumed.append(i)
+            # deflate 會累積少量資料後才輸出，每批使用接近實際的列數
+            yield [(f"{i}-{j}", f"工項 {j}", "式", j * 0.1, 2.0, j * 0.2) for j in range(exporter.EXPORT_BATCH_SIZE)]
+
+    _, render = exporter.EXPORT_FORMATS[export_format]
+    chunks = render(batches())
+    assert next(chunks)
+    assert consumed == []
+
+    sent_before = {}
+    for chunk in chunks:
+        sent_before.setdefault(len(consumed), chunk)
+    # 每一批讀取後、下一批讀取前都已有內容送出
+    assert {1, 2} <= set(sent_before)
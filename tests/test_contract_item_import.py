@@ -0,0 +1,171 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "契約設定模板.xls"
+
+
+def make_item(code, **overrides):
+    item = {
+        "pcces_code": code,
+        "name": f"工項 {code}",
+        "unit": "式",
+        "quantity": 1.0,
+        "unit_price": 1000.0,
+        "total_price": 1000.0
+    }
+    item.update(overrides)
+    return item
+
+
+def test_bulk_create_contract_items(client, project_id):
+    """測試以 JSON 陣列批量匯入契約項目"""
+    rows = [make_item(f"1-{i}") for i in range(50)]
+
+    response = client.post(f"/projects/{project_id}/contract-items/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 50
+    assert data["inserted"] == 50
+    assert data["failed"] == 0
+
+    items = client.get(f"/projects/{project_id}/contract-items/").json()
+    assert len(items) == 50
+    assert all(item["project_id"] == project_id for item in items)
+
+
+def test_bulk_create_contract_items_reports_row_errors(client, project_id):
+    """測試批量匯入時逐筆回報錯誤，其餘資料仍寫入"""
+    rows = [
+        make_item("1-1"),
+        make_item("1-2", quantity="不是數字"),
+        make_item("1-3", project_id=project_id + 1),
+        make_item("1-4"),
+    ]
+
+    response = client.post(f"/projects/{project_id}/contract-items/bulk", json=rows)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 2
+    assert data["failed"] == 2
+    # 列號從 1 開始，與工作簿匯入的 Excel 列號一致
+    assert [error["row"] for error in data["errors"]] == [2, 3]
+    assert "quantity" in data["errors"][0]["detail"]
+
+
+def test_bulk_create_contract_items_rejects_non_finite_numbers(client, project_id):
+    """測試 NaN 與無限大逐筆回報錯誤，不寫入資料庫，列表仍可正常讀取"""
+    lines = [
+        json.dumps(make_item("3-1")),
+        json.dumps(make_item("3-2", quantity="NaN")),
+        json.dumps(make_item("3-3", unit_price="inf")),
+        '{"pcces_code": "3-4", "name": "x", "unit": "m", "quantity": 1, "unit_price": 1, "total_price": NaN}',
+        '{"pcces_code": "3-5", "name": "x", "unit": "m", "quantity": -Infinity, "unit_price": 1, "total_price": 1}',
+    ]
+
+    response = client.post(
+        f"/projects/{project_id}/contract-items/bulk",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 1
+    assert [error["row"] for error in data["errors"]] == [2, 3, 4, 5]
+    assert all("finite" in error["detail"] for error in data["errors"])
+
+    response = client.get(f"/projects/{project_id}/contract-items/")
+    assert response.status_code == 200
+    assert [item["pcces_code"] for item in response.json()] == ["3-1"]
+
+
+def test_bulk_create_contract_items_ndjson(client, project_id):
+    """測試以 NDJSON 批量匯入契約項目"""
+    lines = [json.dumps(make_item(f"2-{i}")) for i in range(3)] + ["{broken"]
+
+    response = client.post(
+        f"/projects/{project_id}/contract-items/bulk",
+        content="\n".join(lines).encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["inserted"] == 3
+    assert data["failed"] == 1
+    assert data["errors"][0]["row"] == 4
+
+
+@pytest.mark.parametrize("content_type", ["application/json", "application/x-ndjson"])
+def test_bulk_create_contract_items_rejects_invalid_utf8(client, project_id, content_type):
+    """測試內容不是有效的 UTF-8 時回傳 400"""
+    response = client.post(
+        f"/projects/{project_id}/contract-items/bulk",
+        content='[{"name": "鋼筋"}]'.encode("big5"),
+        headers={"Content-Type": content_type}
+    )
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+
+
+def test_bulk_create_contract_items_project_not_found(client):
+    """測試批量匯入到不存在的專案"""
+    response = client.post("/projects/999/contract-items/bulk", json=[make_item("1-1")])
+    assert response.status_code == 404
+
+
+def test_import_contract_items_from_template(client, project_id):
+    """測試直接上傳契約設定模板匯入契約項目"""
+    with open(TEMPLATE_PATH, "rb") as f:
+        response = client.post(
+            f"/projects/{project_id}/contract-items/import",
+            files={"file": ("契約設定模板.xls", f, "application/vnd.ms-excel")}
+        )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["failed"] == 0
+    assert data["inserted"] == data["total"] > 0
+
+    items = client.get(f"/projects/{project_id}/contract-items/").json()
+    codes = {item["pcces_code"]: item for item in items}
+    assert codes["1-1-3"]["name"] == "施工告示牌"
+    assert codes["1-1-3"]["total_price"] == 5000.0
+
+
+def test_import_contract_items_xlsx_with_mapping(client, project_id):
+    """測試以自訂欄位映射匯入 xlsx，並以 Excel 列號回報錯誤"""
+    openpyxl = pytest.importorskip("openpyxl")
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["編號", "名稱", "單位", "數量", "單價", "金額"])
+    sheet.append(["A-1", "鋼筋", "T", 2, 30000, 60000])
+    sheet.append([None, None, None, None, None, None])
+    sheet.append(["A-2", "混凝土", "M3", "許多", 2500, 25000])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    mapping = {"pcces_code": "編號", "name": "名稱", "total_price": "金額"}
+    response = client.post(
+        f"/projects/{project_id}/contract-items/import",
+        files={"file": ("items.xlsx", buffer.getvalue(), "application/octet-stream")},
+        data={"column_mapping": json.dumps(mapping)}
+    )
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["total"] == 2
+    assert data["inserted"] == 1
+    assert data["errors"][0]["row"] == 4
+
+
+def test_import_contract_items_missing_column(client, project_id):
+    """測試欄位映射找不到表頭時回傳 400"""
+    with open(TEMPLATE_PATH, "rb") as f:
+        response = client.post(
+            f"/projects/{project_id}/contract-items/import",
+            files={"file": ("契約設定模板.xls", f, "application/vnd.ms-excel")},
+            data={"column_mapping": json.dumps({"name": "不存在的欄位"})}
+        )
+    assert response.status_code == 400
+    assert "不存在的欄位" in response.json()["detail"]
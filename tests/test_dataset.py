@@ -0,0 +1,111 @@
+import os
+
+import pytest
+from PIL import Image
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+import dataset
+from database import Base
+from models import ContractItem, Inspection, Photo, Project, QualityTest
+
+COUNTS = {"projects": 3, "items": 120, "tests": 20, "inspections": 12, "photos": 30}
+TABLES = [Project, ContractItem, QualityTest, Inspection, Photo]
+
+
+@pytest.fixture
+def make_db(tmp_path, monkeypatch):
+    """在 tmp_path 下建立獨立的資料庫，上傳目錄為 tmp_path/uploads"""
+    monkeypatch.chdir(tmp_path)
+    engines = []
+
+    def make(name):
+        engine = create_engine(f"sqlite:///{tmp_path / name}")
+        Base.metadata.create_all(engine)
+        engines.append(engine)
+        return Session(engine)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+def dump(db):
+    return {
+        model.__tablename__: [
+            tuple(getattr(row, column.name) for column in model.__table__.c)
+            for row in db.scalars(select(model).order_by(model.id))
+        ]
+        for model in TABLES
+    }
+
+
+def test_generates_linked_rows_and_files(make_db):
+    """測試各資料表的筆數、外鍵都指向同一工程專案，檔案存在且可解碼"""
+    with make_db("a.db") as db:
+        result = dataset.generate(db, **COUNTS, seed=5, workers=4, batch_size=7)
+        assert {table: result[table] for table in ["projects", "contract_items", "tests", "inspections", "photos"]} == {
+            "projects": 3, "contract_items": 120, "tests": 20, "inspections": 12, "photos": 30,
+        }
+        assert result["files"] == 42
+
+        items = {item.id: item for item in db.scalars(select(ContractItem))}
+        assert all(len(item.pcces_code) == 10 and item.pcces_code[:5].isdigit() for item in items.values())
+        assert all(item.total_price == round(item.quantity * item.unit_price, 0) for item in items.values())
+        for test in db.scalars(select(QualityTest)):
+            assert items[test.contract_item_id].project_id == test.project_id
+        inspections = {inspection.id: inspection for inspection in db.scalars(select(Inspection))}
+        tests = {test.id: test for test in db.scalars(select(QualityTest))}
+        for photo in db.scalars(select(Photo)):
+            if photo.inspection_id:
+                assert inspections[photo.inspection_id].project_id == photo.project_id
+            if photo.quality_test_id:
+                assert tests[photo.quality_test_id].project_id == photo.project_id
+
+        pdfs = [inspection.file_path for inspection in inspections.values()]
+        photos = db.scalars(select(Photo.file_path)).all()
+        assert len(set(pdfs)) == 12 and len(set(photos)) == 30
+        assert all(path.startswith(os.path.join("uploads", "blobs")) and os.path.isfile(path) for path in pdfs + photos)
+        assert all(open(path, "rb").read().startswith(b"%PDF-1.4") for path in pdfs)
+        with Image.open(photos[0]) as image:
+            image.load()
+            assert image.size == (320, 240)
+
+
+def test_same_seed_generates_identical_data(make_db):
+    """測試相同的 seed 產生相同的資料列與檔案，不同的 seed 則不同"""
+    with make_db("a.db") as first, make_db("b.db") as second, make_db("c.db") as other:
+        dataset.generate(first, **COUNTS, seed=11, workers=1, batch_size=1000)
+        dataset.generate(second, **COUNTS, seed=11, workers=8, batch_size=5)
+        dataset.generate(other, **COUNTS, seed=12, workers=4)
+        assert dump(first) == dump(second)
+        assert dump(first)["contract_items"] != dump(other)["contract_items"]
+
+
+def test_appends_after_existing_rows(make_db):
+    """測試資料庫已有資料時 id 由目前最大值接續，外鍵對應新產生的資料列"""
+    with make_db("a.db") as db:
+        dataset.generate(db, **COUNTS, seed=1)
+        dataset.generate(db, **COUNTS, seed=2, file_kib=3)
+
+        assert db.scalar(select(func.count(Project.id))) == 6
+        assert db.scalar(select(func.max(ContractItem.id))) == 240
+        new_project_ids = {4, 5, 6}
+        for test in db.scalars(select(QualityTest).where(QualityTest.id > 20)):
+            assert test.project_id in new_project_ids and test.contract_item_id > 120
+        largest = max(os.path.getsize(path) for path in db.scalars(select(Photo.file_path)))
+        assert largest > 3 * 1024
+
+
+def test_generated_data_is_served_by_the_api(client, db_engine):
+    """測試產生的資料可由 API 讀取，摘要與縮圖正常"""
+    with Session(db_engine) as db:
+        dataset.generate(db, **COUNTS, seed=3)
+        photo_id = db.scalar(select(func.min(Photo.id)))
+        inspection_id = db.scalar(select(func.min(Inspection.id)))
+
+    summary = client.get("/projects/1/summary").json()
+    assert summary["item_count"] == 40
+    assert client.get(f"/photos/{photo_id}/thumbnail").status_code == 200
+    response = client.get(f"/inspection-files/{inspection_id}")
+    assert response.status_code == 200 and response.content.startswith(b"%PDF")
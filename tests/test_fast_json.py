@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import fast_json
+from cache import response_cache
+from models import Project, ContractItem, QualityTest, Inspection, Photo
+from pagination import NEXT_CURSOR_HEADER
+from .conftest import fetch_pages
+
+
+@pytest.fixture
+def populated(db_engine):
+    """直接寫入包含各種欄位值的資料（NULL、中文、極大數值、字串儲存的 is_pass）"""
+    with Session(db_engine) as db:
+        db.execute(insert(Project), [
+            {"id": 1, "name": "快速輸出測試工程", "contract_number": "FAST-001",
+             "contractor": "測試承包商", "location": "台中市 北屯區"},
+        ])
+        db.execute(insert(ContractItem), [
+            {"id": i, "project_id": 1, "pcces_code": f"0{i}", "name": f"工項 \"{i}\"", "unit": "m3",
+             "quantity": 0.1 * i, "unit_price": 1e16 if i == 3 else 123.45, "total_price": 12.0 * i,
+             "created_at": datetime(2026, 1, 1, 8, 0, 0, 1000 * i)}
+            for i in range(1, 8)
+        ])
+        db.execute(insert(QualityTest), [
+            {"id": i, "project_id": 1, "contract_item_id": 1, "name": f"試驗 {i}",
+             "test_item": "坍度", "test_sets": i, "test_result": "合格",
+             "updated_at": datetime(2026, 2, 1) if i % 2 else None}
+            for i in range(1, 6)
+        ])
+        db.execute(insert(Inspection), [
+            {"id": i, "project_id": 1, "name": f"抽查 {i}", "inspection_time": datetime(2026, 3, i % 3 + 1),
+             "location": "A區", "file_path": None, "is_pass": ["1", "0", "true", "False"][i % 4]}
+            for i in range(1, 6)
+        ])
+        db.execute(insert(Photo), [
+            {"id": i, "project_id": 1, "inspection_id": 1 if i % 2 else None, "filename": f"照片{i}.jpg",
+             "file_path": f"uploads/{i}.jpg", "description": None if i % 3 else "說明"}
+            for i in range(1, 7)
+        ])
+        db.commit()
+
+
+LIST_URLS = [
+    "/projects/",
+    "/contract-items/",
+    "/projects/1/contract-items/",
+    "/projects/1/tests/",
+    "/contract-items/1/tests/",
+    "/projects/1/inspections/",
+    "/projects/1/photos/",
+    "/inspections/1/photos",
+]
+
+
+@pytest.mark.parametrize("url", LIST_URLS)
+def test_fast_path_output_is_identical(client, populated, monkeypatch, url):
+    """測試快速輸出與原本 response_model 路徑的回應內容與分頁標頭完全相同"""
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", False)
+    expected = fetch_pages(client, url, limit=2)
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    response_cache.clear()
+    actual = fetch_pages(client, url, limit=2)
+
+    assert [r.content for r in actual] == [r.content for r in expected]
+    assert [r.headers.get(NEXT_CURSOR_HEADER) for r in actual] == [
+        r.headers.get(NEXT_CURSOR_HEADER) for r in expected
+    ]
+    assert all(r.headers["content-type"] == "application/json" for r in actual)
+
+
+def test_fast_path_converts_string_booleans(client, populated, monkeypatch):
+    """測試以字串儲存的 is_pass 在快速輸出中仍轉為布林值"""
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    response = client.get("/projects/1/inspections/", params={"limit": 10})
+    assert {item["id"]: item["is_pass"] for item in response.json()} == {
+        1: False, 2: True, 3: False, 4: True, 5: False,
+    }
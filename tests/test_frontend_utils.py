@@ -0,0 +1,155 @@
+import io
+import json
+import sys
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+pytest.importorskip("streamlit")
+requests = pytest.importorskip("requests")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "frontend"))
+import utils  # noqa: E402
+
+
+class FakeBackend(requests.adapters.BaseAdapter):
+    """模擬後端：記錄每一次往返，回傳固定的資料與分頁游標"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def send(self, request, **kwargs):
+        self.calls.append((request.method, request.path_url))
+        url = urlparse(request.url)
+        query = parse_qs(url.query)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        body = []
+        if request.method == "GET" and url.path.endswith("/inspections"):
+            # 第一頁附上游標，第二頁為最後一頁
+            if "cursor" not in query:
+                response.headers["X-Next-Cursor"] = "page-2"
+                body = [{"id": 1}]
+            else:
+                body = [{"id": 2}]
+        elif request.method == "GET" and url.path == "/projects":
+            body = [{"id": 1, "name": "工程"}]
+        elif url.path == "/inspection-files/archive":
+            # 以串流讀取的回應
+            response.raw = io.BytesIO(b"PK" + json.dumps(json.loads(request.body)["ids"]).encode())
+            return response
+        elif request.method == "DELETE" and "ids" in query:
+            body = {"deleted": len(query["ids"]), "not_found": []}
+        elif request.method != "GET":
+            body = {"id": 3}
+        response._content = json.dumps(body).encode("utf-8")
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    fake = FakeBackend()
+    monkeypatch.setattr(utils, "API_URL", "http://backend")
+    monkeypatch.setattr(utils, "session", requests.Session())
+    utils.session.mount("http://backend", fake)
+    utils.invalidate_cache()
+    yield fake
+    utils.invalidate_cache()
+
+
+def rerun_inspection_page():
+    """抽查表頁面每次重新執行時的讀取：工程專案列表與兩頁抽查表"""
+    utils.fetch_data("projects")
+    return utils.fetch_pages("inspections", project_id=1, pages=2)
+
+
+def test_page_reruns_without_cache(backend, monkeypatch):
+    """測試不快取時每次重新執行都要三次往返"""
+    monkeypatch.setattr(utils, "API_CACHE_TTL", 0)
+    for _ in range(5):
+        rerun_inspection_page()
+    assert len(backend.calls) == 15
+
+
+def test_page_reruns_are_served_from_cache(backend):
+    """測試快取後只有第一次重新執行需要往返，寫入後只重新取得受影響的列表"""
+    for _ in range(5):
+        items, has_more = rerun_inspection_page()
+    assert items == [{"id": 1}, {"id": 2}] and has_more is False
+    # 五次重新執行只需三次往返，省下 12 次
+    assert len(backend.calls) == 3
+
+    utils.create_data("inspections", {"name": "新抽查表"})
+    backend.calls.clear()
+    rerun_inspection_page()
+    # 工程專案列表仍由快取回傳，只重新取得兩頁抽查表
+    assert backend.calls == [
+        ("GET", "/projects/1/inspections?limit=100"),
+        ("GET", "/projects/1/inspections?limit=100&cursor=page-2"),
+    ]
+
+
+def test_project_writes_clear_everything(backend):
+    """測試修改工程專案後清除全部快取"""
+    rerun_inspection_page()
+    utils.update_data("projects", 1, {"name": "改名"})
+    backend.calls.clear()
+    rerun_inspection_page()
+    assert len(backend.calls) == 3
+
+
+def test_fetch_all_follows_every_cursor(backend):
+    """測試選單用的 fetch_all 依游標讀完全部分頁，不只回傳第一頁"""
+    assert utils.fetch_all("inspections", project_id=1) == [{"id": 1}, {"id": 2}]
+    assert backend.calls == [
+        ("GET", "/projects/1/inspections?limit=1000"),
+        ("GET", "/projects/1/inspections?limit=1000&cursor=page-2"),
+    ]
+
+
+def test_cache_expires_after_ttl(backend, monkeypatch):
+    """測試超過 TTL 後重新取得"""
+    clock = [1000.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: clock[0])
+    utils.fetch_data("projects")
+    utils.fetch_data("projects")
+    clock[0] += utils.API_CACHE_TTL + 1
+    utils.fetch_data("projects")
+    assert len(backend.calls) == 2
+
+
+def test_cache_prunes_expired_entries_and_caps_size(backend, monkeypatch):
+    """測試寫入快取時移除過期的結果，且數量不超過 API_CACHE_MAX_ENTRIES"""
+    clock = [1000.0]
+    monkeypatch.setattr(utils.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(utils, "API_CACHE_MAX_ENTRIES", 3)
+    for project_id in range(1, 4):
+        utils.fetch_data("inspections", project_id)
+    clock[0] += utils.API_CACHE_TTL + 1
+    utils.fetch_data("projects")
+    assert [key[1] for key in utils._cache] == [None]
+
+    for project_id in range(1, 6):
+        utils.fetch_data("inspections", project_id)
+    # 最早寫入（最早到期）的結果先被移除
+    assert [key[1] for key in utils._cache] == [3, 4, 5]
+    utils.fetch_data("inspections", 5)
+    calls = len(backend.calls)
+    utils.fetch_data("inspections", 1)
+    assert len(backend.calls) == calls + 1
+
+
+def test_selecting_100_rows_costs_two_requests(backend):
+    """測試選取 100 筆抽查表時，刪除與下載各只需一個請求"""
+    ids = list(range(1, 101))
+    archive = utils.download_archive("inspection-files/archive", ids)
+    assert archive.read() == b"PK" + json.dumps(ids).encode()
+    assert utils.delete_many("inspections", ids) == 100
+    assert [method for method, _ in backend.calls] == ["POST", "DELETE"]
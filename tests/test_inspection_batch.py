@@ -0,0 +1,104 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import storage
+from models import FilePurge, Inspection, Photo
+
+
+@pytest.fixture
+def inspections(client, project_id, monkeypatch):
+    """建立四筆抽查記錄，前三筆有電子檔（第三筆與第一筆內容相同）"""
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    created = []
+    for i, content in enumerate([b"%PDF-1.4 first" * 1000, b"%PDF-1.4 second", b"%PDF-1.4 first" * 1000, None]):
+        response = client.post(
+            "/inspections/",
+            json={
+                "name": f"抽查 {i}",
+                "inspection_time": "2026-01-01T00:00:00",
+                "location": "A區",
+                "is_pass": True,
+                "project_id": project_id
+            }
+        )
+        inspection = response.json()
+        if content is not None:
+            upload = client.post(
+                "/inspection-files/",
+                files={"file": ("inspection.pdf", content, "application/pdf")},
+                data={"project_id": project_id, "inspection_id": inspection["id"]}
+            )
+            assert upload.status_code == 200, upload.text
+            inspection["file_path"] = upload.json()["file_path"]
+            inspection["content"] = content
+        created.append(inspection)
+    return created
+
+
+def test_batch_delete_inspections(client, db_engine, project_id, inspections):
+    """測試批次刪除抽查記錄、解除照片關聯並清除沒有其他引用的檔案"""
+    first, second, third, fourth = inspections
+    photo = client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", b"photo", "image/jpeg")},
+        data={"project_id": project_id, "inspection_id": first["id"]}
+    ).json()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+    response = client.delete("/inspections", params={"ids": [first["id"], second["id"], fourth["id"], 999]})
+    event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"deleted": 3, "not_found": [999]}
+    # 抽查記錄以單一 DELETE 刪除
+    assert sum(s.startswith("DELETE FROM inspections") for s in statements) == 1
+
+    with Session(db_engine) as db:
+        remaining = db.scalars(select(Inspection.id)).all()
+        assert remaining == [third["id"]]
+        assert db.get(Photo, photo["id"]).inspection_id is None
+        assert db.scalar(select(func.count()).select_from(FilePurge)) == 0
+
+    # 第二份檔案已刪除，第一份仍被第三筆抽查記錄引用
+    assert not Path(second["file_path"]).exists()
+    assert Path(first["file_path"]).exists()
+    assert client.get(f"/projects/{project_id}/inspections/").json()[0]["id"] == third["id"]
+
+
+def test_batch_delete_unknown_ids(client, inspections):
+    """測試全部找不到時回傳 404，未指定 ids 時回傳 422"""
+    assert client.delete("/inspections", params={"ids": [999]}).status_code == 404
+    assert client.delete("/inspections").status_code == 422
+
+
+def test_archive_streams_selected_files(client, inspections):
+    """測試打包下載選取的抽查表，沒有電子檔的記錄列在標頭"""
+    ids = [inspection["id"] for inspection in inspections]
+    with client.stream("POST", "/inspection-files/archive", json={"ids": ids + [999]}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        assert response.headers["X-Skipped-Ids"] == f"{inspections[3]['id']},999"
+        chunks = list(response.iter_raw())
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.testzip() is None
+    expected = {
+        f"inspection_{inspection['id']}.pdf": inspection["content"] for inspection in inspections[:3]
+    }
+    assert {name: archive.read(name) for name in archive.namelist()} == expected
+
+
+def test_archive_without_files(client, inspections):
+    """測試選取的記錄都沒有電子檔時回傳 404"""
+    response = client.post("/inspection-files/archive", json={"ids": [inspections[3]["id"]]})
+    assert response.status_code == 404
+    assert client.post("/inspection-files/archive", json={"ids": []}).status_code == 422
@@ -0,0 +1,147 @@
+import io
+import re
+import time
+
+from PIL import Image
+
+import metrics
+import thumbnails
+from database import create_db_engine
+from .conftest import create_project
+
+SAMPLE_RE = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def sample(text, name, **labels):
+    """取出指定名稱與標籤的數值，沒有這個時間序列時回傳 0"""
+    for line in text.splitlines():
+        match = SAMPLE_RE.match(line)
+        if match and match.group(1) == name and dict(LABEL_RE.findall(match.group(2) or "")) == labels:
+            return float(match.group(3))
+    return 0.0
+
+
+def test_requests_are_labelled_by_route_template(client):
+    """測試請求依路徑樣板記錄延遲與 SQL 數，快取命中不執行 SQL"""
+    route = "/projects/{project_id}/contract-items/"
+    labels = {"method": "GET", "route": route}
+    before = client.get("/metrics").text
+    project_id = create_project(client, "METRICS-001")
+
+    assert client.get(f"/projects/{project_id}/contract-items/").headers["X-Cache"] == "MISS"
+    assert client.get(f"/projects/{project_id}/contract-items/").headers["X-Cache"] == "HIT"
+    client.get("/no-such-path/1")
+    client.get("/no-such-path/2")
+
+    after = client.get("/metrics")
+    assert after.headers["content-type"] == metrics.CONTENT_TYPE
+    text = after.text
+    delta = lambda name, **labels: sample(text, name, **labels) - sample(before, name, **labels)  # noqa: E731
+    assert delta("http_request_duration_seconds_count", status="200", **labels) == 2
+    assert delta("http_request_duration_seconds_bucket", status="200", le="+Inf", **labels) == 2
+    assert delta("db_queries_per_request_count", **labels) == 2
+    # 第一次查詢專案是否存在與契約項目，第二次由回應快取送出
+    assert delta("db_queries_per_request_sum", **labels) == 2
+    assert delta("db_queries_per_request_bucket", le="0", **labels) == 1
+    assert delta(
+        "http_request_duration_seconds_count", method="GET", route=metrics.UNMATCHED_ROUTE, status="404"
+    ) == 2
+    assert "/no-such-path" not in text
+    assert sample(text, "http_requests_in_progress", method="GET") >= 1
+    assert sample(text, "cache_hits_total", cache="response") == 1
+    assert sample(text, "cache_hit_ratio", cache="response") == 0.5
+
+
+def test_file_endpoints_count_uploaded_and_downloaded_bytes(client):
+    """測試上傳與下載端點累計請求與回應的內容位元組數"""
+    project_id = create_project(client, "METRICS-002")
+    image = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(image, "JPEG")
+    content = image.getvalue()
+    before = client.get("/metrics").text
+
+    photo = client.post(
+        "/photos/upload/",
+        files={"file": ("photo.jpg", content, "image/jpeg")},
+        data={"project_id": str(project_id)},
+    ).json()
+    assert client.get(f"/photos/{photo['id']}/view").content == content
+
+    text = client.get("/metrics").text
+    uploaded = sample(text, "http_request_body_bytes_total", method="POST", route="/photos/upload/") - sample(
+        before, "http_request_body_bytes_total", method="POST", route="/photos/upload/"
+    )
+    downloaded = sample(text, "http_response_body_bytes_total", method="GET", route="/photos/{photo_id}/view") - sample(
+        before, "http_response_body_bytes_total", method="GET", route="/photos/{photo_id}/view"
+    )
+    assert uploaded > len(content)
+    assert downloaded == len(content)
+    assert sample(text, "cache_misses_total", cache="thumbnails") >= 1
+
+
+def test_background_tasks_are_not_counted_as_request_time(client, db_engine, monkeypatch):
+    """測試回應送出後執行的背景工作不計入請求的處理時間與 SQL 數"""
+    project_id = create_project(client, "METRICS-003")
+
+    def slow_thumbnails(paths):
+        with db_engine.connect() as connection:
+            for _ in range(5):
+                connection.exec_driver_sql("SELECT 1")
+        time.sleep(0.5)
+
+    monkeypatch.setattr(thumbnails, "generate_thumbnails", slow_thumbnails)
+    labels = {"method": "POST", "route": "/photos/upload/"}
+    before = client.get("/metrics").text
+    response = client.post(
+        "/photos/upload/",
+        files={"file": ("photo.jpg", b"\xff\xd8 fake jpeg", "image/jpeg")},
+        data={"project_id": str(project_id)},
+    )
+    assert response.status_code == 200
+
+    text = client.get("/metrics").text
+    delta = lambda name, **extra: sample(text, name, **labels, **extra) - sample(before, name, **labels, **extra)  # noqa: E731
+    assert delta("http_request_duration_seconds_count", status="200") == 1
+    assert delta("http_request_duration_seconds_sum", status="200") < 0.5
+    assert delta("db_queries_per_request_sum") < 5
+    assert sample(text, "http_requests_in_progress", method="POST") == 0
+
+
+def test_timed_pool_records_checkouts(tmp_path):
+    """測試檔案型 SQLite 的連線池記錄取得連線的次數與等待時間"""
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    try:
+        assert isinstance(engine.pool, metrics.TimedQueuePool)
+        before = metrics.render()
+        with engine.connect():
+            during = metrics.render()
+        with engine.connect():
+            pass
+        after = metrics.render()
+    finally:
+        engine.dispose()
+
+    delta = lambda name, **labels: sample(after, name, **labels) - sample(before, name, **labels)  # noqa: E731
+    assert delta("db_pool_checkouts_total", pool="sync") == 2
+    assert delta("db_pool_checkout_wait_seconds_count", pool="sync") == 2
+    assert sample(during, "db_pool_connections", pool="sync", state="checked_out") >= 1
+
+
+def test_histogram_exposition():
+    """測試直方圖輸出累計的 bucket、總和與次數，標籤值會跳脫"""
+    registry = []
+    histogram = metrics.Histogram("demo_seconds", "示範", ("path",), buckets=(0.1, 1.0), registry=registry)
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels('a"b').observe(value)
+
+    assert histogram.collect() == [
+        "# HELP demo_seconds 示範",
+        "# TYPE demo_seconds histogram",
+        'demo_seconds_bucket{path="a\\"b",le="0.1"} 2',
+        'demo_seconds_bucket{path="a\\"b",le="1"} 3',
+        'demo_seconds_bucket{path="a\\"b",le="+Inf"} 4',
+        'demo_seconds_sum{path="a\\"b"} 3.65',
+        'demo_seconds_count{path="a\\"b"} 4',
+    ]
+    assert registry == [histogram]
@@ -0,0 +1,120 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import migrations
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'nested' / 'app.db'}")
+    yield engine
+    engine.dispose()
+
+
+def test_schema_revision_matches_alembic_head():
+    """測試 SCHEMA_REVISION 與遷移腳本的最新版本一致"""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(migrations.ALEMBIC_CONFIG))
+    config.set_main_option("script_location", str(migrations.ALEMBIC_CONFIG.parent / "alembic"))
+    assert ScriptDirectory.from_config(config).get_current_head() == migrations.SCHEMA_REVISION
+
+
+def test_new_database_is_created_and_stamped(engine):
+    """測試全新的資料庫以 create_all 建立並記錄版本，之後啟動只檢查版本"""
+    assert migrations.prepare_database(engine) == "created"
+    with engine.connect() as connection:
+        assert migrations.current_revision(connection) == migrations.SCHEMA_REVISION
+        assert "contract_items_fts" in inspect(connection).get_table_names()
+
+    assert migrations.prepare_database(engine) == "current"
+
+
+def test_outdated_database_is_upgraded(engine):
+    """測試舊版本的資料庫以 Alembic 升級（沿用傳入的連線）"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(migrations.ALEMBIC_CONFIG))
+    config.set_main_option("script_location", str(migrations.ALEMBIC_CONFIG.parent / "alembic"))
+    (Path(engine.url.database).parent).mkdir()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "e41a6b0c9d52")
+
+    assert migrations.prepare_database(engine) == "upgraded"
+    with engine.connect() as connection:
+        assert migrations.current_revision(connection) == migrations.SCHEMA_REVISION
+        assert "inspections_fts" in inspect(connection).get_table_names()
+
+
+def test_database_built_by_create_all_is_upgraded_from_initial_revision(engine):
+    """測試導入 Alembic 之前以 create_all 建立的資料庫記錄為初始版本後升級，補建 FTS5 索引、統計摘要與索引"""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(migrations.ALEMBIC_CONFIG))
+    config.set_main_option("script_location", str(migrations.ALEMBIC_CONFIG.parent / "alembic"))
+    (Path(engine.url.database).parent).mkdir()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, migrations.INITIAL_REVISION)
+        connection.execute(text("DROP TABLE alembic_version"))
+        connection.execute(text("INSERT INTO projects (id, name, contract_number) VALUES (1, '鋼筋混凝土工程', 'A-1')"))
+        connection.execute(text(
+            "INSERT INTO contract_items (project_id, name, quantity, unit_price, total_price) "
+            "VALUES (1, '預拌混凝土', 2, 100, 200)"
+        ))
+
+    assert migrations.prepare_database(engine) == "upgraded"
+    with engine.begin() as connection:
+        assert migrations.current_revision(connection) == migrations.SCHEMA_REVISION
+        assert "ix_photos_project_id" in {index["name"] for index in inspect(connection).get_indexes("photos")}
+        assert connection.execute(
+            text("SELECT rowid FROM projects_fts WHERE projects_fts MATCH '混凝土'")
+        ).scalars().all() == [1]
+        # 既有資料已回填統計摘要，之後的寫入由觸發程序更新
+        connection.execute(text(
+            "INSERT INTO contract_items (project_id, name, quantity, unit_price, total_price) "
+            "VALUES (1, '鋼筋', 1, 50, 50)"
+        ))
+        assert connection.execute(
+            text("SELECT item_count, total_contract_value FROM project_summaries WHERE project_id = 1")
+        ).one() == (2, 250)
+
+    assert migrations.prepare_database(engine) == "current"
+
+
+def test_unversioned_database_keeps_create_all_behaviour(engine):
+    """測試結構無法辨識、沒有版本紀錄的既有資料庫仍補建缺少的資料表，不自動記錄版本"""
+    (Path(engine.url.database).parent).mkdir()
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR)"))
+
+    assert migrations.prepare_database(engine) == "unversioned"
+    with engine.connect() as connection:
+        assert migrations.current_revision(connection) is None
+        assert "photos" in inspect(connection).get_table_names()
+
+
+def test_importing_main_has_no_side_effects(tmp_path):
+    """測試匯入 main 不會建立資料庫、data/ 或 uploads/，也不會載入 Pillow 與 Alembic"""
+    env = {**os.environ, "PYTHONPATH": str(BACKEND_DIR)}
+    env.pop("SQLALCHEMY_DATABASE_URL", None)
+    code = (
+        "import sys, main; "
+        "print(','.join(sorted(m for m in ('PIL', 'alembic', 'openpyxl') if m in sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=tmp_path, env=env, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+    assert list(tmp_path.iterdir()) == []
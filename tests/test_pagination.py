@@ -0,0 +1,61 @@
+import pytest
+
+from pagination import encode_cursor
+from .conftest import fetch_pages
+
+
+def test_contract_items_keyset_pagination(client, project_id):
+    """測試契約項目依游標分頁，不重複也不遺漏"""
+    rows = [
+        {"pcces_code": f"1-{i}", "name": f"工項 {i}", "unit": "式",
+         "quantity": 1.0, "unit_price": 1.0, "total_price": 1.0}
+        for i in range(25)
+    ]
+    client.post(f"/projects/{project_id}/contract-items/bulk", json=rows)
+
+    pages = [response.json() for response in fetch_pages(client, f"/projects/{project_id}/contract-items/", limit=10)]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    codes = [item["pcces_code"] for page in pages for item in page]
+    assert codes == [row["pcces_code"] for row in rows]
+
+
+def test_inspections_pagination_with_equal_sort_keys(client, project_id):
+    """測試抽查時間相同時仍以 id 穩定分頁"""
+    for i in range(5):
+        client.post(
+            "/inspections/",
+            json={
+                "name": f"抽查 {i}",
+                "inspection_time": "2026-01-0{}T00:00:00".format(1 if i < 3 else 2),
+                "location": "A區",
+                "is_pass": True,
+                "project_id": project_id
+            }
+        )
+
+    pages = [response.json() for response in fetch_pages(client, f"/projects/{project_id}/inspections/", limit=2)]
+    names = [inspection["name"] for page in pages for inspection in page]
+    assert names == [f"抽查 {i}" for i in range(5)]
+
+
+def test_invalid_cursor(client):
+    """測試無效的游標回傳 400"""
+    response = client.get("/projects/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path, values", [
+    ("/projects/", [{"a": 1}]),
+    ("/projects/", ["1"]),
+    ("/projects/", [True]),
+    ("/projects/", [None]),
+    ("/projects/1/inspections/", [1, 1]),
+    ("/projects/1/inspections/", ["2026-01-01T00:00:00", "1"]),
+    ("/projects/1/inspections/", ["not a date", 1]),
+    ("/search", [0.5, "project", [1]]),
+])
+def test_cursor_values_must_match_column_types(client, path, values):
+    """測試游標值的型別與排序欄位不符時回傳 400"""
+    response = client.get(path, params={"q": "混凝土", "cursor": encode_cursor(values)})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "無效的分頁游標"
@@ -0,0 +1,345 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+
+@pytest.fixture
+def inspection_id(client, project_id):
+    """創建測試用的抽查記錄"""
+    response = client.post(
+        "/inspections/",
+        json={
+            "name": "測試抽查",
+            "inspection_time": "2026-01-01T00:00:00",
+            "location": "A區",
+            "is_pass": True,
+            "project_id": project_id
+        }
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+def test_upload_and_view_photo(client, project_id, inspection_id):
+    """測試上傳單張照片後可查看，並出現在抽查表照片清單"""
+    content = b"\xff\xd8\xff\xe0 fake jpeg"
+    response = client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", content, "image/jpeg")},
+        data={"project_id": project_id, "inspection_id": inspection_id, "description": "現場"}
+    )
+    assert response.status_code == 200, response.text
+    photo = response.json()
+    assert photo["inspection_id"] == inspection_id
+    assert photo["created_at"]
+
+    view = client.get(f"/photos/{photo['id']}/view")
+    assert view.status_code == 200
+    assert view.content == content
+
+    photos = client.get(f"/inspections/{inspection_id}/photos").json()
+    assert [p["id"] for p in photos] == [photo["id"]]
+
+
+def test_upload_photo_rejects_non_image(client, project_id):
+    """測試上傳非圖片檔案"""
+    response = client.post(
+        "/photos/upload/",
+        files={"file": ("notes.txt", b"text", "text/plain")},
+        data={"project_id": project_id}
+    )
+    assert response.status_code == 400
+
+
+def test_bulk_upload_photos(client, project_id):
+    """測試批量上傳照片"""
+    files = [("files", (f"p{i}.jpg", f"photo {i}".encode(), "image/jpeg")) for i in range(3)]
+    response = client.post("/photos/bulk-upload/", files=files, data={"project_id": project_id})
+    assert response.status_code == 200, response.text
+    photos = response.json()
+    assert len(photos) == 3
+    assert all(Path(p["file_path"]).exists() for p in photos)
+
+
+def test_bulk_upload_photos_same_name_single_insert(client, project_id, async_db_engine):
+    """測試同名照片不會互相覆蓋，且照片記錄以單一 INSERT 寫入、不逐筆查詢"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    files = [("files", ("IMG_0001.jpg", f"photo {i}".encode(), "image/jpeg")) for i in range(40)]
+    response = client.post("/photos/bulk-upload/", files=files, data={"project_id": project_id})
+    event.remove(async_db_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200, response.text
+    photos = response.json()
+    assert len(photos) == 40
+    assert len({p["file_path"] for p in photos}) == 40
+    contents = {Path(p["file_path"]).read_bytes() for p in photos}
+    assert contents == {f"photo {i}".encode() for i in range(40)}
+    assert all(p["id"] and p["created_at"] for p in photos)
+
+    photo_statements = [s for s in statements if "photos" in s]
+    assert len(photo_statements) == 1
+    assert photo_statements[0].startswith("INSERT INTO photos")
+
+
+def test_upload_and_download_inspection_file(client, project_id, inspection_id):
+    """測試上傳並下載抽查表電子檔"""
+    content = b"%PDF-1.4 test"
+    response = client.post(
+        "/inspection-files/",
+        files={"file": ("inspection.pdf", content, "application/pdf")},
+        data={"project_id": project_id, "inspection_id": inspection_id}
+    )
+    assert response.status_code == 200, response.text
+
+    download = client.get(f"/inspection-files/{inspection_id}")
+    assert download.status_code == 200
+    assert download.content == content
+
+
+def test_upload_photo_over_size_limit(client, project_id, monkeypatch):
+    """測試超過單檔大小上限時回傳 413 且不留下暫存檔"""
+    import storage
+
+    monkeypatch.setattr(storage, "MAX_UPLOAD_SIZE", 1024)
+    monkeypatch.setattr(storage, "UPLOAD_CHUNK_SIZE", 256)
+    response = client.post(
+        "/photos/upload/",
+        files={"file": ("big.jpg", b"x" * 4096, "image/jpeg")},
+        data={"project_id": project_id}
+    )
+    assert response.status_code == 413
+    assert not [p for p in Path("uploads").rglob("*") if p.is_file()]
+
+
+def test_request_over_size_limit(client, project_id):
+    """測試請求超過大小上限時在解析前回傳 413"""
+    response = client.post(
+        "/photos/upload/",
+        content=b"x",
+        headers={"Content-Type": "multipart/form-data; boundary=x", "Content-Length": str(10 ** 12)}
+    )
+    assert response.status_code == 413
+
+
+def test_duplicate_photo_shares_blob(client, project_id, inspection_id, monkeypatch):
+    """測試相同內容上傳到不同抽查表只保存一份，刪除最後一筆引用時才刪除檔案"""
+    import storage
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    other = client.post(
+        "/inspections/",
+        json={
+            "name": "另一抽查",
+            "inspection_time": "2026-01-02T00:00:00",
+            "location": "B區",
+            "is_pass": True,
+            "project_id": project_id
+        }
+    ).json()["id"]
+
+    content = b"\xff\xd8\xff\xe0 same photo"
+    photos = []
+    for target in (inspection_id, other):
+        response = client.post(
+            "/photos/upload/",
+            files={"file": ("site.jpg", content, "image/jpeg")},
+            data={"project_id": project_id, "inspection_id": target}
+        )
+        assert response.status_code == 200, response.text
+        photos.append(response.json())
+
+    first, second = photos
+    assert first["id"] != second["id"]
+    assert first["file_path"] == second["file_path"]
+    assert first["filename"] == "site.jpg"
+    blob = Path(first["file_path"])
+    assert [p for p in Path("uploads").rglob("*") if p.is_file()] == [blob]
+
+    assert client.delete(f"/photos/{first['id']}").status_code == 200
+    assert blob.exists()
+    assert client.get(f"/photos/{second['id']}/view").content == content
+
+    assert client.delete(f"/photos/{second['id']}").status_code == 200
+    assert not blob.exists()
+
+
+def test_duplicate_upload_keeps_last_modified_and_grace(client, project_id):
+    """測試重複上傳相同內容不改變 Last-Modified，但讓檔案重新進入寬限期"""
+    import storage
+
+    content = b"\xff\xd8\xff\xe0 reuploaded photo"
+
+    def upload():
+        response = client.post(
+            "/photos/upload/",
+            files={"file": ("site.jpg", content, "image/jpeg")},
+            data={"project_id": project_id}
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    first = upload()
+    blob = Path(first["file_path"])
+    os.utime(blob, (1000, 1000))
+    before = client.get(f"/photos/{first['id']}/view").headers["last-modified"]
+
+    upload()
+    assert blob.stat().st_mtime == 1000
+    assert client.get(f"/photos/{first['id']}/view").headers["last-modified"] == before
+    assert time.time() - storage.last_written(blob.stat()) < storage.BLOB_RELEASE_GRACE_SECONDS
+
+
+def test_delete_photo_within_grace_period_queues_blob(client, db_engine, project_id, monkeypatch):
+    """測試寬限期內刪除的照片檔案寫入待刪除佇列，寬限期後清理"""
+    import storage
+    from models import FilePurge
+
+    scheduled = []
+    monkeypatch.setattr(storage, "schedule_purge_retry", lambda bind: scheduled.append(bind))
+    photo = client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", b"\xff\xd8\xff\xe0 short-lived", "image/jpeg")},
+        data={"project_id": project_id}
+    ).json()
+    blob = Path(photo["file_path"])
+
+    assert client.delete(f"/photos/{photo['id']}").status_code == 200
+    assert blob.exists()
+    with Session(db_engine) as db:
+        assert db.scalars(select(FilePurge.file_path)).all() == [photo["file_path"]]
+    assert len(scheduled) == 1
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    assert storage.purge_files(db_engine) == 1
+    assert not blob.exists()
+
+
+def test_replace_inspection_file_within_grace_period_queues_blob(
+    client, db_engine, project_id, inspection_id, monkeypatch
+):
+    """測試寬限期內被取代的抽查表電子檔（AsyncSession）也寫入待刪除佇列"""
+    import storage
+    from models import FilePurge
+
+    scheduled = []
+    monkeypatch.setattr(storage, "schedule_purge_retry", lambda bind: scheduled.append(bind))
+    paths = []
+    for content in (b"%PDF-1.4 draft", b"%PDF-1.4 final"):
+        response = client.post(
+            "/inspection-files/",
+            files={"file": ("inspection.pdf", content, "application/pdf")},
+            data={"project_id": project_id, "inspection_id": inspection_id}
+        )
+        assert response.status_code == 200, response.text
+        paths.append(response.json()["file_path"])
+
+    assert Path(paths[0]).exists()
+    with Session(db_engine) as db:
+        assert db.scalars(select(FilePurge.file_path)).all() == [paths[0]]
+    assert scheduled == [db_engine]
+
+
+def test_replace_inspection_file_releases_old_blob(client, project_id, inspection_id, monkeypatch):
+    """測試抽查表電子檔被取代或刪除後，沒有引用的舊檔案會被刪除"""
+    import storage
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+
+    def upload(content):
+        response = client.post(
+            "/inspection-files/",
+            files={"file": ("inspection.pdf", content, "application/pdf")},
+            data={"project_id": project_id, "inspection_id": inspection_id}
+        )
+        assert response.status_code == 200, response.text
+        return Path(response.json()["file_path"])
+
+    old = upload(b"%PDF-1.4 v1")
+    new = upload(b"%PDF-1.4 v2")
+    assert not old.exists()
+    assert new.exists()
+
+    download = client.get(f"/inspection-files/{inspection_id}")
+    assert download.headers["content-disposition"].endswith('"inspection_%d.pdf"' % inspection_id)
+
+    assert client.delete(f"/inspection-files/{inspection_id}").status_code == 200
+    assert not new.exists()
+
+
+def test_view_photo_conditional_get(client, project_id):
+    """測試照片回應帶有強 ETag，If-None-Match 相同時回傳 304"""
+    content = b"\xff\xd8\xff\xe0 cached photo"
+    photo = client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", content, "image/jpeg")},
+        data={"project_id": project_id}
+    ).json()
+
+    response = client.get(f"/photos/{photo['id']}/view")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag == '"%s"' % Path(photo["file_path"]).stem
+    assert response.headers["last-modified"]
+    assert response.headers["cache-control"] == "private, max-age=86400"
+
+    not_modified = client.get(f"/photos/{photo['id']}/view", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+
+    since = client.get(
+        f"/photos/{photo['id']}/view",
+        headers={"If-Modified-Since": response.headers["last-modified"]}
+    )
+    assert since.status_code == 304
+
+    changed = client.get(f"/photos/{photo['id']}/view", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+    assert changed.content == content
+
+
+def test_download_inspection_file_range(client, project_id, inspection_id):
+    """測試抽查表電子檔支援 Range 分段下載，且每次都要重新驗證"""
+    content = bytes(range(256)) * 40
+    client.post(
+        "/inspection-files/",
+        files={"file": ("inspection.pdf", content, "application/pdf")},
+        data={"project_id": project_id, "inspection_id": inspection_id}
+    )
+
+    full = client.get(f"/inspection-files/{inspection_id}")
+    assert full.headers["cache-control"] == "private, no-cache"
+    assert full.headers["accept-ranges"] == "bytes"
+    etag = full.headers["etag"]
+
+    part = client.get(f"/inspection-files/{inspection_id}", headers={"Range": "bytes=100-1099"})
+    assert part.status_code == 206
+    assert part.content == content[100:1100]
+    assert part.headers["content-range"] == f"bytes 100-1099/{len(content)}"
+
+    resumed = client.get(
+        f"/inspection-files/{inspection_id}",
+        headers={"Range": "bytes=5000-", "If-Range": etag}
+    )
+    assert resumed.status_code == 206
+    assert resumed.content == content[5000:]
+
+    stale = client.get(
+        f"/inspection-files/{inspection_id}",
+        headers={"Range": "bytes=5000-", "If-Range": '"stale"'}
+    )
+    assert stale.status_code == 200
+    assert stale.content == content
+
+    assert client.get(
+        f"/inspection-files/{inspection_id}", headers={"If-None-Match": etag}
+    ).status_code == 304
@@ -0,0 +1,209 @@
+import io
+import json
+import zipfile
+from pathlib import Path
+
+import pytest
+
+import project_archive
+from .conftest import create_project
+
+
+@pytest.fixture
+def project(client):
+    """建立包含契約項目、試驗、抽查表與照片的工程專案（兩張照片內容相同）"""
+    project_id = create_project(client, "ARCHIVE-001")
+
+    items = [
+        {"pcces_code": f"1-{i}", "name": f"工項 {i}", "unit": "m3",
+         "quantity": 1.5 * i, "unit_price": 100.0, "total_price": 150.0 * i}
+        for i in range(1, 6)
+    ]
+    client.post(f"/projects/{project_id}/contract-items/bulk", json=items)
+    item_ids = [item["id"] for item in client.get(f"/projects/{project_id}/contract-items/").json()]
+
+    test = client.post(
+        "/tests/",
+        json={"project_id": project_id, "contract_item_id": item_ids[2], "name": "坍度試驗",
+              "test_item": "坍度", "test_sets": 3, "test_result": "合格"}
+    ).json()
+    inspection = client.post(
+        "/inspections/",
+        json={"name": "鋼筋抽查", "inspection_time": "2026-05-01T09:30:00", "location": "A區",
+              "is_pass": True, "project_id": project_id}
+    ).json()
+    client.post(
+        "/inspection-files/",
+        files={"file": ("inspection.pdf", b"%PDF-1.4 inspection", "application/pdf")},
+        data={"project_id": project_id, "inspection_id": inspection["id"]}
+    )
+    for links in ({"inspection_id": inspection["id"]}, {"quality_test_id": test["id"]}):
+        response = client.post(
+            "/photos/upload/",
+            files={"file": ("site.jpg", b"same photo", "image/jpeg")},
+            data={"project_id": project_id, **links}
+        )
+        assert response.status_code == 200, response.text
+    return project_id
+
+
+def download_archive(client, project_id) -> bytes:
+    with client.stream("GET", f"/projects/{project_id}/archive") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/zip"
+        return b"".join(response.iter_bytes())
+
+
+def read_ndjson(archive, name):
+    return [json.loads(line) for line in archive.read(f"{name}.ndjson").splitlines()]
+
+
+def test_export_project_archive(client, project):
+    """測試封存檔包含各資料表的 NDJSON 與去除重複的檔案"""
+    archive = zipfile.ZipFile(io.BytesIO(download_archive(client, project)))
+    assert archive.testzip() is None
+
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["project"]["contract_number"] == "ARCHIVE-001"
+    assert len(read_ndjson(archive, "contract_items")) == 5
+    assert len(read_ndjson(archive, "tests")) == 1
+    inspections = read_ndjson(archive, "inspections")
+    photos = read_ndjson(archive, "photos")
+    assert len(photos) == 2
+    assert all("project_id" not in row for row in photos)
+
+    files = [name for name in archive.namelist() if name.startswith("files/")]
+    # 兩張內容相同的照片只收錄一次
+    assert len(files) == 2
+    assert photos[0]["file_path"] == photos[1]["file_path"]
+    assert archive.read(inspections[0]["file_path"]) == b"%PDF-1.4 inspection"
+    assert archive.getinfo(photos[0]["file_path"]).compress_type == zipfile.ZIP_STORED
+
+    assert client.get("/projects/999/archive").status_code == 404
+
+
+def test_import_project_archive(client, project):
+    """測試匯入封存檔建立新的工程專案，外鍵對應到新的 id"""
+    content = download_archive(client, project)
+    upload = {"file": ("archive.zip", content, "application/zip")}
+
+    # 契約編號已存在
+    assert client.post("/projects/import", files=upload).status_code == 409
+
+    response = client.post("/projects/import", files=upload, data={"contract_number": "ARCHIVE-002"})
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result == {
+        "project_id": result["project_id"], "contract_items": 5, "tests": 1,
+        "inspections": 1, "photos": 2, "files": 2, "missing_files": 0,
+    }
+    new_id = result["project_id"]
+    assert new_id != project
+
+    items = client.get(f"/projects/{new_id}/contract-items/").json()
+    assert [item["pcces_code"] for item in items] == [f"1-{i}" for i in range(1, 6)]
+    tests = client.get(f"/projects/{new_id}/tests/").json()
+    assert tests[0]["contract_item_id"] == items[2]["id"]
+
+    inspection = client.get(f"/projects/{new_id}/inspections/").json()[0]
+    assert inspection["is_pass"] is True
+    assert inspection["inspection_time"] == "2026-05-01T09:30:00"
+    assert client.get(f"/inspection-files/{inspection['id']}").content == b"%PDF-1.4 inspection"
+
+    photos = client.get(f"/projects/{new_id}/photos/").json()
+    assert {photo["inspection_id"] for photo in photos} == {inspection["id"], None}
+    assert {photo["quality_test_id"] for photo in photos} == {tests[0]["id"], None}
+    assert all(Path(photo["file_path"]).read_bytes() == b"same photo" for photo in photos)
+
+    summary = client.get(f"/projects/{new_id}/summary").json()
+    assert summary["item_count"] == 5
+    assert summary["photo_count"] == 2
+
+
+def test_import_rejects_invalid_archives(client):
+    """測試非 ZIP 或缺少 manifest 的檔案回傳 400"""
+    response = client.post("/projects/import", files={"file": ("bad.zip", b"not a zip", "application/zip")})
+    assert response.status_code == 400
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("contract_items.ndjson", "{}\n")
+    response = client.post("/projects/import", files={"file": ("empty.zip", buffer.getvalue(), "application/zip")})
+    assert response.status_code == 400
+    assert project_archive.MANIFEST_NAME in response.json()["detail"]
+
+
+def build_archive(photo_files, extra_files=()) -> bytes:
+    """建立只有照片的封存檔：photo_files 為 {壓縮檔內名稱: 內容}，extra_files 不被資料列引用"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("manifest.json", json.dumps({
+            "format": project_archive.ARCHIVE_FORMAT, "version": project_archive.ARCHIVE_VERSION,
+            "project": {"name": "外部封存檔", "contract_number": "EXTERNAL-001"},
+        }))
+        archive.writestr("photos.ndjson", "".join(
+            json.dumps({"id": index, "filename": "a.jpg", "file_path": name}) + "\n"
+            for index, name in enumerate(photo_files, 1)
+        ))
+        for name, content in [*photo_files.items(), *extra_files]:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def stored_blobs():
+    return sorted(path.name for path in Path("uploads", "blobs").rglob("*") if path.is_file())
+
+
+def import_archive(client, content):
+    return client.post("/projects/import", files={"file": ("archive.zip", content, "application/zip")})
+
+
+def test_import_limits_decompressed_file_sizes(client, monkeypatch):
+    """測試封存檔內的檔案解壓縮後超過單一檔案或合計的上限時回傳 413，且不寫入任何檔案"""
+    monkeypatch.setattr(project_archive.storage, "MAX_UPLOAD_SIZE", 1000)
+    response = import_archive(client, build_archive({"files/small.jpg": b"a" * 10, "files/bomb.jpg": b"\0" * 100_000}))
+    assert response.status_code == 413
+    assert "files/bomb.jpg" in response.json()["detail"]
+
+    monkeypatch.setattr(project_archive, "ARCHIVE_MAX_FILES_SIZE", 1500)
+    response = import_archive(client, build_archive({"files/a.jpg": b"a" * 800, "files/b.jpg": b"b" * 800}))
+    assert response.status_code == 413
+
+    assert stored_blobs() == []
+    assert client.get("/projects/").json() == []
+
+
+def test_import_restores_only_referenced_files(client):
+    """測試只寫入資料列有引用的檔案"""
+    content = build_archive({"files/used.jpg": b"used photo"}, extra_files=[("files/unused.jpg", b"unused")])
+    response = import_archive(client, content)
+    assert response.status_code == 200, response.text
+    assert response.json()["files"] == 1
+
+    [photo] = client.get(f"/projects/{response.json()['project_id']}/photos/").json()
+    assert Path(photo["file_path"]).read_bytes() == b"used photo"
+    assert len(stored_blobs()) == 1
+
+
+def test_import_rejects_overlong_ndjson_lines(client, monkeypatch):
+    """測試 NDJSON 單行超過 ARCHIVE_MAX_LINE_BYTES 時回傳 413，上限內的資料列正常匯入"""
+    monkeypatch.setattr(project_archive, "ARCHIVE_MAX_LINE_BYTES", 200)
+
+    def archive_with_description(description):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("manifest.json", json.dumps({
+                "format": project_archive.ARCHIVE_FORMAT, "version": project_archive.ARCHIVE_VERSION,
+                "project": {"name": "外部封存檔", "contract_number": "EXTERNAL-002"},
+            }))
+            archive.writestr("photos.ndjson", json.dumps({"id": 1, "filename": "a.jpg", "description": description}) + "\n")
+        return buffer.getvalue()
+
+    response = import_archive(client, archive_with_description("x" * 10_000))
+    assert response.status_code == 413
+    assert "photos.ndjson" in response.json()["detail"]
+    assert client.get("/projects/").json() == []
+
+    response = import_archive(client, archive_with_description("x" * 100))
+    assert response.status_code == 200, response.text
+    assert response.json()["photos"] == 1
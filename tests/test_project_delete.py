@@ -0,0 +1,163 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import storage
+from models import ContractItem, FilePurge, Inspection, Photo, QualityTest
+from .conftest import create_project
+
+
+def upload_photo(client, project_id, content, **data):
+    response = client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", content, "image/jpeg")},
+        data={"project_id": project_id, **data}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def populated(client, db_engine, monkeypatch):
+    """建立兩個工程專案，其中一張照片的內容兩個專案共用"""
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    project_id = create_project(client, "DEL-001")
+    other_id = create_project(client, "DEL-002")
+
+    with Session(db_engine) as db:
+        item = ContractItem(project_id=project_id, pcces_code="A1", name="混凝土", unit="m3",
+                            quantity=1, unit_price=1, total_price=1)
+        db.add(item)
+        db.flush()
+        test = QualityTest(project_id=project_id, contract_item_id=item.id, name="坍度試驗")
+        inspection = Inspection(project_id=project_id, name="鋼筋抽查",
+                                inspection_time=datetime(2026, 1, 1), location="A區", is_pass="1")
+        db.add_all([test, inspection])
+        db.commit()
+        test_id, inspection_id = test.id, inspection.id
+
+    response = client.post(
+        "/inspection-files/",
+        files={"file": ("inspection.pdf", b"%PDF-1.4 delete me", "application/pdf")},
+        data={"project_id": project_id, "inspection_id": inspection_id}
+    )
+    assert response.status_code == 200, response.text
+
+    own = [
+        upload_photo(client, project_id, f"photo {i}".encode(), inspection_id=inspection_id)
+        for i in range(5)
+    ]
+    own.append(upload_photo(client, project_id, b"test photo", quality_test_id=test_id))
+    shared = upload_photo(client, project_id, b"shared photo")
+    kept = upload_photo(client, other_id, b"shared photo")
+    return {
+        "project_id": project_id,
+        "other_id": other_id,
+        "own_files": [Path(p["file_path"]) for p in own] + [Path(response.json()["file_path"])],
+        "shared_file": Path(shared["file_path"]),
+        "kept_photo": kept,
+    }
+
+
+def count(db, model, *criteria):
+    return db.scalar(select(func.count()).select_from(model).where(*criteria))
+
+
+def test_delete_project_cascades_and_purges_files(client, db_engine, populated):
+    """測試刪除工程專案時刪除所有子資料與不再被引用的檔案"""
+    project_id = populated["project_id"]
+    response = client.delete(f"/projects/{project_id}")
+    assert response.status_code == 200
+    assert client.get(f"/projects/{project_id}").status_code == 404
+
+    with Session(db_engine) as db:
+        assert count(db, ContractItem, ContractItem.project_id == project_id) == 0
+        assert count(db, QualityTest, QualityTest.project_id == project_id) == 0
+        assert count(db, Inspection, Inspection.project_id == project_id) == 0
+        assert count(db, Photo, Photo.project_id == project_id) == 0
+        assert count(db, Photo) == 1
+        assert count(db, FilePurge) == 0
+
+    # 背景工作在回應送出後已清理佇列
+    assert not any(path.exists() for path in populated["own_files"])
+    assert populated["shared_file"].exists()
+    kept = populated["kept_photo"]
+    assert client.get(f"/photos/{kept['id']}/view").content == b"shared photo"
+
+
+def test_delete_project_is_set_based(client, db_engine, populated, monkeypatch):
+    """測試刪除時不逐筆載入子資料，SQL 語句數量與資料筆數無關"""
+    monkeypatch.setattr(storage, "purge_files", lambda bind: 0)
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_engine, "before_cursor_execute", before_cursor_execute)
+    response = client.delete(f"/projects/{populated['project_id']}")
+    event.remove(db_engine, "before_cursor_execute", before_cursor_execute)
+
+    assert response.status_code == 200
+    assert len(statements) == 8
+    assert [s.split()[0] for s in statements[1:]] == ["INSERT"] + ["DELETE"] * 6
+
+    with Session(db_engine) as db:
+        # 佇列中每個檔案只出現一次，共用的檔案仍在佇列中等待確認
+        queued = db.scalars(select(FilePurge.file_path)).all()
+        assert len(queued) == len(set(queued)) == len(populated["own_files"]) + 1
+
+
+def test_drain_purge_queue_defers_recent_files(client, db_engine, populated, monkeypatch):
+    """測試寬限期內的檔案留在佇列中，等下一次清理"""
+    drain_purge_queue = storage.drain_purge_queue
+    monkeypatch.setattr(storage, "purge_files", lambda bind: 0)
+    assert client.delete(f"/projects/{populated['project_id']}").status_code == 200
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 3600)
+    assert drain_purge_queue(db_engine, batch_size=2) == 0
+    with Session(db_engine) as db:
+        # 共用的檔案仍被引用，直接移出佇列；其他檔案延後處理
+        assert count(db, FilePurge) == len(populated["own_files"])
+    assert all(path.exists() for path in populated["own_files"])
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    assert drain_purge_queue(db_engine, batch_size=2) == len(populated["own_files"])
+    with Session(db_engine) as db:
+        assert count(db, FilePurge) == 0
+    assert not any(path.exists() for path in populated["own_files"])
+
+
+def test_deferred_files_are_purged_after_grace_period(client, db_engine, populated, monkeypatch):
+    """測試寬限期內延後的檔案會在寬限期後自動再清理一次"""
+    scheduled = []
+    monkeypatch.setattr(storage, "schedule_purge_retry", lambda bind: scheduled.append(bind))
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 3600)
+    assert client.delete(f"/projects/{populated['project_id']}").status_code == 200
+
+    # 背景清理延後了檔案，因此排程重試
+    assert scheduled == [db_engine]
+    assert all(path.exists() for path in populated["own_files"])
+
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 0)
+    assert storage.purge_files(db_engine) == len(populated["own_files"])
+    assert scheduled == [db_engine]
+    with Session(db_engine) as db:
+        assert count(db, FilePurge) == 0
+    assert not any(path.exists() for path in populated["own_files"])
+
+
+def test_purge_retry_runs_once_per_grace_period(db_engine, monkeypatch):
+    """測試重試計時器同時只有一個，到期後執行清理，關閉時可取消"""
+    calls = []
+    monkeypatch.setattr(storage, "purge_files", lambda bind: calls.append(bind))
+    storage.schedule_purge_retry(db_engine, delay=0.05)
+    storage.schedule_purge_retry(db_engine, delay=0.05)
+    storage._purge_retry.join(1)
+    assert calls == [db_engine]
+
+    storage.schedule_purge_retry(db_engine, delay=60)
+    storage.cancel_purge_retry()
+    assert storage._purge_retry is None
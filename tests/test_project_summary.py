@@ -0,0 +1,113 @@
+import random
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from models import ContractItem, Inspection, Photo, Project, ProjectSummary, QualityTest
+
+
+def test_empty_project_summary(client, project_id):
+    """測試新建立的工程專案摘要為零"""
+    summary = client.get(f"/projects/{project_id}/summary").json()
+    assert summary["item_count"] == 0
+    assert summary["total_contract_value"] == 0
+    assert summary["pass_rate"] is None
+    assert summary["last_activity_at"]
+    assert client.get("/projects/9999/summary").status_code == 404
+
+
+def test_summary_follows_write_endpoints(client, project_id):
+    """測試各寫入端點都會更新摘要"""
+    items = [
+        {"pcces_code": f"A{i}", "name": "工項", "unit": "式", "quantity": 1, "unit_price": 100, "total_price": 100 * i}
+        for i in range(1, 5)
+    ]
+    result = client.post(f"/projects/{project_id}/contract-items/bulk", json=items).json()
+    assert result["inserted"] == 4
+    item_id = client.get(f"/projects/{project_id}/contract-items/").json()[0]["id"]
+
+    assert client.post("/tests/", json={
+        "name": "坍度", "test_item": "坍度", "test_sets": 3, "test_result": "合格",
+        "project_id": project_id, "contract_item_id": item_id
+    }).status_code == 200
+    for is_pass in (True, True, False):
+        assert client.post("/inspections/", json={
+            "name": "抽查", "inspection_time": "2026-01-01T00:00:00", "location": "A區",
+            "is_pass": is_pass, "project_id": project_id
+        }).status_code == 200
+    client.post(
+        "/photos/upload/",
+        files={"file": ("site.jpg", b"\xff\xd8 photo", "image/jpeg")},
+        data={"project_id": project_id}
+    )
+
+    summary = client.get(f"/projects/{project_id}/summary").json()
+    assert summary["item_count"] == 4
+    assert summary["total_contract_value"] == 1000
+    assert summary["test_count"] == 1
+    assert summary["test_set_total"] == 3
+    assert summary["inspection_count"] == 3
+    assert summary["inspection_pass_count"] == 2
+    assert summary["pass_rate"] == pytest.approx(2 / 3)
+    assert summary["photo_count"] == 1
+
+    assert client.put(f"/contract-items/{item_id}", json={"total_price": 150}).status_code == 200
+    assert client.get(f"/projects/{project_id}/summary").json()["total_contract_value"] == 1050
+    assert client.delete(f"/contract-items/{item_id}").status_code == 200
+    summary = client.get(f"/projects/{project_id}/summary").json()
+    assert summary["item_count"] == 3
+    assert summary["total_contract_value"] == 900
+
+
+def test_summary_matches_aggregates_after_random_writes(db_engine):
+    """測試大量隨機新增、修改、刪除後，摘要與重新彙總的結果一致"""
+    rng = random.Random(14)
+    with Session(db_engine) as db:
+        db.execute(insert(Project), [{"id": i, "name": f"P{i}", "contract_number": f"R{i}"} for i in (1, 2, 3)])
+        db.execute(insert(ContractItem), [
+            {"project_id": rng.choice([1, 2, 3]), "total_price": rng.choice([None, rng.uniform(0, 1000)])}
+            for _ in range(300)
+        ])
+        db.execute(insert(QualityTest), [
+            {"project_id": rng.choice([1, 2, 3]), "test_sets": rng.choice([None, 1, 2, 5])} for _ in range(100)
+        ])
+        db.execute(insert(Inspection), [
+            {"project_id": rng.choice([1, 2, 3, None]), "is_pass": rng.choice(["1", "0", None]),
+             "inspection_time": datetime(2026, 1, 1)}
+            for _ in range(200)
+        ])
+        db.execute(insert(Photo), [{"project_id": rng.choice([1, 2, 3]), "file_path": "x"} for _ in range(200)])
+        db.execute(update(ContractItem).where(ContractItem.id % 7 == 0).values(project_id=2, total_price=42))
+        db.execute(update(Inspection).where(Inspection.id % 5 == 0).values(is_pass="1"))
+        db.execute(delete(ContractItem).where(ContractItem.id % 11 == 0))
+        db.execute(delete(QualityTest).where(QualityTest.id % 3 == 0))
+        db.execute(delete(Inspection).where(Inspection.id % 4 == 0))
+        db.execute(delete(Photo).where(Photo.id % 2 == 0))
+        db.commit()
+
+        for project_id in (1, 2, 3):
+            summary = db.get(ProjectSummary, project_id)
+            items = select(ContractItem).where(ContractItem.project_id == project_id).subquery()
+            assert summary.item_count == db.scalar(select(func.count()).select_from(items))
+            assert summary.total_contract_value == pytest.approx(
+                db.scalar(select(func.coalesce(func.sum(items.c.total_price), 0)))
+            )
+            assert summary.test_set_total == db.scalar(
+                select(func.coalesce(func.sum(QualityTest.test_sets), 0)).where(QualityTest.project_id == project_id)
+            )
+            assert summary.inspection_count == db.scalar(
+                select(func.count()).where(Inspection.project_id == project_id)
+            )
+            assert summary.inspection_pass_count == db.scalar(
+                select(func.count()).where(Inspection.project_id == project_id, Inspection.is_pass == "1")
+            )
+            assert summary.photo_count == db.scalar(select(func.count()).where(Photo.project_id == project_id))
+
+
+def test_delete_project_removes_summary(client, db_engine, project_id):
+    """測試刪除工程專案時一併刪除摘要"""
+    assert client.delete(f"/projects/{project_id}").status_code == 200
+    with Session(db_engine) as db:
+        assert db.get(ProjectSummary, project_id) is None
@@ -0,0 +1,106 @@
+import logging
+
+import orjson
+import pytest
+from fastapi import BackgroundTasks, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, selectinload
+
+import query_log
+from models import Project
+
+
+@pytest.fixture
+def lazy_app(db_engine):
+    """以迴圈存取延遲載入關聯的測試用 app"""
+    with Session(db_engine) as db:
+        db.execute(insert(Project), [
+            {"name": f"工程 {n}", "contract_number": f"NP-{n}", "contractor": "營造", "location": "台中"}
+            for n in range(12)
+        ])
+        db.commit()
+
+    app = FastAPI()
+    app.add_middleware(query_log.QueryLogMiddleware)
+
+    @app.get("/projects/{mode}/photo-counts")
+    def photo_counts(mode: str):
+        statement = select(Project).order_by(Project.id)
+        if mode == "eager":
+            statement = statement.options(selectinload(Project.photos))
+        with Session(db_engine) as db:
+            return [len(project.photos) for project in db.scalars(statement)]
+
+    @app.post("/photo-counts/later")
+    def later(background_tasks: BackgroundTasks):
+        background_tasks.add_task(photo_counts, "lazy")
+        return {"scheduled": True}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def events(caplog, name):
+    return [record.query_log for record in caplog.records if getattr(record, "query_log", {}).get("event") == name]
+
+
+def test_normalize_groups_statements_by_shape():
+    """測試常數與不同長度的 IN 清單正規化為相同的文字"""
+    assert query_log.normalize(
+        "SELECT photos.id\nFROM photos\nWHERE photos.project_id IN (?, ?, ?) AND photos.filename = 'a''b.jpg' LIMIT 10"
+    ) == "SELECT photos.id FROM photos WHERE photos.project_id IN (?) AND photos.filename = ? LIMIT ?"
+    assert query_log.normalize("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?)"
+    assert query_log.normalize("SELECT anon_1.x FROM contract_items_fts AS anon_1") == (
+        "SELECT anon_1.x FROM contract_items_fts AS anon_1"
+    )
+
+
+def test_lazy_loading_in_a_loop_is_flagged(lazy_app, caplog):
+    """測試迴圈中延遲載入關聯被記錄為疑似 N+1，預先載入則不會"""
+    with caplog.at_level(logging.WARNING, logger="query_log"):
+        assert lazy_app.get("/projects/lazy/photo-counts").json() == [0] * 12
+        assert lazy_app.get("/projects/eager/photo-counts").json() == [0] * 12
+
+    [flagged] = events(caplog, "n_plus_one")
+    assert flagged["route"] == "/projects/{mode}/photo-counts"
+    assert flagged["path"] == "/projects/lazy/photo-counts"
+    assert flagged["count"] == 12
+    assert flagged["threshold"] == query_log.N_PLUS_ONE_THRESHOLD
+    assert flagged["statement"].endswith("FROM photos WHERE ? = photos.project_id")
+    # 訊息本身是同樣內容的 JSON
+    message = next(record.getMessage() for record in caplog.records if record.name == "query_log.n_plus_one")
+    assert orjson.loads(message) == flagged
+
+
+def test_background_task_queries_are_not_counted(lazy_app, caplog):
+    """測試回應送出後執行的背景工作，其 SQL 不計入請求，也不會被記錄為疑似 N+1"""
+    with caplog.at_level(logging.DEBUG, logger="query_log"):
+        assert lazy_app.post("/photo-counts/later").json() == {"scheduled": True}
+
+    assert not events(caplog, "n_plus_one")
+    [summary] = events(caplog, "request_queries")
+    assert summary["statements"] == []
+
+
+def test_slow_queries_are_logged_with_route(client, caplog, monkeypatch):
+    """測試超過門檻的 SQL 寫入慢查詢紀錄，並計入 /metrics"""
+    monkeypatch.setattr(query_log, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="query_log"):
+        assert client.get("/projects/").status_code == 200
+
+    slow = events(caplog, "slow_query")
+    assert slow and all(record["route"] == "/projects/" for record in slow)
+    assert any(record["statement"].startswith("SELECT") and "FROM projects" in record["statement"] for record in slow)
+    assert all(record["duration_ms"] >= 0 for record in slow)
+    assert not events(caplog, "n_plus_one")
+    assert 'db_slow_queries_total{method="GET",route="/projects/"}' in client.get("/metrics").text
+
+
+def test_debug_level_lists_every_statement(lazy_app, caplog):
+    """測試 DEBUG 層級時列出請求中每個 SQL 的次數與時間"""
+    with caplog.at_level(logging.DEBUG, logger="query_log"):
+        lazy_app.get("/projects/eager/photo-counts")
+
+    [summary] = events(caplog, "request_queries")
+    assert sorted(statement["count"] for statement in summary["statements"]) == [1, 1]
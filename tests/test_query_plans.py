@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, insert
+
+from models import Project, ContractItem, QualityTest, Inspection, Photo
+
+# 專案範圍的讀取端點，查詢都必須走索引
+ENDPOINTS = [
+    "/projects/1",
+    "/projects/1/summary",
+    "/projects/1/contract-items/",
+    "/projects/1/tests/",
+    "/projects/1/inspections/",
+    "/projects/1/photos/",
+    "/inspections/1/photos",
+    "/contract-items/1/tests/",
+    # 帶游標的第二頁查詢
+    "/projects/1/contract-items/?limit=1&cursor=WzFd",
+    "/projects/1/inspections/?limit=1&cursor=WyIyMDI2LTAxLTAxVDAwOjAwOjAwIiwxXQ",
+    "/projects/1/photos/?limit=1&cursor=WzFd",
+]
+
+
+@pytest.fixture
+def seeded_engine(db_engine):
+    """建立每個資料表各一筆資料"""
+    with db_engine.begin() as conn:
+        conn.execute(insert(Project).values(
+            id=1, name="索引測試", contract_number="PLAN-001", contractor="承包商", location="地點"
+        ))
+        conn.execute(insert(ContractItem).values(
+            id=1, project_id=1, pcces_code="1-1", name="工項", unit="式",
+            quantity=1.0, unit_price=100.0, total_price=100.0
+        ))
+        conn.execute(insert(QualityTest).values(
+            id=1, project_id=1, contract_item_id=1, name="試驗", test_item="抗壓", test_sets=1, test_result="合格"
+        ))
+        conn.execute(insert(Inspection).values(
+            id=1, project_id=1, name="抽查", inspection_time=datetime(2026, 1, 1), location="A區", is_pass="1"
+        ))
+        conn.execute(insert(Photo).values(
+            id=1, project_id=1, inspection_id=1, filename="a.jpg", file_path="uploads/photos/a.jpg"
+        ))
+    return db_engine
+
+
+@pytest.fixture
+def captured_selects(seeded_engine, async_db_engine):
+    """記錄端點執行的 SELECT 語句與參數（同步與 async 引擎）"""
+    statements = []
+    engines = [seeded_engine, async_db_engine.sync_engine]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for engine in engines:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_endpoint_queries_use_indexes(client, seeded_engine, captured_selects, endpoint):
+    """測試端點查詢的 EXPLAIN QUERY PLAN 不會退化成全表掃描"""
+    response = client.get(endpoint)
+    assert response.status_code == 200, response.text
+    assert captured_selects, f"{endpoint} 沒有執行任何查詢"
+
+    with seeded_engine.connect() as conn:
+        for statement, parameters in captured_selects:
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            details = [row[-1] for row in plan]
+            scans = [detail for detail in details if detail.startswith("SCAN")]
+            assert not scans, f"{endpoint} 的查詢發生全表掃描:\n{statement}\n{details}"
+            # keyset 分頁的排序必須由索引提供，不能額外排序
+            sorts = [detail for detail in details if "TEMP B-TREE" in detail]
+            assert not sorts, f"{endpoint} 的查詢需要額外排序:\n{statement}\n{details}"
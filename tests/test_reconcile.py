@@ -0,0 +1,167 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import reconcile
+import storage
+from models import Inspection, Photo
+
+
+def make_old(path: Path, age: float = 7200):
+    past = time.time() - age
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def drifted(client, project_id, monkeypatch):
+    """建立與資料庫不一致的上傳目錄"""
+    monkeypatch.setattr(storage, "BLOB_RELEASE_GRACE_SECONDS", 60)
+    photos = [
+        client.post(
+            "/photos/upload/",
+            files={"file": (f"p{i}.jpg", f"photo {i}".encode(), "image/jpeg")},
+            data={"project_id": project_id}
+        ).json()
+        for i in range(3)
+    ]
+    for photo in photos:
+        make_old(Path(photo["file_path"]))
+
+    # 懸空引用：檔案被刪除但記錄仍在
+    dangling = Path(photos[0]["file_path"])
+    dangling.unlink()
+
+    # 孤兒檔案：舊版目錄留下的檔案與上傳失敗的暫存檔
+    legacy = Path("uploads/project_1/inspection_1_20240101_000000.pdf")
+    legacy.parent.mkdir(parents=True)
+    legacy.write_bytes(b"%PDF old")
+    make_old(legacy)
+    old_temp = storage.BLOB_DIR / f"{storage.TEMP_PREFIX}old"
+    old_temp.write_bytes(b"partial")
+    make_old(old_temp)
+
+    # 最近寫入的檔案與縮圖快取不應被刪除
+    new_temp = storage.BLOB_DIR / f"{storage.TEMP_PREFIX}new"
+    new_temp.write_bytes(b"partial")
+    recent = storage.BLOB_DIR / "ff" / ("f" * 64 + ".jpg")
+    recent.parent.mkdir()
+    recent.write_bytes(b"in flight")
+    cached = Path("uploads/cache/thumbnails/aa/thumb.webp")
+    cached.parent.mkdir(parents=True)
+    cached.write_bytes(b"thumb")
+    make_old(cached)
+
+    return {
+        "photos": photos,
+        "dangling": dangling,
+        "orphans": [legacy, old_temp],
+        "kept": [new_temp, recent, cached] + [Path(p["file_path"]) for p in photos[1:]],
+    }
+
+
+def test_reconcile_report_only(client, drifted):
+    """測試預設只產生報告，不修改檔案與資料庫"""
+    response = client.post("/admin/reconcile")
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    assert report["scanned_files"] == 6
+    assert report["referenced_paths"] == 3
+    assert report["orphan_files"] == 2
+    assert report["skipped_recent"] == 2
+    assert report["dangling_references"] == 1
+    assert report["deleted_files"] == 0
+    assert sorted(report["orphan_samples"]) == sorted(os.path.abspath(p) for p in drifted["orphans"])
+    assert report["dangling_samples"] == [os.path.abspath(drifted["dangling"])]
+    assert all(path.exists() for path in drifted["orphans"])
+
+
+def test_reconcile_delete_and_fix(client, db_engine, drifted):
+    """測試刪除孤兒檔案並清除懸空引用"""
+    response = client.post("/admin/reconcile", params={"delete_orphans": True, "fix_dangling": True})
+    assert response.status_code == 200, response.text
+    report = response.json()
+
+    assert report["deleted_files"] == 2
+    assert report["deleted_photos"] == 1
+    assert not any(path.exists() for path in drifted["orphans"])
+    assert all(path.exists() for path in drifted["kept"])
+    with Session(db_engine) as db:
+        assert db.scalar(select(func.count()).select_from(Photo)) == 2
+
+    again = client.post("/admin/reconcile").json()
+    assert again["orphan_files"] == 0
+    assert again["dangling_references"] == 0
+
+
+def test_reconcile_clears_dangling_inspection_file(client, db_engine, project_id):
+    """測試抽查表電子檔不存在時清空其路徑"""
+    with Session(db_engine) as db:
+        inspection = Inspection(project_id=project_id, name="抽查", location="A區", is_pass="1",
+                                file_path=str(storage.BLOB_DIR / "00" / ("0" * 64 + ".pdf")))
+        db.add(inspection)
+        db.commit()
+        inspection_id = inspection.id
+
+    # 唯一的引用就是懸空的，超過懸空比例上限，需要 force
+    assert client.post("/admin/reconcile", params={"fix_dangling": True}).status_code == 409
+    report = client.post("/admin/reconcile", params={"fix_dangling": True, "force": True}).json()
+    assert report["dangling_references"] == 1
+    assert report["cleared_inspections"] == 1
+    with Session(db_engine) as db:
+        assert db.get(Inspection, inspection_id).file_path is None
+
+
+def test_reconcile_resolves_paths_against_upload_dir(db_engine, drifted, tmp_path, monkeypatch):
+    """測試在其他目錄執行時以上傳目錄解析資料庫中的相對路徑"""
+    upload_dir = os.path.abspath(storage.UPLOAD_DIR)
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+
+    with Session(db_engine) as db:
+        # 目前目錄下沒有上傳目錄，拒絕執行
+        with pytest.raises(reconcile.ReconcileRefused):
+            reconcile.reconcile(db, fix_dangling=True)
+
+        report = reconcile.reconcile(db, fix_dangling=True, upload_dir=upload_dir)
+        assert report.dangling_references == 1
+        assert report.deleted_photos == 1
+        assert db.scalar(select(func.count()).select_from(Photo)) == 2
+
+
+def test_reconcile_refuses_when_most_references_dangle(client, db_engine, drifted):
+    """測試大部分引用都懸空時拒絕修正，指定 force 才刪除記錄"""
+    for photo in drifted["photos"][1:]:
+        Path(photo["file_path"]).unlink()
+
+    response = client.post("/admin/reconcile", params={"delete_orphans": True, "fix_dangling": True})
+    assert response.status_code == 409
+    assert "RECONCILE_MAX_DANGLING_RATIO" in response.json()["detail"]
+    assert all(path.exists() for path in drifted["orphans"])
+    with Session(db_engine) as db:
+        assert db.scalar(select(func.count()).select_from(Photo)) == 3
+
+    # 只產生報告時不受限制
+    assert client.post("/admin/reconcile").json()["dangling_references"] == 3
+    report = client.post("/admin/reconcile", params={"fix_dangling": True, "force": True}).json()
+    assert report["deleted_photos"] == 3
+
+
+def test_walk_files_parallel(tmp_path):
+    """測試平行走訪所有子目錄並略過排除的目錄"""
+    for i in range(20):
+        directory = tmp_path / f"{i:02d}" / "nested"
+        directory.mkdir(parents=True)
+        (directory / "a.bin").write_bytes(b"a")
+        (tmp_path / f"{i:02d}" / "b.bin").write_bytes(b"b")
+    (tmp_path / "cache").mkdir()
+    (tmp_path / "cache" / "skip.bin").write_bytes(b"c")
+
+    files = reconcile.walk_files(str(tmp_path), workers=4, exclude=[str(tmp_path / "cache")])
+    assert len(files) == 40
+    assert all(os.path.isabs(path) for path in files)
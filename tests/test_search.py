@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, insert, text, update
+from sqlalchemy.orm import Session
+
+from models import ContractItem, Inspection, Photo, Project
+
+
+@pytest.fixture
+def seeded(client, db_engine):
+    """建立可檢索的中文資料"""
+    with Session(db_engine) as db:
+        db.execute(insert(Project), [
+            {"id": 1, "name": "台中市立圖書館新建工程", "contract_number": "S-1", "contractor": "大成營造", "location": "台中市西屯區"},
+            {"id": 2, "name": "高雄港碼頭改善工程", "contract_number": "S-2", "contractor": "港灣營造", "location": "高雄市"},
+        ])
+        db.execute(insert(ContractItem), [
+            {"id": 1, "project_id": 1, "pcces_code": "0321", "name": "預拌混凝土 280kgf/cm2"},
+            {"id": 2, "project_id": 1, "pcces_code": "0322", "name": "鋼筋加工及組立"},
+            {"id": 3, "project_id": 2, "pcces_code": "0321", "name": "預拌混凝土 210kgf/cm2"},
+        ])
+        db.execute(insert(Inspection), [
+            {"id": 1, "project_id": 1, "name": "混凝土澆置抽查", "location": "二樓樓板", "inspection_time": datetime(2026, 1, 1)},
+        ])
+        db.execute(insert(Photo), [
+            {"id": 1, "project_id": 2, "filename": "a.jpg", "file_path": "x", "description": "碼頭混凝土澆置前鋼筋"},
+        ])
+        db.commit()
+    return db_engine
+
+
+def hits(client, **params):
+    response = client.get("/search", params=params)
+    assert response.status_code == 200, response.text
+    return [(hit["type"], hit["id"]) for hit in response.json()]
+
+
+def test_search_cjk_substring(client, seeded):
+    """測試 trigram 索引可檢索中文片段，並涵蓋所有資料類型"""
+    assert set(hits(client, q="混凝土")) == {
+        ("contract_item", 1), ("contract_item", 3), ("inspection", 1), ("photo", 1)
+    }
+    assert hits(client, q="圖書館") == [("project", 1)]
+    assert hits(client, q="港灣營造") == [("project", 2)]
+    assert hits(client, q="混凝土 280") == [("contract_item", 1)]
+    assert hits(client, q="不存在的字") == []
+
+
+def test_search_filters(client, seeded):
+    """測試依工程專案與資料類型篩選"""
+    assert set(hits(client, q="混凝土", project_id=2)) == {("contract_item", 3), ("photo", 1)}
+    assert hits(client, q="混凝土", types=["inspection"]) == [("inspection", 1)]
+    assert client.get("/search", params={"q": "混凝土", "types": "unknown"}).status_code == 400
+
+
+def test_search_short_query_falls_back_to_like(client, seeded):
+    """測試少於三個字的字詞改用 LIKE 比對"""
+    assert set(hits(client, q="鋼筋")) == {("contract_item", 2), ("photo", 1)}
+    assert hits(client, q="%") == []
+
+
+def test_search_requires_every_term(client, seeded):
+    """測試以空白分隔的字詞須全部符合，短字詞以 LIKE 逐一比對（可與 FTS5 字詞混用）"""
+    assert hits(client, q="鋼筋 碼頭") == [("photo", 1)]
+    assert hits(client, q="碼頭 鋼筋") == [("photo", 1)]
+    assert hits(client, q="鋼筋 混凝土") == [("photo", 1)]
+    assert hits(client, q="混凝土 28") == [("contract_item", 1)]
+    assert hits(client, q="混凝土 21", project_id=1) == []
+    assert hits(client, q="混凝土 21", project_id=2) == [("contract_item", 3)]
+    assert hits(client, q="鋼筋 高雄") == []
+
+
+def test_search_follows_writes(client, seeded):
+    """測試新增、修改、刪除後索引同步更新"""
+    with Session(seeded) as db:
+        db.execute(update(ContractItem).where(ContractItem.id == 2).values(name="模板組立"))
+        db.execute(delete(Photo).where(Photo.id == 1))
+        db.commit()
+    assert hits(client, q="鋼筋加工") == []
+    assert hits(client, q="模板組立") == [("contract_item", 2)]
+    assert ("photo", 1) not in hits(client, q="混凝土")
+
+    response = client.post("/inspections/", json={
+        "name": "模板組立抽查", "inspection_time": "2026-02-01T00:00:00", "location": "三樓",
+        "is_pass": True, "project_id": 1
+    })
+    assert response.status_code == 200
+    assert ("inspection", response.json()["id"]) in hits(client, q="模板組立")
+
+    # 索引與原資料表不一致時 integrity-check 會拋出例外
+    with seeded.connect() as conn:
+        conn.execute(text("INSERT INTO contract_items_fts(contract_items_fts) VALUES ('integrity-check')"))
+
+
+def test_search_reports_truncated_rank_window(client, seeded, monkeypatch):
+    """測試符合筆數超過 SEARCH_RANK_WINDOW 時以標頭列出結果不完整的資料類型"""
+    import search
+
+    response = client.get("/search", params={"q": "混凝土"})
+    assert "X-Search-Truncated" not in response.headers
+
+    monkeypatch.setattr(search, "SEARCH_RANK_WINDOW", 1)
+    response = client.get("/search", params={"q": "混凝土"})
+    assert response.headers["X-Search-Truncated"] == "contract_item"
+    # 只有最新的一筆契約項目參與排序
+    assert ("contract_item", 3) in [(hit["type"], hit["id"]) for hit in response.json()]
+    assert ("contract_item", 1) not in [(hit["type"], hit["id"]) for hit in response.json()]
+
+    response = client.get("/search", params={"q": "混凝土", "project_id": 2})
+    assert "X-Search-Truncated" not in response.headers
+
+
+def test_search_pagination(client, seeded):
+    """測試依相關度排序的 keyset 分頁"""
+    full = client.get("/search", params={"q": "混凝土"}).json()
+    ranks = [hit["rank"] for hit in full]
+    assert ranks == sorted(ranks)
+
+    collected, cursor = [], None
+    while True:
+        params = {"q": "混凝土", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/search", params=params)
+        collected.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert collected == full
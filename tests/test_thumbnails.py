@@ -0,0 +1,121 @@
+import io
+import os
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import thumbnails
+from .conftest import create_project
+
+
+def make_jpeg(size=(1600, 1200), color=(200, 80, 40)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def project_id(client, monkeypatch):
+    """建立測試用的工程專案，並重設縮圖快取的大小統計"""
+    monkeypatch.setattr(thumbnails, "_cache_bytes", None)
+    return create_project(client, "THUMB-001")
+
+
+def upload(client, project_id, content, name="site.jpg"):
+    response = client.post(
+        "/photos/upload/",
+        files={"file": (name, content, "image/jpeg")},
+        data={"project_id": project_id}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_thumbnail_generated_after_upload(client, project_id):
+    """測試上傳後在背景產生縮圖，請求時直接使用快取"""
+    photo = upload(client, project_id, make_jpeg())
+    cached = thumbnails.thumbnail_path(Path(photo["file_path"]), thumbnails.DEFAULT_THUMBNAIL_SIZE)
+    assert cached.exists()
+
+    response = client.get(f"/photos/{photo['id']}/thumbnail")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == thumbnails.THUMBNAIL_MEDIA_TYPE
+    assert response.headers["cache-control"] == "private, max-age=604800"
+    assert client.get(
+        f"/photos/{photo['id']}/thumbnail", headers={"If-None-Match": response.headers["etag"]}
+    ).status_code == 304
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert max(image.size) == thumbnails.DEFAULT_THUMBNAIL_SIZE
+
+
+def test_thumbnail_hits_keep_last_modified(client, project_id):
+    """測試讀取縮圖只更新存取時間，Last-Modified 不變，If-Modified-Since 得到 304"""
+    photo = upload(client, project_id, make_jpeg())
+    cached = thumbnails.thumbnail_path(Path(photo["file_path"]), thumbnails.DEFAULT_THUMBNAIL_SIZE)
+    os.utime(cached, (1000, 2000))
+
+    first = client.get(f"/photos/{photo['id']}/thumbnail")
+    second = client.get(f"/photos/{photo['id']}/thumbnail")
+    assert first.headers["last-modified"] == second.headers["last-modified"]
+    assert cached.stat().st_mtime == 2000
+    assert cached.stat().st_atime > 2000
+    assert client.get(
+        f"/photos/{photo['id']}/thumbnail", headers={"If-Modified-Since": first.headers["last-modified"]}
+    ).status_code == 304
+
+
+def test_thumbnail_sizes(client, project_id):
+    """測試其他尺寸在第一次請求時產生，不支援的尺寸回傳 400"""
+    photo = upload(client, project_id, make_jpeg())
+
+    response = client.get(f"/photos/{photo['id']}/thumbnail", params={"size": 128})
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert image.size == (128, 96)
+
+    assert client.get(f"/photos/{photo['id']}/thumbnail", params={"size": 300}).status_code == 400
+    assert client.get("/photos/9999/thumbnail").status_code == 404
+
+
+def test_thumbnail_of_invalid_image(client, project_id):
+    """測試無法解碼的圖片回傳 415"""
+    photo = upload(client, project_id, b"\xff\xd8\xff\xe0 not really a jpeg")
+    assert client.get(f"/photos/{photo['id']}/thumbnail").status_code == 415
+
+
+def test_thumbnail_cache_evicts_least_recently_used(client, project_id, monkeypatch):
+    """測試快取超過上限時刪除最久未使用的縮圖"""
+    photos = [upload(client, project_id, make_jpeg(color=(i * 40, 0, 0))) for i in range(3)]
+    cached = [
+        thumbnails.thumbnail_path(Path(p["file_path"]), thumbnails.DEFAULT_THUMBNAIL_SIZE)
+        for p in photos
+    ]
+    for age, path in enumerate(cached):
+        os.utime(path, (1000 + age, 1000 + age))
+
+    # 讀取第一張，使它成為最近使用的縮圖
+    assert client.get(f"/photos/{photos[0]['id']}/thumbnail").status_code == 200
+
+    sizes = [path.stat().st_size for path in cached]
+    removed = thumbnails.evict(max_bytes=sum(sizes) - 1)
+    assert removed >= 1
+    assert cached[0].exists()
+    assert not cached[1].exists()
+
+
+def test_thumbnail_regenerated_when_original_changes(tmp_path, monkeypatch):
+    """測試內容定址儲存區以外的原始檔被覆寫後重新產生縮圖"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(thumbnails, "_cache_bytes", None)
+    source = tmp_path / "legacy.jpg"
+    source.write_bytes(make_jpeg(size=(800, 600)))
+    first = thumbnails.get_thumbnail(str(source), 128)
+
+    source.write_bytes(make_jpeg(size=(600, 800)))
+    os.utime(source, ns=(source.stat().st_atime_ns, source.stat().st_mtime_ns + 10 ** 9))
+    second = thumbnails.get_thumbnail(str(source), 128)
+
+    assert first != second
+    with Image.open(second) as image:
+        assert image.size == (96, 128)